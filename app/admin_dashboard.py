@@ -1,7 +1,26 @@
 import streamlit as st
 import pandas as pd
-from db.database import fetch_all_bookings
+import os
+import tempfile
+from db.database import (
+    query_bookings, count_bookings, list_booking_types, outbox_counts,
+    fetch_booking_stats, cancel_booking, export_bookings
+)
 from app.config import BRAND_COLOR, ADMIN_PASSWORD
+from app.response_cache import get_response_cache
+from app.tracing import get_metrics
+from app.llm_gateway import get_llm_gateway
+
+PAGE_SIZE = 25
+
+@st.cache_data(ttl=60, show_spinner=False)
+def cached_booking_count(filter_items):
+    """Total rows for the current filters; a COUNT is the one query that can't be paged."""
+    return count_bookings(**dict(filter_items))
+
+@st.cache_data(ttl=60, show_spinner=False)
+def cached_booking_types():
+    return list_booking_types()
 
 def render_admin_dashboard():
     # Header
@@ -34,16 +53,200 @@ def render_admin_dashboard():
     # Dashboard Content
     st.markdown("### 📅 All Bookings")
     if st.button("🔄 Refresh Data"):
+        cached_booking_count.clear()
+        cached_booking_types.clear()
         st.rerun()
-        
-    data = fetch_all_bookings()
+
+    # Filters (applied in SQL, not in pandas)
+    f1, f2 = st.columns(2)
+    date_range = f1.date_input("Date range", value=(), help="Leave empty for all dates")
+    email = f2.text_input("Email starts with")
+    f3, f4 = st.columns(2)
+    status = f3.selectbox("Status", ["All", "Confirmed", "Cancelled"])
+    service = f4.selectbox("Service", ["All"] + cached_booking_types())
+    filters = {
+        "date_from": date_range[0] if len(date_range) > 0 else None,
+        "date_to": date_range[1] if len(date_range) > 1 else None,
+        "status": None if status == "All" else status,
+        "service": None if service == "All" else service,
+        "email": email.strip() or None,
+    }
+
+    # Keyset pagination: remember the cursor (smallest id) of every page we've been on
+    if st.session_state.get("admin_filters") != filters:
+        st.session_state.admin_filters = filters
+        st.session_state.admin_cursors = [None]
+    cursors = st.session_state.admin_cursors
+
+    data = query_bookings(page_size=PAGE_SIZE, before_id=cursors[-1], **filters)
+    total = cached_booking_count(tuple(sorted(filters.items())))
     if data:
         df = pd.DataFrame(data, columns=["ID", "Name", "Email", "Service Type", "Date", "Time", "Status"])
-        st.dataframe(df, use_container_width=True)
+        st.dataframe(df, use_container_width=True, hide_index=True)
     else:
         st.info("No bookings found.")
+
+    p1, p2, p3 = st.columns([1, 2, 1])
+    if p1.button("⬅️ Previous", disabled=len(cursors) == 1):
+        cursors.pop()
+        st.rerun()
+    p2.caption(f"Page {len(cursors)} of {max(1, -(-total // PAGE_SIZE))} · {total} bookings")
+    if p3.button("Next ➡️", disabled=len(data) < PAGE_SIZE):
+        cursors.append(data[-1][0])
+        st.rerun()
+
+    render_export(filters)
+
+    with st.expander("Cancel a booking"):
+        cancel_id = st.number_input("Booking ID", min_value=1, step=1)
+        if st.button("Cancel Booking"):
+            if cancel_booking(int(cancel_id)):
+                cached_booking_count.clear()
+                st.success(f"Booking {int(cancel_id)} cancelled.")
+            else:
+                st.error("No confirmed booking with that ID.")
+
+    render_analytics()
+
+    st.markdown("### 📧 Email Outbox")
+    counts = outbox_counts()
+    c1, c2, c3 = st.columns(3)
+    c1.metric("Sent", counts.get("sent", 0))
+    c2.metric("Pending", counts.get("pending", 0))
+    c3.metric("Failed", counts.get("failed", 0))
+
+    st.markdown("### ⚡ Answer Cache")
+    stats = get_response_cache().stats()
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Hit Rate", f"{stats['hit_rate']:.0%}")
+    c2.metric("Hits", stats["hits"])
+    c3.metric("Misses", stats["misses"])
+    c4.metric("Cached Answers", stats["entries"], help=f"{stats['bytes'] / 1024:.0f} KB in memory")
+
+    render_latency()
     
     st.divider()
     if st.button("Logout"):
         st.session_state.admin_authenticated = False
-        st.rerun()
\ No newline at end of file
+        clear_exports()
+        st.rerun()
+
+
+def render_analytics():
+    """Charts from the pre-aggregated summary tables; cost doesn't grow with the bookings table."""
+    st.markdown("### 📊 Analytics")
+    stats = fetch_booking_stats()
+    daily, services, hours = stats["booking_stats_daily"], stats["booking_stats_service"], stats["booking_stats_hour"]
+
+    total = sum(b for b, _ in services.values())
+    cancelled = sum(c for _, c in services.values())
+    started = stats["funnel"].get("started", 0)
+    converted = stats["funnel"].get("confirmed", 0)
+    c1, c2, c3 = st.columns(3)
+    c1.metric("Total Bookings", total)
+    c2.metric("Conversion Rate", f"{converted / started:.0%}" if started else "N/A",
+              help="Bookings saved / booking conversations started")
+    c3.metric("Cancellation Rate", f"{cancelled / total:.0%}" if total else "N/A")
+
+    if not total:
+        return
+    columns = ["Bookings", "Cancelled"]
+    tab1, tab2, tab3 = st.tabs(["Per Day", "Per Service", "Per Hour"])
+    with tab1:
+        st.bar_chart(pd.DataFrame.from_dict(daily, orient="index", columns=columns).sort_index())
+    with tab2:
+        st.bar_chart(pd.DataFrame.from_dict(services, orient="index", columns=columns))
+    with tab3:
+        by_hour = {f"{h:02d}:00": v for h, v in hours.items()}
+        st.bar_chart(pd.DataFrame.from_dict(by_hour, orient="index", columns=columns).sort_index())
+
+
+def render_latency():
+    """Per-stage timings collected by app/tracing.py since the process started."""
+    st.markdown("### ⏱️ Pipeline Latency")
+    snapshot = get_metrics().snapshot()
+    if not snapshot["stages"]:
+        st.info("No traced turns yet.")
+        return
+
+    turn = snapshot["stages"].get("turn")
+    counters = snapshot["counters"]
+    c1, c2, c3 = st.columns(3)
+    c1.metric("Turns", turn["count"] if turn else 0)
+    c2.metric("Turn p95", f"≤ {turn['p95_ms']:.0f} ms" if turn else "N/A")
+    c3.metric("LLM Tokens", counters.get("llm.prompt_tokens", 0) + counters.get("llm.completion_tokens", 0),
+              help="Estimated prompt + completion tokens")
+    llm = get_llm_gateway().stats()
+    st.caption(f"LLM circuit: **{llm['circuit']}** · requests in flight: {llm['in_flight']}/{llm['max_concurrency']} · "
+               f"retries: {counters.get('llm.retries', 0)} · failed fast: {counters.get('llm.rejected', 0)}")
+
+    df = pd.DataFrame.from_dict(snapshot["stages"], orient="index")
+    df.columns = ["Count", "Mean ms", "p50 ms", "p95 ms", "p99 ms"]
+    st.dataframe(df.round(1), use_container_width=True)
+    st.caption("Percentiles are histogram bucket bounds.")
+
+    with st.expander("Recent turns"):
+        for t in reversed(snapshot["turns"][-10:]):
+            stages = ", ".join(f"{name} {ms:.0f}ms" for name, ms in t["spans"])
+            st.markdown(f"**{t['total_ms']:.0f} ms** — {stages or 'no stages'}")
+            if t["counters"]:
+                st.caption(", ".join(f"{k}: {v}" for k, v in sorted(t["counters"].items())))
+    st.download_button("Download Prometheus metrics", get_metrics().to_prometheus(), file_name="metrics.txt")
+
+
+def export_dir():
+    """This session's folder for export files (they hold customer PII).
+
+    A TemporaryDirectory removes itself when the session state holding it
+    is dropped, or at the latest when the process exits.
+    """
+    if st.session_state.get("admin_export_dir") is None:
+        st.session_state.admin_export_dir = tempfile.TemporaryDirectory(prefix="bookings_export_")
+    return st.session_state.admin_export_dir.name
+
+def clear_exports():
+    export = st.session_state.get("admin_export_dir")
+    if export is not None:
+        export.cleanup()
+        st.session_state.admin_export_dir = None
+    st.session_state.admin_export_path = None
+
+def read_export(path):
+    """The export file's bytes, read only when its download button is clicked."""
+    with open(path, "rb") as f:
+        return f.read()
+
+def render_export(filters):
+    """Export every booking matching the current filters, streamed from SQLite to a temp file.
+
+    Writing the file takes constant memory. Serving it does not: when the
+    download button is clicked, Streamlit holds the whole file in memory
+    while it sends it. Reruns that don't click the button don't read it.
+    """
+    with st.expander("⬇️ Export bookings"):
+        fmt = st.radio("Format", ["csv", "parquet"], horizontal=True)
+        if st.button("Prepare Export"):
+            # Replace the previous export file rather than piling them up
+            old_path = st.session_state.get("admin_export_path")
+            if old_path and os.path.exists(old_path):
+                os.remove(old_path)
+            st.session_state.admin_export_path = None
+            path = os.path.join(export_dir(), f"bookings.{fmt}")
+            try:
+                with open(path, "wb") as f:
+                    with st.spinner("Exporting..."):
+                        rows = export_bookings(f, fmt=fmt, **filters)
+            except Exception as e:
+                # Don't leave a half-written file (of customer data) behind
+                if os.path.exists(path):
+                    os.remove(path)
+                st.error(f"Export failed: {e}")
+            else:
+                st.session_state.admin_export_path = path
+                st.session_state.admin_export_rows = rows
+
+        path = st.session_state.get("admin_export_path")
+        if path and os.path.exists(path):
+            ext = os.path.splitext(path)[1]
+            st.download_button(f"Download {st.session_state.admin_export_rows} bookings", lambda: read_export(path),
+                               file_name=f"bookings{ext}", mime="text/csv" if ext == ".csv" else "application/octet-stream")
@@ -0,0 +1,265 @@
+import csv
+import json
+import os
+import re
+import random
+import time
+from datetime import datetime, date
+from functools import lru_cache
+from app.config import (
+    REQUIRED_FIELDS, EMAIL_REGEX, PHONE_REGEX, OPEN_TIME, CLOSE_TIME, BULK_IMPORT_CHUNK, SLOT_SEARCH_DAYS
+)
+from db.database import (
+    save_booking_to_db, is_slot_available, next_free_slots, bulk_insert_bookings,
+    SlotUnavailable
+)
+
+
+def new_booking_state():
+    return {"active": False, "data": {}, "current_field": None}
+
+
+# --- VALIDATION ---
+@lru_cache(maxsize=4096)
+def _parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+@lru_cache(maxsize=4096)
+def _parse_time(value):
+    for fmt in ("%H:%M", "%I:%M %p"):
+        try:
+            return datetime.strptime(value, fmt).time()
+        except ValueError:
+            continue
+    return None
+
+
+def validate_field(field, value, catalog=None, allow_past=False):
+    """(ok, value or error message) for one booking field.
+
+    `catalog` is a ServiceCatalog to match booking_type against (anything
+    is accepted without one). Times come back normalised to 'HH:MM AM/PM'.
+    """
+    value = value.strip()
+
+    # --- EMAIL ---
+    if field == "email" and not re.match(EMAIL_REGEX, value):
+        return False, "❌ Invalid email. Use format: name@example.com"
+
+    # --- PHONE ---
+    if field == "phone" and not re.match(PHONE_REGEX, value):
+        return False, "❌ Invalid phone. Use 10-15 digits."
+
+    # --- DATE ---
+    if field == "date":
+        try:
+            booking_date = _parse_date(value)
+        except ValueError:
+            return False, "❌ Invalid date. Use YYYY-MM-DD."
+        if booking_date < date.today() and not allow_past:
+            return False, "❌ Date cannot be in the past."
+
+    # --- TIME ---
+    if field == "time":
+        parsed_time = _parse_time(value)
+        if not parsed_time:
+            return False, "❌ Invalid time. Use HH:MM (24-hour) or HH:MM AM/PM."
+
+        # Check business hours
+        if parsed_time < OPEN_TIME or parsed_time > CLOSE_TIME:
+            return False, f"❌ Booking time must be within business hours: {OPEN_TIME.strftime('%I:%M %p')} - {CLOSE_TIME.strftime('%I:%M %p')}"
+        value = parsed_time.strftime("%I:%M %p")
+
+    # --- BOOKING TYPE (PDF Matching) ---
+    if field == "booking_type":
+        if catalog:
+            # Fuzzy match, so typos and partial names still resolve
+            matched_service, suggestions = catalog.resolve(value)
+            if matched_service:
+                return True, matched_service
+            elif suggestions:
+                options = "\n".join([f"- {s}" for s in suggestions])
+                return False, f"I couldn't find **{value}** in the PDF. Did you mean:\n{options}\n\nType the service name, or 'search [service]' to find online options."
+            else:
+                options = "\n".join([f"- {s}" for s in catalog.services[:5]])
+                more = f"\n- ...and {len(catalog) - 5} more" if len(catalog) > 5 else ""
+                return False, f"Service not found in PDF. Available services include:\n{options}{more}\n\nYou can also type 'search [service]' to find online options."
+        return True, value  # Accept anything if no PDF
+
+    return True, value
+
+
+def validate_booking(record, catalog=None, allow_past=False):
+    """(data, errors) for a whole booking given as a dict of field -> text."""
+    data, errors = {}, []
+    for field in REQUIRED_FIELDS:
+        value = record.get(field)
+        if value is None or not str(value).strip():
+            errors.append(f"{field}: missing")
+            continue
+        ok, result = validate_field(field, str(value), catalog, allow_past)
+        if ok:
+            data[field] = result
+        else:
+            errors.append(f"{field}: {result.splitlines()[0].lstrip('❌ ')}")
+    return data, errors
+
+
+# --- CONVERSATION ---
+class BookingEngine:
+    """The step-by-step booking conversation, with no UI attached.
+
+    State is a plain dict (see new_booking_state) owned by the caller, so a
+    Streamlit session, a test or another front end can each keep their own.
+    Storage, email and web search are passed in; search and notify are
+    optional.
+    """
+
+    def __init__(self, save=save_booking_to_db, is_available=is_slot_available, free_slots=next_free_slots,
+                 notify=None, search=None):
+        self.save = save
+        self.is_available = is_available
+        self.free_slots = free_slots
+        self.notify = notify
+        self.search = search
+
+    def slot_full_reply(self, state):
+        """Drop the chosen date/time and offer the next free slots instead."""
+        data = state["data"]
+        suggestions = self.free_slots(data["booking_type"], data["date"], data["time"])
+        options = "\n".join([f"- {d} at {t}" for d, t in suggestions]) or f"- No free slots in the next {SLOT_SEARCH_DAYS} days."
+        data.pop("date", None)
+        data.pop("time", None)
+        state["confirmed"] = False
+        state["current_field"] = "date"
+        return f"❌ Sorry, **{data['booking_type']}** is fully booked at that time. Next available slots:\n{options}\n\nPlease provide your **Date**."
+
+    def step(self, state, user_input, catalog=None):
+        """Advance the conversation by one user message and return the reply."""
+        # --- WEB SEARCH ---
+        if self.search and "search" in user_input.lower() and not state.get("active"):
+            results = self.search(user_input)
+            return f"🔎 **Here is what I found:**\n\n{results}\n\n*To book one, just say 'I want to book [Name]'.*"
+
+        # --- VALIDATE CURRENT INPUT ---
+        if state["current_field"]:
+            is_valid, msg = validate_field(state["current_field"], user_input, catalog)
+            if is_valid:
+                state["data"][state["current_field"]] = msg
+                # Quick capacity check so the user doesn't find out only after confirming
+                if state["current_field"] == "time" and not self.is_available(state["data"]["booking_type"], state["data"]["date"], msg):
+                    return self.slot_full_reply(state)
+                state["current_field"] = None
+            else:
+                return msg
+
+        # --- ASK NEXT FIELD ---
+        for field in REQUIRED_FIELDS:
+            if field not in state["data"]:
+                state["current_field"] = field
+
+                if field == "booking_type":
+                    if catalog:
+                        options = ", ".join(catalog.services[:5])
+                        return f"Which service would you like to book? (From PDF: {options})"
+                    else:
+                        return "What service or hotel are you booking? (Type the name)"
+
+                return f"Please provide your **{field.capitalize()}**."
+
+        # --- CONFIRMATION ---
+        if not state.get("confirmed"):
+            summary = "\n".join([f"- {k.capitalize()}: {v}" for k, v in state["data"].items()])
+            state["confirmed"] = True
+            return f"Please confirm these details:\n\n{summary}\n\nType **'yes'** to save."
+
+        # --- SAVE & SEND EMAIL ---
+        if "yes" in user_input.lower():
+            # Save to Database (the slot is reserved atomically with the insert)
+            try:
+                saved = self.save(state["data"])
+            except SlotUnavailable:
+                return self.slot_full_reply(state)
+            if saved is None:
+                # Nothing was written; keep the details so "yes" can try again
+                return "⚠️ Sorry, your booking could not be saved just now. Type **'yes'** to try again."
+
+            # Queue Email (sent in the background, so the user isn't kept waiting on SMTP)
+            data = state["data"]
+            booking_id = f"BK-{random.randint(1000, 9999)}"
+            email_status = self.notify(data["email"], booking_id, data) if self.notify else False
+
+            # Reset State (in place, so the caller's dict stays the one in use)
+            state.clear()
+            state.update(new_booking_state())
+
+            # Return Result
+            if email_status:
+                return f"✅ **Booking Confirmed!**\n\n📧 A confirmation email is on its way to **{data['email']}**.\nBooking ID: `{booking_id}`"
+            else:
+                return f"✅ **Booking Confirmed!**\n\n⚠️ Email could not be queued. Check Admin Dashboard."
+
+        return "❌ Booking cancelled."
+
+
+# --- BULK IMPORT ---
+def read_booking_records(path):
+    """Yield (line number, record dict) from a .csv (with a header row) or .jsonl file."""
+    ext = os.path.splitext(path)[1].lower()
+    with open(path, encoding="utf-8", newline="") as f:
+        if ext == ".csv":
+            reader = csv.DictReader(f)
+            for record in reader:
+                yield reader.line_num, record
+        elif ext in (".jsonl", ".ndjson"):
+            for line_no, line in enumerate(f, 1):
+                if line.strip():
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError as e:
+                        yield line_no, {"_error": f"invalid JSON: {e.msg}"}
+                        continue
+                    yield line_no, record if isinstance(record, dict) else {"_error": "expected a JSON object"}
+        else:
+            raise ValueError(f"Unsupported import format: {ext or path}")
+
+
+def import_bookings(records, catalog=None, allow_past=False, chunk_size=BULK_IMPORT_CHUNK):
+    """Validate and insert many bookings, `chunk_size` per transaction.
+
+    `records` is an iterable of (row id, dict) as from read_booking_records.
+    Rows are validated like chat input, then written with executemany; slot
+    capacity, customer upserts and the stats tables are honoured just as
+    for single bookings. Returns a report: row counts, [(row id, error)]
+    and rows per second.
+    """
+    start = time.perf_counter()
+    report = {"rows": 0, "imported": 0, "errors": []}
+    batch = []
+
+    def flush():
+        rejected = bulk_insert_bookings([data for _, data in batch])
+        report["imported"] += len(batch) - len(rejected)
+        report["errors"].extend((batch[i][0], error) for i, error in rejected)
+        batch.clear()
+
+    for row_id, record in records:
+        report["rows"] += 1
+        if "_error" in record:
+            report["errors"].append((row_id, record["_error"]))
+            continue
+        record = {str(k).strip().lower(): v for k, v in record.items() if k is not None}
+        data, errors = validate_booking(record, catalog, allow_past)
+        if errors:
+            report["errors"].append((row_id, "; ".join(errors)))
+            continue
+        batch.append((row_id, data))
+        if len(batch) >= chunk_size:
+            flush()
+    if batch:
+        flush()
+
+    report["seconds"] = time.perf_counter() - start
+    report["rows_per_sec"] = report["rows"] / report["seconds"] if report["seconds"] else 0.0
+    return report
@@ -1,19 +1,27 @@
 import streamlit as st
-from app.rag_pipeline import get_rag_response
+from app.rag_pipeline import get_rag_response, prefetch_retrieval
 from app.booking_flow import handle_booking_conversation
 from app.tools import search_web_for_services
-from groq import Groq
-from app.config import LLM_MODEL
-
-def get_client():
-    return Groq(api_key=st.secrets["GROQ_API_KEY"])
+from app.intent import get_intent_classifier
+from app.tracing import traced, count
+from app.concurrency import discard
+from db.database import record_funnel_event
+from app.llm_gateway import get_llm_gateway, LLMError
 
+@traced("intent")
 def detect_intent_with_ai(user_input):
     """
-    Asks the LLM to decide if the user wants to book something.
+    Decides if the user wants to book something.
+    Cheap local rules and example matching go first; only unclear messages reach the LLM.
     Returns: 'BOOKING', 'SEARCH', or 'CHAT'
     """
-    client = get_client()
+    return get_intent_classifier().classify(user_input, llm_fallback=classify_intent_with_llm)
+
+def classify_intent_with_llm(user_input):
+    """
+    Asks the LLM to decide if the user wants to book something.
+    Returns: 'BOOKING', 'SEARCH', or 'CHAT' (None if the LLM can't be reached)
+    """
     prompt = f"""
     Classify the user's intent based on this message: "{user_input}"
     
@@ -24,16 +32,13 @@ def detect_intent_with_ai(user_input):
     Return ONLY one word: BOOKING, SEARCH, or CHAT.
     """
     try:
-        response = client.chat.completions.create(
-            model=LLM_MODEL,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0
-        )
-        return response.choices[0].message.content.strip().upper()
-    except:
-        return "CHAT"
+        return get_llm_gateway().complete([{"role": "user", "content": prompt}], name="llm.intent").strip().upper()
+    except LLMError as e:
+        print(f"LLM Error: {e}")
+        return None
 
 def route_query(user_input, vectorstore, chat_history):
+    """Returns the reply as a string, or as a generator of chunks when it is streamed."""
     state = st.session_state.booking_state
     
     # 1. IF ALREADY BOOKING -> CONTINUE
@@ -45,13 +50,24 @@ def route_query(user_input, vectorstore, chat_history):
         if any(w in user_input.lower() for w in ["yes", "sure", "ok", "please", "go ahead"]):
             state["active"] = True
             state["awaiting_intent_confirmation"] = False
+            record_funnel_event("started")
             return handle_booking_conversation("START_FLOW") 
         else:
             state["awaiting_intent_confirmation"] = False
 
     # 3. ASK AI: WHAT DOES THE USER WANT?
-    intent = detect_intent_with_ai(user_input)
+    intent = get_intent_classifier().classify_fast(user_input)
+    prefetched = None
+    if intent is None:
+        # Unclear message -> the slower tiers (maybe an LLM call) decide. Most of
+        # these turn out to be questions, so start the PDF retrieval meanwhile.
+        prefetched = prefetch_retrieval(user_input, vectorstore)
+        intent = detect_intent_with_ai(user_input)
+    count(f"route.{intent.lower()}")
     
+    if intent != "CHAT":
+        discard(prefetched)
+
     if intent == "SEARCH":
         with st.spinner(f"Searching web for '{user_input}'..."):
             results = search_web_for_services(user_input)
@@ -65,7 +81,13 @@ def route_query(user_input, vectorstore, chat_history):
             return f"I can definitely help with that. I found these options: **{', '.join(pdf_services)}**.\n\n👉 *Which one would you like? (You can say 'Book [Service Name]')*"
         else:
             state["active"] = True
+            record_funnel_event("started")
             return handle_booking_conversation("START_FLOW")
 
-    # 4. GENERAL CHAT (Default)
-    return get_rag_response(user_input, vectorstore)
\ No newline at end of file
+    # 4. GENERAL CHAT (Default) -> streamed so the first tokens show right away
+    # Only follow-ups get the conversation; standalone questions stay shareable through the response cache
+    history, follow_up = "", False
+    if chat_history is not None and chat_history.needs_history(current=user_input):
+        history, follow_up = chat_history.prompt_context(current=user_input), True
+    return get_rag_response(user_input, vectorstore, stream=True, prefetched=prefetched, history=history,
+                            use_cache=not follow_up)
\ No newline at end of file
@@ -0,0 +1,58 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+import streamlit as st
+from app.config import CONCURRENCY_WORKERS
+from app.tracing import count
+
+# Work submitted here runs on a shared pool. Read whatever it needs from
+# st.session_state *before* submitting: session state belongs to the script
+# thread and must not be touched from a worker.
+
+
+@st.cache_resource(show_spinner=False)
+def get_executor():
+    return ThreadPoolExecutor(max_workers=CONCURRENCY_WORKERS, thread_name_prefix="pipeline")
+
+
+def submit(fn, *args, **kwargs):
+    """Run fn on the pool; the current trace context goes with it, so its spans land on this turn."""
+    context = contextvars.copy_context()
+    return get_executor().submit(context.run, fn, *args, **kwargs)
+
+
+def wait_for(future, timeout, default=None):
+    """Result of `future`, or `default` if it failed or took longer than `timeout` seconds.
+
+    On timeout the future is cancelled; if it already started, it finishes in
+    the background and its result is simply dropped.
+    """
+    if future is None:
+        return default
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeout:
+        future.cancel()
+        count("concurrency.timeout")
+        return default
+    except Exception as e:
+        print(f"Background Task Error: {e}")
+        return default
+
+
+def cancel_if_queued(future):
+    """Cancel `future` if no worker has picked it up yet (the pool is busy with other work).
+
+    True means it will never run, so the caller should do the work itself
+    rather than wait for a free worker.
+    """
+    if future is not None and future.cancel():
+        count("concurrency.queued_cancelled")
+        return True
+    return False
+
+
+def discard(future):
+    """Speculative work that turned out not to be needed."""
+    if future is not None:
+        future.cancel()
+        count("concurrency.discarded")
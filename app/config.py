@@ -1,16 +1,23 @@
-import streamlit as st
 import os
 from datetime import time, datetime
 
 # --- SECRETS ---
-try:
-    GROQ_API_KEY = st.secrets["GROQ_API_KEY"]
-    EMAIL_SENDER = st.secrets["EMAIL_SENDER"]
-    EMAIL_PASSWORD = st.secrets["EMAIL_PASSWORD"]
-    ADMIN_PASSWORD = st.secrets["ADMIN_PASSWORD"]
-except FileNotFoundError:
-    st.error("Critical: .streamlit/secrets.toml file is missing.")
-    st.stop()
+SECRET_NAMES = ("GROQ_API_KEY", "EMAIL_SENDER", "EMAIL_PASSWORD", "ADMIN_PASSWORD")
+
+def __getattr__(name):
+    """Secrets are read from st.secrets on first use, so modules that never touch them
+    (booking engine, database, scripts) import without Streamlit."""
+    if name not in SECRET_NAMES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    import streamlit as st
+    try:
+        value = st.secrets[name]
+    except FileNotFoundError:
+        st.error("Critical: .streamlit/secrets.toml file is missing.")
+        st.stop()
+        raise  # st.stop() only ends a script run; outside one (a script), fail here
+    globals()[name] = value
+    return value
 
 # --- BRANDING ---
 APP_TITLE = "NEOSTATS"
@@ -20,12 +27,110 @@ BRAND_COLOR = "#0E3B18"
 # --- DATABASE ---
 DB_NAME = "bookings.db"
 DB_PATH = os.path.join("db", DB_NAME)
+DB_BUSY_TIMEOUT_MS = 5000           # Wait this long for a lock instead of failing with "database is locked"
+DB_MMAP_SIZE = 64 * 1024 * 1024     # Bytes of the DB file read through mmap
+DB_CACHED_STATEMENTS = 128          # Prepared statements kept per connection
+DB_POOL_SIZE = 8                    # Connections shared by all sessions and reruns (each checked out per call)
+
+# --- WEB SEARCH (Serper.dev) ---
+SERPER_URL = "https://google.serper.dev/search"
+SEARCH_TIMEOUT = (3.05, 10)       # (connect, read) seconds
+SEARCH_POOL_SIZE = 10             # Keep-alive connections kept open to Serper
+SEARCH_CACHE_TTL_SECONDS = 3600
+SEARCH_CACHE_SIZE = 512           # Queries kept in memory
+SEARCH_CACHE_PERSIST = True       # Also keep results in SQLite so they survive restarts
+
+# --- EMAIL ---
+SMTP_HOST = "smtp.gmail.com"
+SMTP_PORT = 587
+SMTP_USE_TLS = True
+OUTBOX_BATCH_SIZE = 20        # Emails sent per SMTP login
+OUTBOX_MAX_ATTEMPTS = 5
+OUTBOX_BACKOFF_SECONDS = 30   # Doubles after every failed attempt
+OUTBOX_POLL_SECONDS = 5
 
 # --- LLM MODEL ---
 LLM_MODEL = "llama-3.1-8b-instant"
+LLM_BASE_URL = None             # None = Groq's API; e.g. a local stub server for load tests
+LLM_TIMEOUT_SECONDS = 30
+LLM_POOL_SIZE = 16              # Keep-alive connections kept open to the LLM API
+LLM_MAX_CONCURRENCY = 8         # Requests in flight at once; the rest wait their turn
+LLM_REQUESTS_PER_MINUTE = None  # Token-bucket rate limit, e.g. 30 on Groq's free tier (None = off)
+LLM_RATE_BURST = 5              # Requests allowed back to back before the rate limit kicks in
+LLM_QUEUE_TIMEOUT = 10          # Seconds a request may wait for its turn before giving up
+LLM_RETRIES = 2                 # Retries on rate limits, 5xx and connection errors
+LLM_BACKOFF_SECONDS = 0.5       # First retry waits up to this (random jitter), doubling each time
+LLM_BACKOFF_MAX_SECONDS = 8
+LLM_BREAKER_FAILURES = 5        # Consecutive failed requests that open the circuit
+LLM_BREAKER_RESET_SECONDS = 30  # Fail fast this long, then let one trial request through
+OFFLINE_EXCERPT_CHARS = 600     # PDF text quoted as the answer while the LLM is unreachable
+
+# --- RAG / PDF INDEXING ---
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 100
+EMBED_BATCH_SIZE = 64     # Chunks embedded per call while streaming a PDF in
+FULL_TEXT_MAX_PAGES = 20  # Keep the whole text only for documents shorter than this
+CONTEXT_TOKEN_BUDGET = 3000  # Max (estimated) tokens of PDF text put into one prompt
+RETRIEVAL_CANDIDATES = 12    # Chunks retrieved before trimming to the token budget
+HYBRID_VECTOR_WEIGHT = 1.0   # Rank-fusion weight of FAISS results
+HYBRID_BM25_WEIGHT = 1.0     # Rank-fusion weight of keyword (BM25) results
+HYBRID_RERANK = True         # Re-order fused results by embedding similarity
+WARMUP_ON_START = False     # Import pypdf/langchain/FAISS and load the embedding model in a background thread at startup
+INDEX_CACHE_DIR = os.path.join("db", "index_cache")
+INDEX_CACHE_MAX_MB = 512  # Least recently used indexes are evicted above this size
+
+# --- VECTOR INDEX ---
+VECTOR_INDEX_BACKEND = "hnsw"    # flat | fp16 | sq8 | ivf | ivfpq | hnsw (see scripts/bench_vector_index.py); ivfpq is not for brochure-sized PDFs
+VECTOR_INDEX_MIN_CHUNKS = 5000   # Smaller PDFs keep the exact float32 flat index whatever the backend
+VECTOR_INDEX_MMAP = True         # Memory-map cached indexes so workers share pages through the OS cache
+VECTOR_INDEX_HNSW_M = 32         # hnsw: graph neighbours per vector
+VECTOR_INDEX_EF_SEARCH = 128     # hnsw: candidates explored per query (higher = better recall, slower)
+VECTOR_INDEX_NPROBE_SHARE = 0.25  # ivf/ivfpq: share of the inverted lists scanned per query
+VECTOR_INDEX_PQ_BYTES = 48       # ivfpq: bytes per vector; smallest, lowest recall
+VECTOR_INDEX_PQ_MIN_VECTORS = 1000000  # ivfpq: smaller indexes get ivf (PQ recall was ~0.2-0.3 at 6k-50k vectors)
+VECTOR_INDEX_TRAIN_SIZE = 10000  # ivf/ivfpq: vectors sampled to train the quantizers
+
+# --- RAG RESPONSE CACHE ---
+RESPONSE_CACHE_THRESHOLD = 0.92    # Cosine similarity for two questions to count as the same
+RESPONSE_CACHE_TTL_SECONDS = 3600
+RESPONSE_CACHE_MAX_ENTRIES = 2000
+RESPONSE_CACHE_MAX_MB = 32
+
+# --- INTENT DETECTION ---
+INTENT_EMBED_THRESHOLD = 0.60  # Min cosine similarity to trust the nearest example
+INTENT_EMBED_MARGIN = 0.05     # ...and how far ahead of the runner-up label it must be
+INTENT_CACHE_SIZE = 2048
+
+# --- CONVERSATION MEMORY ---
+MEMORY_WINDOW_MESSAGES = 6     # Recent messages sent verbatim with each RAG prompt
+MEMORY_SUMMARY_BATCH = 6       # Older messages folded into the rolling summary per LLM call
+MEMORY_ARCHIVE_MESSAGES = 500  # Messages kept for display; older ones survive only in the summary
+MEMORY_MESSAGE_CHARS = 500     # Per-message cap when quoting history in a prompt
+MEMORY_SUMMARY_WORDS = 120
+CHAT_RENDER_WINDOW = 20        # Messages drawn on each rerun; older ones load on demand
+CHAT_RENDER_PAGE = 20          # Extra messages per "show earlier" click
+
+# --- BACKGROUND WORK ---
+CONCURRENCY_WORKERS = 4           # Shared thread pool for work that overlaps within a turn
+EXTRACT_SERVICES_TIMEOUT = 30     # Seconds to wait for the service-extraction LLM call after embedding is done
+PREFETCH_TIMEOUT = 10             # Seconds to wait for retrieval started alongside intent detection
+
+# --- TRACING / METRICS ---
+TRACE_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)  # Histogram bucket bounds
+TRACE_RECENT_TURNS = 50   # Per-turn breakdowns kept for the admin dashboard
+METRICS_PORT = None       # e.g. 9464 to serve Prometheus text at http://localhost:9464/metrics
+
+# --- SERVICE MATCHING ---
+SERVICE_MATCH_THRESHOLD = 0.75   # Score needed to accept a typed service name without asking
+SERVICE_MATCH_MARGIN = 0.10      # ...and how far ahead of the next candidate it must be
+SERVICE_SUGGEST_MIN_SCORE = 0.30 # Weaker candidates are not offered as "did you mean"
+SERVICE_SUGGESTIONS = 3
+SERVICE_EMBED_THRESHOLD = 0.60   # Min cosine similarity for an embedding-only match
 
 # --- REQUIRED BOOKING FIELDS ---
 REQUIRED_FIELDS = ["name", "email", "phone", "booking_type", "date", "time"]
+BULK_IMPORT_CHUNK = 500   # Rows per transaction when importing bookings from CSV/JSONL
 
 # --- DEFAULT SERVICES ---
 DEFAULT_SERVICES = ["General Inquiry"]
@@ -40,6 +145,13 @@ TIME_REGEX = r"^(0?[1-9]|1[0-2]):[0-5][0-9]\s?(AM|PM|am|pm)$"
 OPEN_TIME = time(9, 0)    # 9:00 AM
 CLOSE_TIME = time(18, 0)  # 6:00 PM
 
+# --- SLOT CAPACITY ---
+SLOT_MINUTES = 30           # Bookings are counted against the slot that contains their time
+DEFAULT_SLOT_CAPACITY = 1   # Bookings allowed per service per slot
+SLOT_CAPACITY = {}          # Per-service overrides, e.g. {"Deluxe Room": 5}
+SUGGESTED_SLOTS = 3         # Alternatives offered when a slot is full
+SLOT_SEARCH_DAYS = 14       # How far ahead to look for free slots
+
 # --- UTILITY FUNCTIONS ---
 def format_time_12hr(t: time):
     """Format a datetime.time object to 12-hour format."""
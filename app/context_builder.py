@@ -0,0 +1,62 @@
+from app.config import CONTEXT_TOKEN_BUDGET, CHUNK_OVERLAP
+
+# Rough English average for Llama-style tokenizers; good enough for budgeting
+CHARS_PER_TOKEN = 4
+# Shorter prefix/suffix matches are coincidence, not splitter overlap
+MIN_OVERLAP_CHARS = 10
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1 if text else 0
+
+
+def build_context(candidates, full_text=None, budget=CONTEXT_TOKEN_BUDGET):
+    """Pick the prompt context for one question.
+
+    `candidates` is a list of (Document, score) with higher scores better.
+    The whole document is used only when it fits the budget; otherwise the
+    best chunks are taken until the budget is spent, duplicates dropped, and
+    chunks that were neighbours in the PDF merged back into one passage.
+    Returns (context, number of chunks used).
+    """
+    if full_text and estimate_tokens(full_text) <= budget:
+        return full_text, 0
+
+    selected = []
+    seen = set()
+    used = 0
+    for doc, _ in sorted(candidates, key=lambda pair: pair[1], reverse=True):
+        text = doc.page_content.strip()
+        if not text or text in seen:
+            continue
+        cost = estimate_tokens(text)
+        if used + cost > budget:
+            continue
+        seen.add(text)
+        selected.append(doc)
+        used += cost
+
+    return "\n\n".join(_merge_adjacent(selected)), len(selected)
+
+
+def _merge_adjacent(docs):
+    """Put chunks back in document order and join consecutive ones into one passage."""
+    ordered = sorted(docs, key=lambda doc: doc.metadata.get("chunk", float("inf")))
+    passages = []
+    last_chunk = None
+    for doc in ordered:
+        chunk = doc.metadata.get("chunk")
+        if passages and chunk is not None and last_chunk is not None and chunk == last_chunk + 1:
+            passages[-1] = _join_overlapping(passages[-1], doc.page_content)
+        else:
+            passages.append(doc.page_content)
+        last_chunk = chunk
+    return passages
+
+
+def _join_overlapping(left, right):
+    """Join two neighbouring chunks without repeating the splitter's overlap."""
+    for size in range(min(len(left), len(right), CHUNK_OVERLAP * 2), MIN_OVERLAP_CHARS - 1, -1):
+        if left.endswith(right[:size]):
+            return left + right[size:]
+    return left + "\n" + right
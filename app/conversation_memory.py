@@ -0,0 +1,126 @@
+import re
+from app.config import (
+    MEMORY_WINDOW_MESSAGES, MEMORY_SUMMARY_BATCH, MEMORY_ARCHIVE_MESSAGES, MEMORY_MESSAGE_CHARS,
+    MEMORY_SUMMARY_WORDS
+)
+from app.concurrency import submit, wait_for
+from app.llm_gateway import get_llm_gateway
+
+# Anaphora that point back at earlier turns ("how much is it?", "what about that one?"). Plain
+# first-person words don't count: "can you tell me the price?" stands on its own.
+FOLLOW_UP_PATTERN = re.compile(
+    r"\b(it|its|it's|they|them|their|those|these|(this|that|the other|the same|another) one|"
+    r"the same|the (first|second|third|last|previous) (one|option)|i (ask|asked|say|said|mention|mentioned))\b"
+    r"|\b(is|was|does|did|are|were|can|will) (that|this)\b"
+    r"|^\s*(and|or|but|so|what about|how about)\b",
+    re.IGNORECASE,
+)
+
+def refers_back(text):
+    """True if `text` reads like a follow-up that can't be answered without the conversation."""
+    return bool(FOLLOW_UP_PATTERN.search(text or ""))
+
+
+def summarize_messages(previous_summary, messages):
+    """Fold `messages` into the running summary with one LLM call. Runs on a worker thread; raises LLMError."""
+    transcript = "\n".join(f"{m['role']}: {m['content'][:MEMORY_MESSAGE_CHARS]}" for m in messages)
+    prompt = f"""
+    Update the summary of this conversation between a user and a booking assistant.
+    Keep names, services, dates and preferences the user mentioned. Use at most {MEMORY_SUMMARY_WORDS} words.
+
+    Current summary: {previous_summary or "(none)"}
+
+    New messages:
+    {transcript}
+    """
+    return get_llm_gateway().complete([{"role": "user", "content": prompt}], name="llm.summarize").strip()
+
+
+class ConversationMemory:
+    """Chat transcript with a bounded footprint.
+
+    The last `window` messages are kept verbatim for prompts; anything older
+    is folded into a short rolling summary by a background LLM call, so the
+    turn that triggers it never waits. At most `archive_size` messages are
+    kept for display; the summary still covers the ones dropped.
+    """
+
+    def __init__(self, window=MEMORY_WINDOW_MESSAGES, summary_batch=MEMORY_SUMMARY_BATCH,
+                 archive_size=MEMORY_ARCHIVE_MESSAGES):
+        self.window = window
+        self.summary_batch = summary_batch
+        self.archive_size = max(archive_size, window + summary_batch)
+        self.messages = []
+        self.summary = ""
+        self._dropped = 0      # messages removed from the front of self.messages
+        self._summarized = 0   # messages (counted from the very first) covered by the summary
+        self._pending = None   # (Future, summarized count once it lands)
+        self._retry_at = 0     # after a failed summary, wait for another batch before retrying
+
+    def __len__(self):
+        return self._dropped + len(self.messages)
+
+    def add(self, role, content):
+        self.messages.append({"role": role, "content": content})
+        self._maybe_summarize()
+        # Drop display history only once the summary covers it
+        excess = min(len(self.messages) - self.archive_size, self._summarized - self._dropped)
+        if excess > 0:
+            del self.messages[:excess]
+            self._dropped += excess
+
+    def poll(self):
+        """Pick up a finished background summary (call from the script thread)."""
+        if self._pending and self._pending[0].done():
+            future, upto = self._pending
+            self._pending = None
+            summary = wait_for(future, 0)
+            if summary:
+                self.summary = summary
+                self._summarized = upto
+            else:
+                self._retry_at = len(self) + self.summary_batch
+
+    def _maybe_summarize(self):
+        self.poll()
+        upto = len(self) - self.window
+        if self._pending is None and upto - self._summarized >= self.summary_batch and len(self) >= self._retry_at:
+            batch = self.messages[self._summarized - self._dropped:upto - self._dropped]
+            self._pending = (submit(summarize_messages, self.summary, batch), upto)
+
+    def prompt_context(self, current=None):
+        """Summary plus the recent messages, ready for a prompt ('' for a fresh chat).
+
+        `current` is the message being answered; it is left out if it is the
+        last one, since the prompt already asks it.
+        """
+        self.poll()
+        lines = [f"{m['role'].capitalize()}: {m['content'][:MEMORY_MESSAGE_CHARS]}" for m in self._recent(current)]
+        if self.summary:
+            lines.insert(0, f"Summary of earlier conversation: {self.summary}")
+        return "\n".join(lines)
+
+    def needs_history(self, current):
+        """True if `current` refers back to earlier user turns (or a summary of them).
+
+        Only such questions get prompt_context() in their prompt. The rest
+        are answered on their own, so their answers can be shared through
+        the response cache.
+        """
+        self.poll()
+        has_context = bool(self.summary) or any(m["role"] == "user" for m in self._recent(current))
+        return has_context and refers_back(current)
+
+    def _recent(self, current):
+        recent = self.messages[-(self.window + 1):]
+        if recent and recent[-1]["role"] == "user" and recent[-1]["content"] == current:
+            recent = recent[:-1]
+        return recent[-self.window:]
+
+    def visible(self, count):
+        """The last `count` messages, for rendering."""
+        return self.messages[-count:] if count > 0 else []
+
+    def hidden_count(self, count):
+        """How many stored messages visible(count) leaves out."""
+        return max(0, len(self.messages) - count)
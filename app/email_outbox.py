@@ -0,0 +1,163 @@
+import random
+import smtplib
+import sqlite3
+import threading
+import time
+import streamlit as st
+from app.config import (
+    EMAIL_SENDER, EMAIL_PASSWORD, SMTP_HOST, SMTP_PORT, SMTP_USE_TLS,
+    OUTBOX_BATCH_SIZE, OUTBOX_MAX_ATTEMPTS, OUTBOX_BACKOFF_SECONDS, OUTBOX_POLL_SECONDS
+)
+from app.tools import build_confirmation_email
+from app.tracing import span, count
+from db.database import enqueue_email, claim_due_emails, mark_emails_sent, mark_email_failed
+
+
+def queue_confirmation_email(to_email, booking_id, details):
+    """Put the confirmation in the outbox and return immediately; the worker sends it."""
+    if not EMAIL_SENDER or not EMAIL_PASSWORD:
+        return False
+    try:
+        enqueue_email(to_email, build_confirmation_email(to_email, booking_id, details).as_string())
+    except Exception as e:
+        print(f"Outbox Error: {e}")
+        return False
+    get_outbox_worker().wake()
+    return True
+
+
+def connect_smtp():
+    """One authenticated SMTP session, reused for a whole batch."""
+    server = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=30)
+    if SMTP_USE_TLS:
+        server.starttls()
+    if EMAIL_PASSWORD:
+        server.login(EMAIL_SENDER, EMAIL_PASSWORD)
+    return server
+
+
+class OutboxWorker:
+    """Background thread that drains the email_outbox table.
+
+    `smtp_factory` returns a connected smtplib.SMTP-like object; point it at
+    a local aiosmtpd or stub server to test without Gmail.
+    """
+
+    def __init__(self, smtp_factory=connect_smtp, batch_size=OUTBOX_BATCH_SIZE, poll_seconds=OUTBOX_POLL_SECONDS):
+        self.smtp_factory = smtp_factory
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._delivered = []  # Sent but not yet marked in the outbox (marking failed)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="email-outbox", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def wake(self):
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                sent = self.drain_once()
+            except Exception as e:
+                print(f"Outbox Error: {e}")
+                sent = 0
+            if not sent:
+                self._wake.wait(self.poll_seconds)
+                self._wake.clear()
+
+    def drain_once(self):
+        """Send one batch of due emails over a single SMTP connection. Returns how many were sent."""
+        # Mark what an earlier batch delivered first, or its lease would expire and send it again
+        self._mark_delivered()
+        rows = claim_due_emails(self.batch_size)
+        if not rows:
+            return 0
+        with span("smtp.batch"):
+            sent = self._send_batch(rows)
+        count("email.sent", sent)
+        return sent
+
+    def _send_batch(self, rows):
+        try:
+            server = self.smtp_factory()
+        except (smtplib.SMTPException, OSError) as e:
+            # Can't even connect: push the whole batch back
+            for email_id, _, _, attempts in rows:
+                self._retry_later(email_id, attempts, e)
+            return 0
+
+        sent = 0
+        try:
+            for email_id, to_email, message, attempts in rows:
+                try:
+                    server.sendmail(EMAIL_SENDER, [to_email], message)
+                    self._delivered.append(email_id)
+                    sent += 1
+                except (smtplib.SMTPServerDisconnected, OSError) as e:
+                    self._retry_later(email_id, attempts, e)
+                    self._close(server)
+                    server = None
+                    server = self.smtp_factory()
+                except smtplib.SMTPException as e:
+                    self._retry_later(email_id, attempts, e)
+        except (smtplib.SMTPException, OSError):
+            # Reconnect failed mid-batch; unsent rows are retried once their lease expires
+            pass
+        finally:
+            self._close(server)
+            self._mark_delivered()
+        return sent
+
+    def _mark_delivered(self):
+        """Mark delivered emails as sent in one transaction; on a DB error keep them for the next try."""
+        if not self._delivered:
+            return
+        try:
+            mark_emails_sent(self._delivered)
+        except sqlite3.Error as e:
+            count("email.mark_failed")
+            print(f"Outbox Error: {len(self._delivered)} sent emails not marked yet: {e}")
+            return
+        self._delivered = []
+
+    @staticmethod
+    def _close(server):
+        if server is None:
+            return
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            try:
+                server.close()
+            except OSError:
+                pass
+
+    def _retry_later(self, email_id, attempts, error):
+        count("email.retry")
+        attempts += 1
+        if attempts >= OUTBOX_MAX_ATTEMPTS:
+            mark_email_failed(email_id, error)
+            return
+        # Exponential backoff with jitter so a Gmail outage doesn't get a thundering herd
+        delay = OUTBOX_BACKOFF_SECONDS * 2 ** (attempts - 1) * random.uniform(0.8, 1.2)
+        mark_email_failed(email_id, error, retry_at=time.time() + delay)
+
+
+@st.cache_resource(show_spinner=False)
+def get_outbox_worker():
+    worker = OutboxWorker()
+    worker.start()
+    return worker
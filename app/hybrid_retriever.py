@@ -0,0 +1,125 @@
+import math
+import re
+from collections import Counter, defaultdict
+import numpy as np
+from app.config import HYBRID_VECTOR_WEIGHT, HYBRID_BM25_WEIGHT, HYBRID_RERANK, RETRIEVAL_CANDIDATES
+
+# Keeps prices ("1,500", "99.00") and room codes ("a-101") as single tokens
+TOKEN_REGEX = re.compile(r"[a-z0-9]+(?:[.,\-/][a-z0-9]+)*")
+RRF_K = 60  # Standard reciprocal-rank-fusion damping constant
+
+
+def tokenize(text):
+    return TOKEN_REGEX.findall(text.lower())
+
+
+class BM25Index:
+    """In-memory inverted index over chunks, keyed by the FAISS docstore id."""
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_ids = []
+        self.doc_lens = []
+        self.postings = defaultdict(list)  # term -> [(doc position, term frequency)]
+
+    def add(self, doc_id, text):
+        position = len(self.doc_ids)
+        terms = Counter(tokenize(text))
+        self.doc_ids.append(doc_id)
+        self.doc_lens.append(sum(terms.values()))
+        for term, tf in terms.items():
+            self.postings[term].append((position, tf))
+
+    def search(self, query, k):
+        """Top-k (doc_id, score) for the query terms."""
+        n_docs = len(self.doc_ids)
+        if not n_docs:
+            return []
+        avg_len = sum(self.doc_lens) / n_docs or 1
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for position, tf in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lens[position] / avg_len)
+                scores[position] += idf * tf * (self.k1 + 1) / (tf + norm)
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(self.doc_ids[position], score) for position, score in best]
+
+    def to_dict(self):
+        return {"k1": self.k1, "b": self.b, "doc_ids": self.doc_ids,
+                "doc_lens": self.doc_lens, "postings": self.postings}
+
+    @classmethod
+    def from_dict(cls, data):
+        index = cls(data["k1"], data["b"])
+        index.doc_ids = data["doc_ids"]
+        index.doc_lens = data["doc_lens"]
+        index.postings = defaultdict(list, {term: [tuple(p) for p in plist] for term, plist in data["postings"].items()})
+        return index
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore):
+        """Rebuild from a FAISS docstore (for cached indexes saved without BM25)."""
+        index = cls()
+        for doc_id in vectorstore.index_to_docstore_id.values():
+            index.add(doc_id, vectorstore.docstore.search(doc_id).page_content)
+        return index
+
+
+class HybridRetriever:
+    """Dense (FAISS) + sparse (BM25) retrieval fused with weighted reciprocal rank fusion."""
+
+    def __init__(self, vectorstore, bm25):
+        self.vectorstore = vectorstore
+        self.bm25 = bm25
+        self._positions = {doc_id: pos for pos, doc_id in vectorstore.index_to_docstore_id.items()}
+
+    def search(self, query, query_vector, k=RETRIEVAL_CANDIDATES, vector_weight=HYBRID_VECTOR_WEIGHT,
+               bm25_weight=HYBRID_BM25_WEIGHT, rerank=HYBRID_RERANK):
+        """Return up to k (Document, score) pairs, higher score = more relevant."""
+        pool = k * 2
+        fused = defaultdict(float)
+        if vector_weight:
+            for rank, doc_id in enumerate(self.dense_search(query_vector, pool)):
+                fused[doc_id] += vector_weight / (RRF_K + rank + 1)
+        if bm25_weight:
+            for rank, (doc_id, _) in enumerate(self.bm25.search(query, pool)):
+                fused[doc_id] += bm25_weight / (RRF_K + rank + 1)
+
+        ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:pool]
+        if rerank:
+            ranked = self._rerank(ranked, query_vector)
+        docstore = self.vectorstore.docstore
+        return [(docstore.search(doc_id), score) for doc_id, score in ranked[:k]]
+
+    def dense_search(self, query_vector, k):
+        vector = np.array([query_vector], dtype="float32")
+        _, positions = self.vectorstore.index.search(vector, k)
+        mapping = self.vectorstore.index_to_docstore_id
+        return [mapping[pos] for pos in positions[0] if pos != -1]
+
+    def _rerank(self, ranked, query_vector):
+        """Re-score fused candidates by cosine similarity to the query (stored vectors, no re-embedding).
+
+        The fused score is blended back in so a strong keyword hit is not
+        thrown away just because its embedding is only moderately close.
+        """
+        if not ranked:
+            return ranked
+        query = np.array(query_vector, dtype="float32")
+        query /= np.linalg.norm(query) or 1
+        try:
+            vectors = np.stack([self.vectorstore.index.reconstruct(self._positions[doc_id]) for doc_id, _ in ranked])
+        except (RuntimeError, KeyError, ValueError):
+            # Index type can't hand vectors back; keep the fused order
+            return ranked
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True).clip(min=1e-12)
+        cosine = vectors @ query
+        top_fused = ranked[0][1] or 1
+        rescored = [(doc_id, 0.5 * float(cos) + 0.5 * fused / top_fused)
+                    for (doc_id, fused), cos in zip(ranked, cosine)]
+        return sorted(rescored, key=lambda item: item[1], reverse=True)
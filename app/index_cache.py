@@ -0,0 +1,127 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from app.config import (
+    EMBEDDING_MODEL, CHUNK_SIZE, CHUNK_OVERLAP, FULL_TEXT_MAX_PAGES, CONTEXT_TOKEN_BUDGET, INDEX_CACHE_DIR,
+    INDEX_CACHE_MAX_MB, VECTOR_INDEX_BACKEND, VECTOR_INDEX_MIN_CHUNKS, VECTOR_INDEX_HNSW_M, VECTOR_INDEX_PQ_BYTES,
+    VECTOR_INDEX_PQ_MIN_VECTORS, VECTOR_INDEX_TRAIN_SIZE
+)
+from app.vector_index import load_vectorstore
+
+# Bump when the on-disk layout changes so stale entries are never loaded
+CACHE_VERSION = 1
+META_FILE = "meta.json"
+
+
+def make_key(pdf_bytes):
+    """Content hash of the PDF plus every setting that changes what gets cached.
+
+    Search-time settings (HNSW efSearch, IVF nprobe) are applied when an
+    index is loaded, so they are not part of the key.
+    """
+    content_hash = hashlib.sha256(pdf_bytes).hexdigest()
+    settings = (f"{content_hash}:{EMBEDDING_MODEL}:{CHUNK_SIZE}:{CHUNK_OVERLAP}:"
+                f"{FULL_TEXT_MAX_PAGES}:{CONTEXT_TOKEN_BUDGET}:"
+                f"{VECTOR_INDEX_BACKEND}:{VECTOR_INDEX_MIN_CHUNKS}:{VECTOR_INDEX_HNSW_M}:"
+                f"{VECTOR_INDEX_PQ_BYTES}:{VECTOR_INDEX_PQ_MIN_VECTORS}:{VECTOR_INDEX_TRAIN_SIZE}:v{CACHE_VERSION}")
+    return hashlib.sha256(settings.encode("utf-8")).hexdigest()
+
+
+def _entry_dir(key):
+    return os.path.join(INDEX_CACHE_DIR, key)
+
+
+def load(key, embeddings):
+    """Return (vectorstore, meta, extras) for a cached PDF, or None on a miss.
+
+    The FAISS index is memory-mapped read-only (VECTOR_INDEX_MMAP), so the
+    returned vectorstore must not be added to.
+    """
+    path = _entry_dir(key)
+    meta_path = os.path.join(path, META_FILE)
+    if not os.path.exists(meta_path):
+        return None
+
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        vectorstore = load_vectorstore(path, embeddings)
+        extras = {}
+        for name in os.listdir(path):
+            if name.endswith(".json") and name != META_FILE:
+                with open(os.path.join(path, name), "r", encoding="utf-8") as f:
+                    extras[name[:-len(".json")]] = json.load(f)
+    except Exception as e:
+        print(f"Index cache error: {e}")
+        shutil.rmtree(path, ignore_errors=True)
+        return None
+
+    # Touch the entry so LRU eviction keeps it
+    os.utime(meta_path, None)
+    return vectorstore, meta, extras
+
+
+def save(key, vectorstore, meta, extras=None):
+    """Persist the FAISS index (with its chunks) and metadata, then enforce the size budget.
+
+    `extras` maps a name to JSON-serialisable data stored next to the index
+    (e.g. the BM25 postings) and handed back by load().
+    """
+    os.makedirs(INDEX_CACHE_DIR, exist_ok=True)
+    path = _entry_dir(key)
+    if os.path.exists(os.path.join(path, META_FILE)):
+        return
+
+    # Write into a private directory and rename, so readers never see half an entry
+    tmp_path = os.path.join(INDEX_CACHE_DIR, f".tmp-{uuid.uuid4().hex}")
+    try:
+        vectorstore.save_local(tmp_path)
+        with open(os.path.join(tmp_path, META_FILE), "w", encoding="utf-8") as f:
+            json.dump({**meta, "created": time.time()}, f)
+        for name, data in (extras or {}).items():
+            with open(os.path.join(tmp_path, f"{name}.json"), "w", encoding="utf-8") as f:
+                json.dump(data, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        # Another session stored the same PDF first
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        return
+
+    evict()
+
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def evict(max_bytes=None):
+    """Delete least recently used entries until the cache fits in the budget."""
+    if max_bytes is None:
+        max_bytes = INDEX_CACHE_MAX_MB * 1024 * 1024
+    if not os.path.exists(INDEX_CACHE_DIR):
+        return
+
+    entries = []
+    for name in os.listdir(INDEX_CACHE_DIR):
+        meta_path = os.path.join(INDEX_CACHE_DIR, name, META_FILE)
+        if name.startswith(".") or not os.path.exists(meta_path):
+            continue
+        path = os.path.join(INDEX_CACHE_DIR, name)
+        entries.append((os.path.getmtime(meta_path), _dir_size(path), path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
@@ -0,0 +1,101 @@
+from dataclasses import dataclass
+from typing import Optional
+from pypdf import PdfReader
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_community.vectorstores import FAISS
+from app.config import CHUNK_SIZE, CHUNK_OVERLAP, EMBED_BATCH_SIZE, FULL_TEXT_MAX_PAGES, CONTEXT_TOKEN_BUDGET
+from app.context_builder import estimate_tokens
+from app.hybrid_retriever import BM25Index
+
+# Text handed to the service-extraction prompt
+SERVICE_TEXT_PAGES = 10
+SERVICE_TEXT_CHARS = 3000
+
+
+@dataclass
+class IngestResult:
+    vectorstore: object
+    bm25: BM25Index
+    pdf_full_text: Optional[str]
+    service_text: str
+    page_count: int
+
+
+def ingest_pdf(stream, embeddings, on_progress=None, batch_size=EMBED_BATCH_SIZE, on_service_text=None):
+    """Read a PDF page by page, embed it in fixed-size batches and build its BM25 index.
+
+    `stream` is any binary file object (Streamlit's UploadedFile works as-is),
+    so nothing is written to disk. Only one batch of chunks is held at a time.
+    `on_progress(pages_done, total_pages)` is called after every page.
+    `on_service_text(text)` is called once, as soon as the text for service
+    extraction is complete, so that LLM call can overlap with embedding.
+    """
+    reader = PdfReader(stream)
+    total_pages = len(reader.pages)
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+
+    keep_full_text = total_pages < FULL_TEXT_MAX_PAGES
+    page_texts = []
+    service_text = ""
+    vectorstore = None
+    bm25 = BM25Index()
+    batch_texts, batch_metas, batch_ids = [], [], []
+    chunk_count = 0
+    service_text_sent = False
+
+    def flush():
+        nonlocal vectorstore
+        vectors = embeddings.embed_documents(batch_texts)
+        pairs = list(zip(batch_texts, vectors))
+        if vectorstore is None:
+            vectorstore = FAISS.from_embeddings(pairs, embeddings, metadatas=batch_metas, ids=batch_ids)
+        else:
+            vectorstore.add_embeddings(pairs, metadatas=batch_metas, ids=batch_ids)
+        batch_texts.clear()
+        batch_metas.clear()
+        batch_ids.clear()
+
+    for page_number, page in enumerate(reader.pages):
+        text = page.extract_text() or ""
+
+        if keep_full_text:
+            page_texts.append(text)
+        if page_number < SERVICE_TEXT_PAGES and len(service_text) < SERVICE_TEXT_CHARS:
+            service_text = (service_text + " " + text)[:SERVICE_TEXT_CHARS]
+        if on_service_text and not service_text_sent and service_text.strip() and (
+                page_number + 1 >= SERVICE_TEXT_PAGES or len(service_text) >= SERVICE_TEXT_CHARS):
+            on_service_text(service_text.strip())
+            service_text_sent = True
+
+        for chunk in splitter.split_text(text):
+            batch_texts.append(chunk)
+            batch_metas.append({"page": page_number, "chunk": chunk_count})
+            batch_ids.append(str(chunk_count))
+            bm25.add(str(chunk_count), chunk)
+            chunk_count += 1
+            if len(batch_texts) >= batch_size:
+                flush()
+
+        if on_progress:
+            on_progress(page_number + 1, total_pages)
+
+    if batch_texts:
+        flush()
+
+    if vectorstore is None:
+        raise ValueError("No readable text found in this PDF.")
+    if on_service_text and not service_text_sent:
+        on_service_text(service_text.strip())
+
+    # No point keeping text that will never fit in a prompt
+    pdf_full_text = "\n\n".join(page_texts) if keep_full_text else None
+    if pdf_full_text and estimate_tokens(pdf_full_text) > CONTEXT_TOKEN_BUDGET:
+        pdf_full_text = None
+
+    return IngestResult(
+        vectorstore=vectorstore,
+        bm25=bm25,
+        pdf_full_text=pdf_full_text,
+        service_text=service_text.strip(),
+        page_count=total_pages,
+    )
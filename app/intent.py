@@ -0,0 +1,189 @@
+import re
+import threading
+from collections import Counter, OrderedDict
+import numpy as np
+import streamlit as st
+from app.config import INTENT_EMBED_THRESHOLD, INTENT_EMBED_MARGIN, INTENT_CACHE_SIZE
+from app.resources import get_embeddings, embeddings_loaded
+from app.tracing import count
+
+INTENTS = ("BOOKING", "SEARCH", "CHAT")
+
+# Cities the search rule recognises after "in"/"near"; any other place falls through to tier 2
+PLACE_NAMES = (
+    "mumbai", "bombay", "delhi", "new delhi", "bangalore", "bengaluru", "chennai", "madras", "hyderabad",
+    "kolkata", "calcutta", "pune", "ahmedabad", "jaipur", "surat", "lucknow", "kanpur", "nagpur", "indore",
+    "bhopal", "patna", "vadodara", "ludhiana", "agra", "nashik", "coimbatore", "kochi", "cochin", "madurai",
+    "mysore", "mysuru", "mangalore", "visakhapatnam", "vizag", "thiruvananthapuram", "trivandrum", "goa",
+    "chandigarh", "gurgaon", "gurugram", "noida", "dehradun", "shimla", "udaipur", "varanasi", "amritsar",
+    "guwahati", "bhubaneswar", "raipur", "ranchi", "srinagar", "pondicherry", "puducherry", "ooty",
+    "london", "paris", "new york", "dubai", "singapore", "bangkok", "tokyo", "sydney", "toronto",
+)
+
+# --- TIER 1: RULES (high precision only; anything unsure falls through) ---
+INTENT_RULES = [
+    # The verb needs an object, so "schedule of the yoga class" / "book recommendations" fall through
+    ("BOOKING", re.compile(r"^(please\s+)?(book|reserve|schedule)\s+(a|an|the|me|my|us|our|one|two|\d+)\b")),
+    ("BOOKING", re.compile(r"\b(i want to|i'd like to|i would like to|i wanna|can i|could i|can you|could you|help me|let me)\s+(book|reserve|schedule)\b")),
+    ("BOOKING", re.compile(r"\b(make|get me|need) an? (booking|reservation|appointment)\b")),
+    # Web search only when the user names a place: "find" / "show me" alone is just as often
+    # about the PDF ("find the price in rupees", "search for rooms in june")
+    ("SEARCH", re.compile(r"\b(near me|nearby|near here|around here|in my area|close to me)\b")),
+    ("SEARCH", re.compile(r"^(please\s+)?(find|search|look for|looking for|show me|look up)\b.*"
+                          rf"\s(in|near|around) ({'|'.join(PLACE_NAMES)})\b")),
+    ("CHAT", re.compile(r"^(hi|hello|hey|thanks|thank you|good (morning|afternoon|evening))\b[\s!.]*$")),
+    # Questions, unless they mention booking words or a place ("are there any hotels in goa")
+    ("CHAT", re.compile(r"^(what|how|is|are|does|do|when|which|why)\b"
+                        r"(?!.*\b(book|booking|reserve|reservation|schedule|appointment|slot|rooms?|stay|"
+                        r"find|search|open|near|nearby|in my area)\b)"
+                        rf"(?!.*\b(in|near|around) ({'|'.join(PLACE_NAMES)})\b)")),
+]
+
+# --- TIER 2: LABELLED EXAMPLES FOR NEAREST-NEIGHBOUR MATCHING ---
+INTENT_EXAMPLES = {
+    "BOOKING": [
+        "Book a room",
+        "I want an appointment",
+        "Can you get me a slot?",
+        "Reserve the deluxe room",
+        "I'd like to schedule a consultation",
+        "Sign me up for a haircut tomorrow",
+        "I need a table for two tonight",
+        "Put me down for the spa package",
+    ],
+    "SEARCH": [
+        "Find hotels",
+        "Search for salons",
+        "Hotels in Bangalore",
+        "Any good dentists near me?",
+        "Show me restaurants in Mumbai",
+        "Look for gyms nearby",
+        "Which clinics are open in my area",
+    ],
+    "CHAT": [
+        "What is the price?",
+        "Is the gym open?",
+        "Hello",
+        "What services do you offer?",
+        "How much does the deluxe room cost?",
+        "Tell me about the cancellation policy",
+        "Thanks, that helps",
+    ],
+}
+
+
+def normalize_message(text):
+    return re.sub(r"\s+", " ", text.lower()).strip().rstrip("?!.")
+
+
+# --- LAST RESORT (no LLM) ---
+BOOKING_WORDS = re.compile(r"\b(book|booking|reserve|reservation|schedule|appointment|slot)\b")
+SEARCH_WORDS = re.compile(r"\b(find|search|near me|nearby|look for)\b")
+
+
+def guess_intent(text):
+    """Crude keyword guess for when the LLM is unavailable."""
+    if BOOKING_WORDS.search(text):
+        return "BOOKING"
+    if SEARCH_WORDS.search(text):
+        return "SEARCH"
+    return "CHAT"
+
+
+@st.cache_resource(show_spinner=False)
+def _example_matrix():
+    """Unit-normalised embeddings of every labelled example, computed once per process."""
+    labels, phrases = [], []
+    for label, examples in INTENT_EXAMPLES.items():
+        labels.extend([label] * len(examples))
+        phrases.extend(examples)
+    vectors = np.array(get_embeddings().embed_documents(phrases), dtype="float32")
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return labels, vectors
+
+
+class IntentClassifier:
+    """Rules -> embedding nearest neighbour -> LLM, with a per-message decision cache."""
+
+    def __init__(self, cache_size=INTENT_CACHE_SIZE):
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        self.tier_counts = Counter()
+
+    def classify(self, text, llm_fallback):
+        intent = self.classify_fast(text)
+        if intent is not None:
+            return intent
+
+        key = normalize_message(text)
+        intent, tier = self._by_examples(key), "embedding"
+        if intent is None:
+            intent, tier = llm_fallback(text), "llm"
+            if intent is None:
+                # LLM unreachable -> keyword guess, not cached so the LLM decides next time
+                count("intent.keyword")
+                return guess_intent(key)
+            if intent not in INTENTS:
+                intent = "CHAT"
+        self._remember(key, intent, tier)
+        return intent
+
+    def classify_fast(self, text):
+        """Decision from the cache or the rules, or None if a slower tier is needed."""
+        key = normalize_message(text)
+        with self._lock:
+            intent = self._cache.get(key)
+            if intent is not None:
+                self._cache.move_to_end(key)
+                self.tier_counts["cache"] += 1
+        if intent is not None:
+            count("intent.cache")
+            return intent
+
+        intent = self._by_rules(key)
+        if intent is not None:
+            self._remember(key, intent, "rule")
+        return intent
+
+    def _remember(self, key, intent, tier):
+        count(f"intent.{tier}")
+        with self._lock:
+            self.tier_counts[tier] += 1
+            self._cache[key] = intent
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+
+    def _by_rules(self, text):
+        for intent, pattern in INTENT_RULES:
+            if pattern.search(text):
+                return intent
+        return None
+
+    def _by_examples(self, text):
+        # Only worth it when the model is already in memory; loading it just
+        # to classify would cost more than the LLM call we are trying to skip.
+        if not text or not embeddings_loaded():
+            return None
+        labels, vectors = _example_matrix()
+        query = np.array(get_embeddings().embed_query(text), dtype="float32")
+        query /= np.linalg.norm(query)
+        scores = vectors @ query
+
+        best = {}
+        for label, score in zip(labels, scores):
+            best[label] = max(best.get(label, -1.0), float(score))
+        ranked = sorted(best.items(), key=lambda item: item[1], reverse=True)
+        (top_label, top_score), (_, runner_up) = ranked[0], ranked[1]
+        if top_score >= INTENT_EMBED_THRESHOLD and top_score - runner_up >= INTENT_EMBED_MARGIN:
+            return top_label
+        return None
+
+    def stats(self):
+        with self._lock:
+            return dict(self.tier_counts)
+
+
+@st.cache_resource(show_spinner=False)
+def get_intent_classifier():
+    return IntentClassifier()
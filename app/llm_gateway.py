@@ -0,0 +1,267 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+import streamlit as st
+from app.config import (
+    LLM_MODEL, LLM_BASE_URL, LLM_TIMEOUT_SECONDS, LLM_POOL_SIZE, LLM_MAX_CONCURRENCY, LLM_REQUESTS_PER_MINUTE,
+    LLM_RATE_BURST, LLM_QUEUE_TIMEOUT, LLM_RETRIES, LLM_BACKOFF_SECONDS, LLM_BACKOFF_MAX_SECONDS,
+    LLM_BREAKER_FAILURES, LLM_BREAKER_RESET_SECONDS
+)
+from app.tracing import span, observe, count
+
+# Worth retrying: timeouts, conflicts, rate limits and server errors
+RETRY_STATUS = {408, 409, 429}
+
+
+class LLMError(Exception):
+    """An LLM request failed (after retries), waited too long for its turn, or the circuit is open."""
+
+
+def _is_retryable(e):
+    status = getattr(e, "status_code", None)
+    if status is not None:
+        return status in RETRY_STATUS or status >= 500
+    # groq.APIConnectionError / APITimeoutError, matched by name so groq stays a lazy import
+    return (any(cls.__name__ == "APIConnectionError" for cls in type(e).__mro__)
+            or isinstance(e, (ConnectionError, TimeoutError)))
+
+
+def _retry_after(e):
+    """Seconds from a Retry-After header on the error's response, if any."""
+    response = getattr(e, "response", None)
+    try:
+        return float(response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Allows `rate` requests per second on average and up to `burst` back to back."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout):
+        """Take one token, waiting up to `timeout` seconds. Returns False if none came in time."""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """Opens after `failures` consecutive failures; after `reset_seconds` one trial request decides.
+
+    closed -> requests pass; open -> requests fail at once; half-open ->
+    the first request goes through, and its outcome closes or re-opens it.
+    """
+
+    def __init__(self, failures=LLM_BREAKER_FAILURES, reset_seconds=LLM_BREAKER_RESET_SECONDS):
+        self.failures = failures
+        self.reset_seconds = reset_seconds
+        self._failed = 0
+        self._opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self._opened_at >= self.reset_seconds else "open"
+
+    def allow(self):
+        with self._lock:
+            state = self._state()
+            if state == "half-open" and not self._trial:
+                self._trial = True
+                return True
+            return state == "closed"
+
+    def record_success(self):
+        with self._lock:
+            self._failed = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        """Returns True if this failure opened the circuit."""
+        with self._lock:
+            self._failed += 1
+            if self._trial or (self._opened_at is None and self._failed >= self.failures):
+                self._opened_at = time.monotonic()
+                self._trial = False
+                return True
+            return False
+
+
+class LLMGateway:
+    """The one way the app talks to the LLM.
+
+    Keeps a single Groq client (one pooled keep-alive HTTP connection pool)
+    for the process, limits requests in flight and optionally their rate,
+    retries transient failures with jittered exponential backoff, and stops
+    calling a failing API for a while (circuit breaker) so callers can fall
+    back at once instead of waiting on timeouts. `client` replaces the Groq
+    client (tests, benchmarks); `base_url` points the real one elsewhere.
+    """
+
+    def __init__(self, api_key=None, base_url=LLM_BASE_URL, client=None, max_concurrency=LLM_MAX_CONCURRENCY,
+                 requests_per_minute=LLM_REQUESTS_PER_MINUTE, burst=LLM_RATE_BURST, queue_timeout=LLM_QUEUE_TIMEOUT,
+                 retries=LLM_RETRIES, backoff=LLM_BACKOFF_SECONDS, backoff_max=LLM_BACKOFF_MAX_SECONDS,
+                 timeout=LLM_TIMEOUT_SECONDS, breaker=None):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+        self._client = client
+        self._client_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._bucket = TokenBucket(requests_per_minute / 60, burst) if requests_per_minute else None
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    import httpx
+                    from groq import Groq
+                    http_client = httpx.Client(
+                        timeout=self.timeout,
+                        limits=httpx.Limits(max_connections=LLM_POOL_SIZE, max_keepalive_connections=LLM_POOL_SIZE)
+                    )
+                    # Retries happen here (with the breaker in the loop), not inside the SDK
+                    self._client = Groq(api_key=self.api_key, base_url=self.base_url, http_client=http_client,
+                                        timeout=self.timeout, max_retries=0)
+        return self._client
+
+    def complete(self, messages, name="llm.completion", temperature=0, model=LLM_MODEL, stream=False):
+        """The reply text ('' if the reply has none), or with stream=True a generator of text chunks. Raises LLMError."""
+        request = {"model": model, "messages": messages, "temperature": temperature}
+        if stream:
+            return self._stream(request, name)
+        with self._slot():
+            response = self._call(request, name)
+        content = response.choices[0].message.content
+        if content is None:
+            # e.g. a tool-call or content-filter finish: an answer, just not a text one
+            count("llm.empty")
+        return content or ""
+
+    def stats(self):
+        return {"circuit": self.breaker.state, "in_flight": self._in_flight, "max_concurrency": self.max_concurrency}
+
+    def _stream(self, request, name):
+        with self._slot():
+            # Retried until the stream opens; a stream that breaks midway is not replayed. The breaker
+            # hears about it once the stream ends: a failure if it broke, else (even if the caller
+            # stopped reading early) a success.
+            response = self._call({**request, "stream": True}, name, settle=False)
+            broken = False
+            try:
+                for chunk in response:
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        yield delta
+            except Exception as e:
+                broken = True
+                count("llm.errors")
+                if self.breaker.record_failure():
+                    count("llm.circuit_opened")
+                    print(f"LLM Error: circuit opened after a broken stream: {type(e).__name__}: {e}")
+                raise LLMError(f"stream interrupted: {type(e).__name__}: {e}") from e
+            finally:
+                if not broken:
+                    self.breaker.record_success()
+
+    @contextmanager
+    def _slot(self):
+        """Wait (up to queue_timeout) for a concurrency slot and, if rate limited, a token."""
+        if self.breaker.state == "open":
+            count("llm.rejected")
+            raise LLMError("circuit open, LLM calls are paused after repeated failures")
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            count("llm.queue_timeout")
+            raise LLMError(f"no free LLM slot within {self.queue_timeout}s")
+        try:
+            remaining = self.queue_timeout - (time.perf_counter() - start)
+            if self._bucket and not self._bucket.acquire(max(0.0, remaining)):
+                count("llm.queue_timeout")
+                raise LLMError(f"rate limit: no request token within {self.queue_timeout}s")
+            observe("llm.queue", (time.perf_counter() - start) * 1000)
+            with self._in_flight_lock:
+                self._in_flight += 1
+            try:
+                yield
+            finally:
+                with self._in_flight_lock:
+                    self._in_flight -= 1
+        finally:
+            self._slots.release()
+
+    def _call(self, request, name, settle=True):
+        """Send the request, retrying transient failures. settle=False leaves recording the
+        success to the caller (streams, which can still fail after they open)."""
+        for attempt in range(self.retries + 1):
+            if not self.breaker.allow():
+                count("llm.rejected")
+                raise LLMError("circuit open, LLM calls are paused after repeated failures")
+            count("llm.requests")
+            try:
+                with span(name):
+                    response = self.client.chat.completions.create(**request)
+            except Exception as e:
+                count("llm.errors")
+                retryable, opened = _is_retryable(e), False
+                if not retryable:
+                    # The API answered (bad request, auth...): not an outage
+                    self.breaker.record_success()
+                elif self.breaker.record_failure():
+                    opened = True
+                    count("llm.circuit_opened")
+                    print(f"LLM Error: circuit opened after {type(e).__name__}: {e}")
+                if not retryable or opened or attempt == self.retries:
+                    raise LLMError(f"{type(e).__name__}: {e}") from e
+                count("llm.retries")
+                time.sleep(self._backoff(attempt, e))
+            else:
+                if settle:
+                    self.breaker.record_success()
+                return response
+
+    def _backoff(self, attempt, e):
+        delay = _retry_after(e)
+        if delay is None:
+            delay = random.uniform(0, self.backoff * 2 ** attempt)  # "Full jitter"
+        return min(delay, self.backoff_max)
+
+
+@st.cache_resource(show_spinner=False)
+def get_llm_gateway():
+    return LLMGateway(api_key=st.secrets["GROQ_API_KEY"])
@@ -1,35 +1,63 @@
 import streamlit as st
 import sys
 import os
+import time
 
 # Path Fix
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from app.config import APP_TITLE, APP_TAGLINE, BRAND_COLOR
+from app.config import (
+    APP_TITLE, APP_TAGLINE, BRAND_COLOR, METRICS_PORT, WARMUP_ON_START, CHAT_RENDER_WINDOW, CHAT_RENDER_PAGE
+)
 from app.chat_logic import route_query
-from app.rag_pipeline import process_pdf
+from app.booking_engine import new_booking_state
+from app.conversation_memory import ConversationMemory
+from app.rag_pipeline import process_pdf, release_pdf
+from app.resources import start_warmup
+from app.styles import APP_CSS
 from db.database import init_db
-from app.admin_dashboard import render_admin_dashboard
+from app.email_outbox import get_outbox_worker
+from app.tracing import trace_turn, observe, start_metrics_server
 
 # Page Config (IMPORTANT for mobile)
 st.set_page_config(page_title="NeoStats", page_icon="🌿", layout="centered")
 
-# Init DB
-init_db()
+# Init DB (schema checks and migrations once per process, not on every rerun)
+@st.cache_resource(show_spinner=False)
+def init_database():
+    init_db()
+    return True
+
+init_database()
+
+# Background email sender (also resumes anything left in the outbox by a restart)
+get_outbox_worker()
+
+# Optional Prometheus scrape endpoint (one per process, not per rerun)
+@st.cache_resource(show_spinner=False)
+def get_metrics_server(port):
+    return start_metrics_server(port)
+
+if METRICS_PORT:
+    get_metrics_server(METRICS_PORT)
+
+# Optionally load the PDF stack and embedding model in the background so the first upload is fast
+if WARMUP_ON_START:
+    start_warmup()
 
 # Session State
-if "messages" not in st.session_state:
-    st.session_state.messages = [{
-        "role": "assistant",
-        "content": "👋 **Welcome to NeoStats.**\n\nI am your AI Booking Assistant. You can:\n1. **Upload a PDF** to ask questions or book services found in it.\n2. **Search** for services (like hotels or doctors) if you don't have a file.\n\nHow can I help you today?"
-    }]
+if "memory" not in st.session_state:
+    st.session_state.memory = ConversationMemory()
+    st.session_state.memory.add(
+        "assistant",
+        "👋 **Welcome to NeoStats.**\n\nI am your AI Booking Assistant. You can:\n1. **Upload a PDF** to ask questions or book services found in it.\n2. **Search** for services (like hotels or doctors) if you don't have a file.\n\nHow can I help you today?"
+    )
+
+if "history_shown" not in st.session_state:
+    st.session_state.history_shown = CHAT_RENDER_WINDOW
 
 if "booking_state" not in st.session_state:
-    st.session_state.booking_state = {
-        "active": False,
-        "data": {},
-        "current_field": None
-    }
+    st.session_state.booking_state = new_booking_state()
 
 if "vectorstore" not in st.session_state:
     st.session_state.vectorstore = None
@@ -38,53 +66,22 @@ if "page" not in st.session_state:
     st.session_state.page = "chat"
 
 # ---------------- SIMPLE CSS ----------------
-st.markdown("""
-<style>
-
-/* ===============================
-   BULLETPROOF FILE UPLOADER FIX
-   =============================== */
-
-[data-testid="stFileUploader"] {
-    background-color: #FFFFFF !important;
-    border: 2px dashed #2F6B3F !important;
-    border-radius: 14px !important;
-    padding: 16px !important;
-}
-
-/* FORCE VISIBILITY OF ALL CHILD ELEMENTS */
-[data-testid="stFileUploader"] * {
-    color: #000000 !important;
-    opacity: 1 !important;
-    filter: none !important;
-    visibility: visible !important;
-}
-
-/* INNER DROP ZONE */
-[data-testid="stFileUploader"] section {
-    background-color: #F5F7F9 !important;
-    border-radius: 10px !important;
-    padding: 14px !important;
-}
-
-/* BROWSE FILES BUTTON */
-[data-testid="stFileUploader"] button {
-    background-color: #2F6B3F !important;
-    color: #FFFFFF !important;
-    border-radius: 8px !important;
-    border: none !important;
-}
-
-/* MOBILE SAFETY */
-@media (max-width: 768px) {
-    [data-testid="stFileUploader"] {
-        min-height: 130px !important;
-    }
-}
-
-</style>
-""", unsafe_allow_html=True)
+st.markdown(APP_CSS, unsafe_allow_html=True)
+
+
 
+# ---------------- TURN LATENCY ----------------
+def timed_stream(chunks, started):
+    """Pass a streamed reply through, recording how long the user waited for its first chunk.
+
+    The turn's total time is recorded by trace_turn; a stream with no chunks records no first token.
+    """
+    first = True
+    for chunk in chunks:
+        if first:
+            observe("turn.first_token", (time.perf_counter() - started) * 1000)
+            first = False
+        yield chunk
 
 
 # ---------------- SIDEBAR ----------------
@@ -104,37 +101,73 @@ with st.sidebar:
     # Only one file uploader
     uploaded_file = st.file_uploader("Upload Service PDF", type="pdf")
     if uploaded_file:
-        if not st.session_state.get("vectorstore"):
-            with st.spinner("Processing PDF..."):
-                st.session_state.vectorstore = process_pdf(uploaded_file)
+        # Re-process when a different file replaces the current one (but don't retry one that failed)
+        file_id = uploaded_file.file_id
+        if file_id != st.session_state.get("pdf_failed_id") and (
+                not st.session_state.get("vectorstore") or st.session_state.get("pdf_file_id") != file_id):
+            from pypdf.errors import PyPdfError, DependencyError  # pypdf is loading for process_pdf anyway
+            progress = st.progress(0, text="Processing PDF...")
+            try:
+                st.session_state.vectorstore = process_pdf(
+                    uploaded_file,
+                    on_progress=lambda done, total: progress.progress(done / total, text=f"Processing PDF... page {done}/{total}")
+                )
+                st.session_state.pdf_file_id = file_id
+                st.session_state.pdf_failed_id = None
+                progress.empty()
                 st.success("PDF Loaded")
-    else:
-        # PDF removed → clear all PDF-related memory
+            except (ValueError, PyPdfError, DependencyError, OSError) as e:
+                # The previous PDF's index is already released; don't keep answering from it
+                release_pdf()
+                progress.empty()
+                st.session_state.vectorstore = None
+                st.session_state.pdf_file_id = None
+                st.session_state.pdf_failed_id = file_id
+                st.session_state.detected_services = []
+                st.error(f"Could not read PDF: {e}")
+    elif st.session_state.get("vectorstore") or st.session_state.get("pdf_failed_id"):
+        # PDF removed → clear all PDF-related memory and free the shared index
+        release_pdf()
         st.session_state.vectorstore = None
+        st.session_state.pdf_file_id = None
+        st.session_state.pdf_failed_id = None
         st.session_state.detected_services = []
 
     st.divider()
 
 # ---------------- ROUTING ----------------
 if st.session_state.page == "admin":
+    from app.admin_dashboard import render_admin_dashboard
     render_admin_dashboard()
 
 else:
     st.markdown(f"<h1 style='color:{BRAND_COLOR}'>{APP_TITLE}</h1>", unsafe_allow_html=True)
     st.markdown(f"**{APP_TAGLINE}**")
 
-    for msg in st.session_state.messages:
+    # Only the latest messages are drawn on each rerun; older ones on request
+    memory = st.session_state.memory
+    hidden = memory.hidden_count(st.session_state.history_shown)
+    if hidden:
+        if st.button(f"⬆️ Show {min(hidden, CHAT_RENDER_PAGE)} earlier messages ({hidden} hidden)"):
+            st.session_state.history_shown += CHAT_RENDER_PAGE
+            st.rerun()
+
+    for msg in memory.visible(st.session_state.history_shown):
         with st.chat_message(msg["role"]):
             st.markdown(msg["content"])
 
     if prompt := st.chat_input("Type your message..."):
-        st.session_state.messages.append({"role": "user", "content": prompt})
+        memory.add("user", prompt)
 
         with st.chat_message("user"):
             st.markdown(prompt)
 
-        with st.chat_message("assistant"):
-            response = route_query(prompt,st.session_state.vectorstore,st.session_state.messages)
-            st.markdown(response)
+        with st.chat_message("assistant"), trace_turn():
+            started = time.perf_counter()
+            response = route_query(prompt,st.session_state.vectorstore,memory)
+            if isinstance(response, str):
+                st.markdown(response)
+            else:
+                response = st.write_stream(timed_stream(response, started))
 
-        st.session_state.messages.append({"role": "assistant", "content": response})
+        memory.add("assistant", response)
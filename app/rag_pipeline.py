@@ -1,71 +1,209 @@
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import FAISS
-from langchain_huggingface import HuggingFaceEmbeddings
-from groq import Groq
-from app.config import LLM_MODEL
+from app.config import (
+    CONTEXT_TOKEN_BUDGET, RETRIEVAL_CANDIDATES, EXTRACT_SERVICES_TIMEOUT, PREFETCH_TIMEOUT, OFFLINE_EXCERPT_CHARS
+)
+from app import index_cache
+from app.response_cache import get_response_cache
+from app.context_builder import build_context, estimate_tokens
+from app.hybrid_retriever import BM25Index, HybridRetriever
+from app.service_catalog import ServiceCatalog
+from app.resources import get_embeddings, get_document_registry, DocumentIndex, DocumentLease
+from app.tracing import span, observe, count
+from app.concurrency import submit, wait_for, discard, cancel_if_queued
+from app.llm_gateway import get_llm_gateway, LLMError
+from app.vector_index import compact
 import streamlit as st
 import ast
+import time
 
-def get_client():
-    return Groq(api_key=st.secrets["GROQ_API_KEY"])
-
-def process_pdf(uploaded_file):
-    if not uploaded_file: return None
-    
-    with open("temp_doc.pdf", "wb") as f:
-        f.write(uploaded_file.getbuffer())
-        
-    loader = PyPDFLoader("temp_doc.pdf")
-    documents = loader.load()
-    
-    # Store full text
-    if len(documents) < 20:
-        st.session_state.pdf_full_text = "\n\n".join([doc.page_content for doc in documents])
-    else:
-        st.session_state.pdf_full_text = None
-
-    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-    chunks = splitter.split_documents(documents)
-    
-    embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-    vectorstore = FAISS.from_documents(chunks, embeddings)
-    
-    # Extract Services (Best Effort)
-    full_text = " ".join([doc.page_content for doc in documents[:10]]) 
+def extract_services(text):
+    """Ask the LLM for bookable services. Returns None if the call failed."""
     extract_prompt = f"""
     List any bookable services (rooms, appointments, treatments) found in this text as a Python list.
     Example: ["Deluxe Room", "Consultation"]
     If none, return [].
-    Text: {full_text[:3000]}
+    Text: {text[:3000]}
     """
     try:
-        client = get_client()
-        response = client.chat.completions.create(
-            model=LLM_MODEL,
-            messages=[{"role": "user", "content": extract_prompt}],
-            temperature=0
-        )
-        content = response.choices[0].message.content
-        if "[" in content and "]" in content:
-            list_str = content[content.find("["):content.rfind("]")+1]
-            st.session_state.detected_services = ast.literal_eval(list_str)
-        else:
-            st.session_state.detected_services = []
-    except:
-        st.session_state.detected_services = []
-
-    return vectorstore
-
-def get_rag_response(query, vectorstore=None):
+        content = get_llm_gateway().complete([{"role": "user", "content": extract_prompt}], name="llm.extract_services")
+    except LLMError as e:
+        print(f"LLM Error: {e}")
+        return None
+    if "[" in content and "]" in content:
+        list_str = content[content.find("["):content.rfind("]")+1]
+        try:
+            services = ast.literal_eval(list_str)
+        except (ValueError, SyntaxError) as e:
+            print(f"Service Extraction Error: unreadable list {list_str[:80]!r} ({e})")
+            return None
+        return [str(s) for s in services if s] if isinstance(services, (list, tuple)) else None
+    return []
+
+def build_document_index(stream, cache_key, on_progress=None):
+    """Parse, embed and extract services for a PDF (or load them from the disk cache)."""
+    embeddings = get_embeddings()
+
+    # Same brochure seen before -> skip parsing, embedding and extraction
+    with span("pdf.cache_load"):
+        cached = index_cache.load(cache_key, embeddings)
+    count("index_cache.hit" if cached else "index_cache.miss")
+    if cached:
+        vectorstore, meta, extras = cached
+        bm25 = BM25Index.from_dict(extras["bm25"]) if "bm25" in extras else BM25Index.from_vectorstore(vectorstore)
+        services = meta.get("detected_services", [])
+        return DocumentIndex(vectorstore, services, meta.get("pdf_full_text"),
+                             HybridRetriever(vectorstore, bm25), ServiceCatalog(services, embeddings))
+
+    # pypdf/langchain/FAISS are only imported once someone actually uploads a PDF
+    from app.ingestion import ingest_pdf
+
+    # Service extraction (an LLM call) starts as soon as its text is read and
+    # runs while the rest of the document is still being embedded
+    extraction = []
+    try:
+        with span("pdf.ingest"):
+            result = ingest_pdf(stream, embeddings, on_progress=on_progress,
+                                on_service_text=lambda text: extraction.append(submit(extract_services, text)))
+    except Exception:
+        discard(extraction[0] if extraction else None)
+        raise
+
+    # Large documents get the configured compact / approximate index
+    with span("pdf.compact_index"):
+        result.vectorstore.index = compact(result.vectorstore.index)
+
+    # Extract Services (Best Effort)
+    with span("pdf.wait_extraction"):
+        services = wait_for(extraction[0] if extraction else None, EXTRACT_SERVICES_TIMEOUT)
+
+    # Don't cache a failed extraction, or the next upload would never retry it
+    if services is not None:
+        index_cache.save(cache_key, result.vectorstore, {
+            "pdf_full_text": result.pdf_full_text,
+            "detected_services": services,
+        }, extras={"bm25": result.bm25.to_dict()})
+
+    return DocumentIndex(result.vectorstore, services or [], result.pdf_full_text,
+                         HybridRetriever(result.vectorstore, result.bm25), ServiceCatalog(services or [], embeddings))
+
+def process_pdf(uploaded_file, on_progress=None):
+    if not uploaded_file: return None
+
+    release_pdf()
+
+    cache_key = index_cache.make_key(uploaded_file.getbuffer())
+    uploaded_file.seek(0)
+
+    # Sessions on the same PDF share one in-memory index
+    registry = get_document_registry()
+    document = registry.acquire(cache_key, lambda: build_document_index(uploaded_file, cache_key, on_progress))
+    st.session_state.document_lease = DocumentLease(cache_key, document, registry)
+
+    st.session_state.pdf_full_text = document.pdf_full_text
+    st.session_state.detected_services = list(document.detected_services)
+    return document.vectorstore
+
+def release_pdf():
+    """Give this session's shared index back to the registry."""
+    lease = st.session_state.get("document_lease")
+    if lease:
+        lease.release()
+        st.session_state.document_lease = None
+    st.session_state.pdf_full_text = None
+
+def needs_retrieval(full_text, budget=CONTEXT_TOKEN_BUDGET):
+    """Whole document only if it fits the token budget, else the best chunks up to it."""
+    return not (full_text and estimate_tokens(full_text) <= budget)
+
+def embed_query(query):
+    with span("rag.embed_query"):
+        return get_embeddings().embed_query(query)
+
+def retrieve(query, vectorstore, retriever, full_text, query_vector=None, budget=CONTEXT_TOKEN_BUDGET):
+    """Embed the query (unless given) and, if needed, fetch candidate chunks.
+    Returns (query_vector, candidates).
+
+    Safe to run on a worker thread: everything it needs is passed in.
+    """
+    if query_vector is None:
+        query_vector = embed_query(query)
+    candidates = []
+    if needs_retrieval(full_text, budget):
+        with span("rag.retrieve"):
+            if retriever:
+                # Dense + keyword search, so exact names, prices and codes are not missed
+                candidates = retriever.search(query, query_vector)
+            else:
+                scored = vectorstore.similarity_search_with_score_by_vector(query_vector, k=RETRIEVAL_CANDIDATES)
+                # FAISS returns L2 distances; turn them into "higher is better"
+                candidates = [(doc, 1 / (1 + distance)) for doc, distance in scored]
+    return query_vector, candidates
+
+def prefetch_retrieval(query, vectorstore):
+    """Start retrieve() in the background, e.g. while the intent is still being classified.
+
+    Returns a Future to pass to get_rag_response(prefetched=...), or None
+    when there is no document to search.
+    """
+    if vectorstore is None:
+        return None
+    lease = st.session_state.get("document_lease")
+    retriever = lease.document.retriever if lease else None
+    return submit(retrieve, query, vectorstore, retriever, st.session_state.get("pdf_full_text"))
+
+def get_rag_response(query, vectorstore=None, stream=False, prefetched=None, history="", use_cache=True):
+    """Answer from the PDF. With stream=True a fresh answer comes back as a
+    generator of text chunks (for st.write_stream); cached answers and errors
+    are always plain strings. `prefetched` is a Future from prefetch_retrieval(),
+    `history` the conversation so far (ConversationMemory.prompt_context()).
+    use_cache=False skips the response cache both ways, for answers that
+    depend on that history rather than on the question alone."""
     if vectorstore is None:
+        discard(prefetched)
         return "I can search the web for that. What do you need?"
 
-    if st.session_state.get("pdf_full_text"):
-        context = st.session_state.pdf_full_text
+    lease = st.session_state.get("document_lease")
+    # The response cache is keyed on (document, question) only
+    doc_key = lease.key if lease and use_cache else None
+    if lease and not use_cache:
+        count("response_cache.bypass")
+    full_text = st.session_state.get("pdf_full_text")
+
+    # Repeat questions about the same document skip the LLM entirely
+    if doc_key:
+        cached = get_response_cache().get_exact(doc_key, query)
+        if cached is not None:
+            discard(prefetched)
+            count("response_cache.hit")
+            return cached
+
+    # Retrieval may already have run alongside intent detection. If it is still
+    # queued behind background work (service extraction, summaries), do it here
+    # instead of waiting for a worker.
+    if cancel_if_queued(prefetched):
+        prefetched = None
+    retrieved = wait_for(prefetched, PREFETCH_TIMEOUT) if prefetched else None
+    query_vector = retrieved[0] if retrieved else embed_query(query)
+
+    if doc_key:
+        cached = get_response_cache().get_similar(doc_key, query_vector)
+        count("response_cache.hit" if cached is not None else "response_cache.miss")
+        if cached is not None:
+            return cached
+
+    # Earlier turns, so follow-ups like "how much is it?" make sense; they
+    # come out of the same token budget as the PDF text
+    history_block = f"\n    Conversation so far:\n    {history}\n" if history else ""
+    budget = max(0, CONTEXT_TOKEN_BUDGET - estimate_tokens(history_block))
+
+    if retrieved and (retrieved[1] or not needs_retrieval(full_text, budget)):
+        candidates = retrieved[1]
     else:
-        docs = vectorstore.similarity_search(query, k=5)
-        context = "\n\n".join(doc.page_content for doc in docs)
+        # Not prefetched, or the whole PDF fit the full budget but not what the history leaves
+        _, candidates = retrieve(query, vectorstore, lease.document.retriever if lease else None, full_text,
+                                 query_vector, budget)
+
+    with span("rag.build_context"):
+        context, _ = build_context(candidates, full_text, budget)
 
     # --- THE FIX: MANDATORY INSTRUCTION IN PROMPT ---
     role = """
@@ -82,17 +220,55 @@ def get_rag_response(query, vectorstore=None):
     
     Context:
     {context}
-    
+    {history_block}
     User Question: {query}
     """
     
+    count("llm.prompt_tokens", estimate_tokens(prompt))
+
+    messages = [{"role": "user", "content": prompt}]
+    if stream:
+        return _stream_completion(messages, doc_key, query, query_vector, context)
+
+    try:
+        answer = get_llm_gateway().complete(messages, temperature=0.3)
+    except LLMError as e:
+        print(f"LLM Error: {e}")
+        return offline_answer(context)
+    count("llm.completion_tokens", estimate_tokens(answer))
+    if doc_key:
+        get_response_cache().put(doc_key, query, query_vector, answer)
+    return answer
+
+def offline_answer(context):
+    """What to say when the LLM can't be reached: the most relevant bit of the PDF, verbatim."""
+    count("llm.fallback_answer")
+    excerpt = (context or "").strip()
+    if not excerpt:
+        return "⚠️ The assistant is unavailable right now. Please try again in a minute."
+    if len(excerpt) > OFFLINE_EXCERPT_CHARS:
+        excerpt = excerpt[:OFFLINE_EXCERPT_CHARS].rsplit(" ", 1)[0] + " ..."
+    quoted = "\n> ".join(line for line in excerpt.splitlines() if line.strip())
+    return f"⚠️ The assistant is unavailable right now, so here is the most relevant part of the document:\n\n> {quoted}"
+
+def _stream_completion(messages, doc_key, query, query_vector, context=""):
+    """Yield the answer token by token, caching the full text once it is complete."""
+    parts = []
+    start = time.perf_counter()
     try:
-        client = get_client()
-        response = client.chat.completions.create(
-            model=LLM_MODEL,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.3
-        )
-        return response.choices[0].message.content
-    except Exception as e:
-        return f"Error: {e}"
\ No newline at end of file
+        for delta in get_llm_gateway().complete(messages, temperature=0.3, stream=True):
+            if not parts:
+                observe("llm.first_token", (time.perf_counter() - start) * 1000)
+            parts.append(delta)
+            yield delta
+    except LLMError as e:
+        print(f"LLM Error: {e}")
+        yield f"\n\n⚠️ The answer was cut off ({e})." if parts else offline_answer(context)
+        return
+    finally:
+        observe("llm.stream", (time.perf_counter() - start) * 1000)
+
+    count("llm.completion_tokens", estimate_tokens("".join(parts)))
+
+    if doc_key:
+        get_response_cache().put(doc_key, query, query_vector, "".join(parts))
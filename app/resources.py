@@ -0,0 +1,114 @@
+import threading
+import weakref
+from dataclasses import dataclass, field
+from typing import Optional
+import streamlit as st
+from app.config import EMBEDDING_MODEL
+
+
+# --- EMBEDDING MODEL (one copy per process) ---
+_embeddings_loaded = False
+
+@st.cache_resource(show_spinner=False)
+def get_embeddings():
+    global _embeddings_loaded
+    from langchain_huggingface import HuggingFaceEmbeddings
+    embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+    _embeddings_loaded = True
+    return embeddings
+
+def embeddings_loaded():
+    """True once some session has paid for loading the model."""
+    return _embeddings_loaded
+
+def warm_up():
+    """Import the PDF stack and load the embedding model before the first upload needs them."""
+    try:
+        import app.ingestion  # noqa: F401  (pypdf, langchain, FAISS)
+        get_embeddings()
+    except Exception as e:
+        print(f"Warm-up Error: {e}")
+
+@st.cache_resource(show_spinner=False)
+def start_warmup():
+    """Run warm_up() once per process on a daemon thread; page loads don't wait for it."""
+    thread = threading.Thread(target=warm_up, name="warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+# --- SHARED DOCUMENT INDEXES ---
+@dataclass
+class DocumentIndex:
+    """Everything derived from one PDF. Shared between sessions, so treat as read-only."""
+    vectorstore: object
+    detected_services: list = field(default_factory=list)
+    pdf_full_text: Optional[str] = None
+    retriever: Optional[object] = None  # HybridRetriever over the same chunks
+    catalog: Optional[object] = None    # ServiceCatalog of detected_services
+
+
+class DocumentRegistry:
+    """Reference-counted map of cache key -> DocumentIndex for the whole process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}     # key -> [DocumentIndex, refcount]
+        self._key_locks = {}   # key -> Lock, so one PDF is only built once at a time
+
+    def acquire(self, key, loader):
+        """Return the shared index for `key`, building it with `loader()` on first use."""
+        with self._lock:
+            if key in self._entries:
+                self._entries[key][1] += 1
+                return self._entries[key][0]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                # Another session may have finished loading while we waited
+                if key in self._entries:
+                    self._entries[key][1] += 1
+                    return self._entries[key][0]
+
+            document = loader()
+
+            with self._lock:
+                self._entries[key] = [document, 1]
+                self._key_locks.pop(key, None)
+            return document
+
+    def release(self, key):
+        """Drop one reference; the index is freed when no session uses it."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if not entry:
+                return
+            entry[1] -= 1
+            if entry[1] <= 0:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            return {key: refs for key, (_, refs) in self._entries.items()}
+
+
+@st.cache_resource(show_spinner=False)
+def get_document_registry():
+    return DocumentRegistry()
+
+
+class DocumentLease:
+    """A session's hold on a shared index.
+
+    Kept in st.session_state; if the session goes away without releasing,
+    garbage collection of the lease releases the reference instead.
+    """
+
+    def __init__(self, key, document, registry):
+        self.key = key
+        self.document = document
+        self._finalizer = weakref.finalize(self, registry.release, key)
+
+    def release(self):
+        self._finalizer()
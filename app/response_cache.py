@@ -0,0 +1,126 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+import numpy as np
+import streamlit as st
+from app.config import (
+    RESPONSE_CACHE_THRESHOLD, RESPONSE_CACHE_TTL_SECONDS,
+    RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_MAX_MB
+)
+from app.intent import normalize_message
+
+
+@dataclass
+class CacheEntry:
+    doc_key: str
+    query: str
+    vector: np.ndarray
+    response: str
+    created: float
+    nbytes: int
+
+
+class SemanticResponseCache:
+    """RAG answers per document, matched by exact text or by query-embedding similarity.
+
+    Entries expire after `ttl` seconds; beyond `max_entries` or `max_bytes`
+    the least recently used entry (across all documents) is evicted.
+    """
+
+    def __init__(self, threshold=RESPONSE_CACHE_THRESHOLD, ttl=RESPONSE_CACHE_TTL_SECONDS,
+                 max_entries=RESPONSE_CACHE_MAX_ENTRIES, max_bytes=RESPONSE_CACHE_MAX_MB * 1024 * 1024):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._lru = OrderedDict()   # (doc_key, normalized query) -> CacheEntry
+        self._matrices = {}         # doc_key -> (keys, stacked vectors), rebuilt lazily
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get_exact(self, doc_key, query):
+        """Cheap lookup by normalized text; avoids embedding the query at all."""
+        with self._lock:
+            entry = self._touch((doc_key, normalize_message(query)))
+            if entry:
+                self.hits += 1
+                return entry.response
+        return None
+
+    def get_similar(self, doc_key, query_vector):
+        """Best cached answer for the document above the similarity threshold; counts a miss otherwise."""
+        query_vector = _unit(query_vector)
+        with self._lock:
+            keys, matrix = self._matrix(doc_key)
+            if keys:
+                scores = matrix @ query_vector
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    entry = self._touch(keys[best])
+                    if entry:
+                        self.hits += 1
+                        return entry.response
+            self.misses += 1
+        return None
+
+    def put(self, doc_key, query, query_vector, response):
+        vector = _unit(query_vector)
+        key = (doc_key, normalize_message(query))
+        entry = CacheEntry(doc_key, query, vector, response, time.time(),
+                           vector.nbytes + len(response.encode("utf-8")) + len(query.encode("utf-8")))
+        with self._lock:
+            if key in self._lru:
+                self._remove(key)
+            self._lru[key] = entry
+            self._bytes += entry.nbytes
+            self._matrices.pop(doc_key, None)
+            while self._lru and (len(self._lru) > self.max_entries or self._bytes > self.max_bytes):
+                self._remove(next(iter(self._lru)))
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._lru),
+                "bytes": self._bytes,
+            }
+
+    # --- internals (call with the lock held) ---
+    def _touch(self, key):
+        entry = self._lru.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry.created > self.ttl:
+            self._remove(key)
+            return None
+        self._lru.move_to_end(key)
+        return entry
+
+    def _remove(self, key):
+        entry = self._lru.pop(key)
+        self._bytes -= entry.nbytes
+        self._matrices.pop(entry.doc_key, None)
+
+    def _matrix(self, doc_key):
+        if doc_key not in self._matrices:
+            keys = [key for key in self._lru if key[0] == doc_key]
+            matrix = np.stack([self._lru[key].vector for key in keys]) if keys else None
+            self._matrices[doc_key] = (keys, matrix)
+        return self._matrices[doc_key]
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype="float32")
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+@st.cache_resource(show_spinner=False)
+def get_response_cache():
+    return SemanticResponseCache()
@@ -0,0 +1,107 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from app.config import (
+    SERPER_URL, SEARCH_TIMEOUT, SEARCH_POOL_SIZE,
+    SEARCH_CACHE_TTL_SECONDS, SEARCH_CACHE_SIZE, SEARCH_CACHE_PERSIST
+)
+from app.tracing import span, count
+from db.database import get_cached_search, put_cached_search
+
+
+def normalize_query(query):
+    return " ".join(query.lower().split())
+
+
+class SearchClient:
+    """Serper.dev client: pooled keep-alive session, timeouts, TTL cache and request coalescing.
+
+    Identical queries that arrive while one is already in flight wait for
+    that request instead of sending their own.
+    """
+
+    def __init__(self, url=SERPER_URL, timeout=SEARCH_TIMEOUT, ttl=SEARCH_CACHE_TTL_SECONDS,
+                 cache_size=SEARCH_CACHE_SIZE, persist=SEARCH_CACHE_PERSIST):
+        self.url = url
+        self.timeout = timeout
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self.persist = persist
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=SEARCH_POOL_SIZE,
+            max_retries=Retry(total=2, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504],
+                              allowed_methods=["POST"])
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()  # normalized query -> (expires_at, data)
+        self._inflight = {}          # normalized query -> Future
+
+    def search(self, query, api_key, num=5):
+        """Return Serper's JSON response as a dict. Raises on network/HTTP errors."""
+        key = normalize_query(query)
+
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached and cached[0] > time.time():
+                self._cache.move_to_end(key)
+                count("search_cache.hit")
+                return cached[1]
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+
+        if not leader:
+            count("search_cache.coalesced")
+            return future.result(timeout=sum(self.timeout) * 3)
+        count("search_cache.miss")
+
+        try:
+            data = self._load(key, query, api_key, num)
+            future.set_result(data)
+            return data
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _load(self, key, query, api_key, num):
+        stored = get_cached_search(key) if self.persist else None
+        if stored is not None:
+            data = json.loads(stored)
+        else:
+            with span("search.http"):
+                response = self.session.post(
+                    self.url,
+                    headers={'X-API-KEY': api_key, 'Content-Type': 'application/json'},
+                    data=json.dumps({"q": f"{query} price booking", "num": num}),
+                    timeout=self.timeout,
+                )
+            response.raise_for_status()
+            data = response.json()
+            if self.persist:
+                put_cached_search(key, json.dumps(data), self.ttl)
+
+        with self._lock:
+            self._cache[key] = (time.time() + self.ttl, data)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return data
+
+
+@st.cache_resource(show_spinner=False)
+def get_search_client():
+    return SearchClient()
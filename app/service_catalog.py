@@ -0,0 +1,110 @@
+import re
+import threading
+from collections import defaultdict
+import numpy as np
+from app.config import (
+    SERVICE_MATCH_THRESHOLD, SERVICE_MATCH_MARGIN, SERVICE_SUGGEST_MIN_SCORE, SERVICE_SUGGESTIONS,
+    SERVICE_EMBED_THRESHOLD
+)
+
+
+# Services (by Dice score) that get the exact/containment checks per lookup
+TRIGRAM_CANDIDATES = 32
+
+
+def normalize_service(text):
+    return " ".join(re.findall(r"[a-z0-9]+", text.lower()))
+
+
+def trigrams(text):
+    """Character trigrams of the normalized text, padded so word starts count extra."""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class ServiceCatalog:
+    """Fuzzy lookup over one document's services.
+
+    A character-trigram inverted index is built once, so a lookup only
+    touches services sharing a trigram with the query (typos still match).
+    If nothing scores well, the query is compared with the service names by
+    embedding similarity instead ("massage" vs "Spa Treatment").
+    """
+
+    def __init__(self, services, embeddings=None):
+        self.services = list(dict.fromkeys(s.strip() for s in services if s and s.strip()))
+        self._names = [normalize_service(s) for s in self.services]
+        sizes = []
+        postings = defaultdict(list)  # trigram -> indexes of services containing it
+        for i, name in enumerate(self._names):
+            grams = trigrams(name)
+            sizes.append(len(grams))
+            for gram in grams:
+                postings[gram].append(i)
+        self._sizes = np.array(sizes, dtype="float32")
+        self._postings = {gram: np.array(ids, dtype="int32") for gram, ids in postings.items()}
+        self._embeddings = embeddings
+        self._vectors = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.services)
+
+    def match(self, query, limit=SERVICE_SUGGESTIONS):
+        """Best `limit` services for `query` as [(service, score)], score in 0..1, best first."""
+        name = normalize_service(query)
+        if not name or not self.services:
+            return []
+        scores = self._trigram_scores(name)
+        if self._embeddings is not None and max(scores.values(), default=0.0) < SERVICE_MATCH_THRESHOLD:
+            for i, score in self._embedding_scores(query).items():
+                scores[i] = max(scores.get(i, 0.0), score)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+        return [(self.services[i], score) for i, score in ranked]
+
+    def resolve(self, query):
+        """(service, suggestions): the service if one clearly matches, else the likely candidates."""
+        matches = self.match(query)
+        if matches and matches[0][1] >= SERVICE_MATCH_THRESHOLD:
+            runner_up = matches[1][1] if len(matches) > 1 else 0.0
+            if matches[0][1] == 1.0 or matches[0][1] - runner_up >= SERVICE_MATCH_MARGIN:
+                return matches[0][0], []
+        return None, [service for service, score in matches if score >= SERVICE_SUGGEST_MIN_SCORE]
+
+    def _trigram_scores(self, name):
+        grams = trigrams(name)
+        hits = [self._postings[gram] for gram in grams if gram in self._postings]
+        if not hits:
+            return {}
+        shared = np.bincount(np.concatenate(hits), minlength=len(self.services))
+        dice = 2 * shared / (len(grams) + self._sizes)
+
+        # Only the best few by Dice get the (slower) string checks
+        top = np.flatnonzero(shared)
+        if len(top) > TRIGRAM_CANDIDATES:
+            top = top[np.argpartition(dice[top], -TRIGRAM_CANDIDATES)[-TRIGRAM_CANDIDATES:]]
+
+        scores = {}
+        for i in top.tolist():
+            candidate = self._names[i]
+            score = float(dice[i])
+            if candidate == name:
+                score = 1.0
+            elif len(name) >= 3 and (name in candidate or candidate in name):
+                # One name contains the other ("deluxe" -> "Deluxe Room")
+                score = max(score, 0.9)
+            scores[i] = score
+        return scores
+
+    def _embedding_scores(self, query):
+        try:
+            with self._lock:
+                if self._vectors is None:
+                    vectors = np.array(self._embeddings.embed_documents(self.services), dtype="float32")
+                    self._vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+            vector = np.array(self._embeddings.embed_query(query), dtype="float32")
+            similarities = self._vectors @ (vector / np.linalg.norm(vector))
+        except Exception as e:
+            print(f"Service Match Error: {e}")
+            return {}
+        return {i: float(s) for i, s in enumerate(similarities) if s >= SERVICE_EMBED_THRESHOLD}
@@ -0,0 +1,47 @@
+# Page CSS, injected once per script run by main.py
+APP_CSS = """
+<style>
+
+/* ===============================
+   BULLETPROOF FILE UPLOADER FIX
+   =============================== */
+
+[data-testid="stFileUploader"] {
+    background-color: #FFFFFF !important;
+    border: 2px dashed #2F6B3F !important;
+    border-radius: 14px !important;
+    padding: 16px !important;
+}
+
+/* FORCE VISIBILITY OF ALL CHILD ELEMENTS */
+[data-testid="stFileUploader"] * {
+    color: #000000 !important;
+    opacity: 1 !important;
+    filter: none !important;
+    visibility: visible !important;
+}
+
+/* INNER DROP ZONE */
+[data-testid="stFileUploader"] section {
+    background-color: #F5F7F9 !important;
+    border-radius: 10px !important;
+    padding: 14px !important;
+}
+
+/* BROWSE FILES BUTTON */
+[data-testid="stFileUploader"] button {
+    background-color: #2F6B3F !important;
+    color: #FFFFFF !important;
+    border-radius: 8px !important;
+    border: none !important;
+}
+
+/* MOBILE SAFETY */
+@media (max-width: 768px) {
+    [data-testid="stFileUploader"] {
+        min-height: 130px !important;
+    }
+}
+
+</style>
+"""
@@ -1,12 +1,12 @@
-import smtplib
-import requests
-import json
 import streamlit as st
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from app.config import EMAIL_SENDER, EMAIL_PASSWORD
+from app.config import EMAIL_SENDER
+from app.search_client import get_search_client
+from app.tracing import traced
 
 # --- GOOGLE SEARCH TOOL (Powered by Serper.dev) ---
+@traced("search")
 def search_web_for_services(query):
     """
     Searches Google using Serper.dev API.
@@ -18,20 +18,9 @@ def search_web_for_services(query):
     except:
         return "❌ Error: Missing 'SERPER_API_KEY' in secrets.toml. Please get one from serper.dev."
 
-    # 2. Call API
-    url = "https://google.serper.dev/search"
-    payload = json.dumps({
-        "q": f"{query} price booking",
-        "num": 5  # Get top 5 results
-    })
-    headers = {
-        'X-API-KEY': api_key,
-        'Content-Type': 'application/json'
-    }
-
+    # 2. Call API (pooled, cached, with timeouts)
     try:
-        response = requests.request("POST", url, headers=headers, data=payload)
-        data = response.json()
+        data = get_search_client().search(query, api_key, num=5)  # Get top 5 results
         
         results_list = []
         
@@ -60,29 +49,17 @@ def search_web_for_services(query):
         return f"❌ Search API Error: {e}"
 
 # --- EMAIL TOOL ---
-def send_email(to_email, booking_id, details):
-    if not EMAIL_SENDER or not EMAIL_PASSWORD:
-        return False
-
-    try:
-        msg = MIMEMultipart()
-        msg['From'] = EMAIL_SENDER
-        msg['To'] = to_email
-        msg['Subject'] = f"Booking Confirmation #{booking_id}"
-        
-        body = f"""
-        Booking Confirmed!
-        ID: {booking_id}
-        Service: {details.get('booking_type')}
-        Date: {details.get('date')}
-        """
-        msg.attach(MIMEText(body, 'plain'))
-        
-        server = smtplib.SMTP('smtp.gmail.com', 587)
-        server.starttls()
-        server.login(EMAIL_SENDER, EMAIL_PASSWORD)
-        server.send_message(msg)
-        server.quit()
-        return True
-    except:
-        return False
\ No newline at end of file
+def build_confirmation_email(to_email, booking_id, details):
+    msg = MIMEMultipart()
+    msg['From'] = EMAIL_SENDER
+    msg['To'] = to_email
+    msg['Subject'] = f"Booking Confirmation #{booking_id}"
+    
+    body = f"""
+    Booking Confirmed!
+    ID: {booking_id}
+    Service: {details.get('booking_type')}
+    Date: {details.get('date')}
+    """
+    msg.attach(MIMEText(body, 'plain'))
+    return msg
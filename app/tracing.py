@@ -0,0 +1,199 @@
+import bisect
+import contextvars
+import functools
+import inspect
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from app.config import TRACE_BUCKETS_MS, TRACE_RECENT_TURNS
+
+# The turn being traced on this thread (None outside a chat turn, e.g. in the outbox worker)
+_current_turn = contextvars.ContextVar("current_turn", default=None)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram (milliseconds), Prometheus style."""
+
+    def __init__(self, bounds=TRACE_BUCKETS_MS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last bucket is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, ms):
+        self.counts[bisect.bisect_left(self.bounds, ms)] += 1
+        self.count += 1
+        self.sum += ms
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th observation (good enough for a dashboard)."""
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for bound, n in zip(self.bounds, self.counts):
+            seen += n
+            if seen >= rank:
+                return float(bound)
+        return float("inf")
+
+
+class MetricsStore:
+    """Process-wide aggregates of every span, plus the last few traced turns."""
+
+    def __init__(self, recent_turns=TRACE_RECENT_TURNS):
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.counters = Counter()
+        self.recent_turns = deque(maxlen=recent_turns)
+
+    def observe(self, stage, ms):
+        with self._lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram()
+            histogram.observe(ms)
+
+    def incr(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def add_turn(self, turn):
+        with self._lock:
+            self.recent_turns.append(turn)
+
+    def snapshot(self):
+        """{"stages": {stage: {count, mean_ms, p50_ms, p95_ms, p99_ms}}, "counters": {...}, "turns": [...]}"""
+        with self._lock:
+            stages = {
+                stage: {
+                    "count": h.count,
+                    "mean_ms": h.sum / h.count,
+                    "p50_ms": h.quantile(0.50),
+                    "p95_ms": h.quantile(0.95),
+                    "p99_ms": h.quantile(0.99),
+                }
+                for stage, h in sorted(self.histograms.items())
+            }
+            return {"stages": stages, "counters": dict(self.counters), "turns": list(self.recent_turns)}
+
+    def to_prometheus(self):
+        """Text exposition format (version 0.0.4)."""
+        lines = [
+            "# HELP neostats_stage_duration_seconds Time spent in each pipeline stage.",
+            "# TYPE neostats_stage_duration_seconds histogram",
+        ]
+        with self._lock:
+            for stage, h in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, n in zip(list(h.bounds) + ["+Inf"], h.counts):
+                    cumulative += n
+                    le = bound if bound == "+Inf" else f"{bound / 1000:g}"
+                    lines.append(f'neostats_stage_duration_seconds_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+                lines.append(f'neostats_stage_duration_seconds_sum{{stage="{stage}"}} {h.sum / 1000:.6f}')
+                lines.append(f'neostats_stage_duration_seconds_count{{stage="{stage}"}} {h.count}')
+            lines += [
+                "# HELP neostats_events_total Cache hits/misses, token counts and other pipeline events.",
+                "# TYPE neostats_events_total counter",
+            ]
+            lines += [f'neostats_events_total{{event="{name}"}} {n}' for name, n in sorted(self.counters.items())]
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+            self.recent_turns.clear()
+
+
+_metrics = MetricsStore()
+
+
+def get_metrics():
+    return _metrics
+
+
+# --- SPANS ---
+@contextmanager
+def span(name):
+    """Time a block as stage `name`; nested spans are recorded independently."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, (time.perf_counter() - start) * 1000)
+
+
+def observe(name, ms):
+    """Record a duration measured some other way (e.g. time to first streamed token)."""
+    _metrics.observe(name, ms)
+    turn = _current_turn.get()
+    if turn is not None:
+        turn["spans"].append((name, round(ms, 2)))
+
+
+def traced(name):
+    """Decorator form of span(); generator functions are timed until exhausted."""
+    def decorator(fn):
+        if inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def gen_wrapper(*args, **kwargs):
+                with span(name):
+                    yield from fn(*args, **kwargs)
+            return gen_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name, n=1):
+    """Count an event (cache hit, tokens, ...) globally and on the current turn."""
+    _metrics.incr(name, n)
+    turn = _current_turn.get()
+    if turn is not None:
+        turn["counters"][name] += n
+
+
+@contextmanager
+def trace_turn(kind="chat"):
+    """Collect every span/count inside the block into one turn record."""
+    turn = {"kind": kind, "started": time.time(), "spans": [], "counters": Counter()}
+    token = _current_turn.set(turn)
+    start = time.perf_counter()
+    try:
+        yield turn
+    finally:
+        _current_turn.reset(token)
+        turn["total_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        turn["counters"] = dict(turn["counters"])
+        _metrics.observe("turn", turn["total_ms"])
+        _metrics.add_turn(turn)
+
+
+# --- PROMETHEUS ENDPOINT ---
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = _metrics.to_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_metrics_server(port, host="127.0.0.1"):
+    """Serve /metrics on a daemon thread; returns the server (call .shutdown() to stop)."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
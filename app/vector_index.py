@@ -0,0 +1,127 @@
+import os
+import pickle
+import numpy as np
+from app.config import (
+    VECTOR_INDEX_BACKEND, VECTOR_INDEX_MIN_CHUNKS, VECTOR_INDEX_MMAP, VECTOR_INDEX_HNSW_M, VECTOR_INDEX_EF_SEARCH,
+    VECTOR_INDEX_NPROBE_SHARE, VECTOR_INDEX_PQ_BYTES, VECTOR_INDEX_PQ_MIN_VECTORS, VECTOR_INDEX_TRAIN_SIZE
+)
+
+BACKENDS = ("flat", "fp16", "sq8", "ivf", "ivfpq", "hnsw")
+
+
+def pq_shape(n, d):
+    """(sub-quantizers, bits each) for PQ codes of VECTOR_INDEX_PQ_BYTES on `n` vectors of dimension `d`.
+
+    Each codebook of 2**bits centroids wants ~39 training vectors per
+    centroid, so smaller samples get fewer bits and more sub-quantizers for
+    the same code size.
+    """
+    bits = max(1, min(8, int(np.log2(max(2, min(n, VECTOR_INDEX_TRAIN_SIZE) // 39)))))
+    m = max(k for k in range(1, min(d, VECTOR_INDEX_PQ_BYTES * 8 // bits) + 1) if d % k == 0)
+    return m, bits
+
+
+def factory_string(backend, n, d):
+    """faiss.index_factory description of `backend` for `n` vectors of dimension `d`."""
+    if backend == "flat":
+        return "Flat"
+    if backend == "fp16":
+        return "SQfp16"
+    if backend == "sq8":
+        return "SQ8"
+    if backend == "hnsw":
+        return f"HNSW{VECTOR_INDEX_HNSW_M}_SQ8"
+    if backend in ("ivf", "ivfpq"):
+        # ~4*sqrt(n) lists, each with enough training vectors for its centroid
+        nlist = max(1, min(int(4 * n ** 0.5), min(n, VECTOR_INDEX_TRAIN_SIZE) // 39))
+        if backend == "ivf":
+            return f"IVF{nlist},SQ8"
+        m, bits = pq_shape(n, d)
+        return f"IVF{nlist},PQ{m}x{bits}"
+    raise ValueError(f"Unknown vector index backend: {backend} (expected one of {', '.join(BACKENDS)})")
+
+
+def build_index(vectors, backend, seed=0):
+    """A trained FAISS index of type `backend` holding float32 `vectors` (n x d), in order."""
+    import faiss
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    n, d = vectors.shape
+    if backend == "ivfpq" and n < VECTOR_INDEX_PQ_MIN_VECTORS:
+        # PQ codes this coarse lose too much recall on a brochure-sized index, whatever the tuning
+        print(f"Vector index: ivfpq needs {VECTOR_INDEX_PQ_MIN_VECTORS}+ vectors; using ivf")
+        backend = "ivf"
+    index = faiss.index_factory(d, factory_string(backend, n, d))
+    configure(index)
+    if not index.is_trained:
+        sample = vectors
+        if n > VECTOR_INDEX_TRAIN_SIZE:
+            sample = vectors[np.random.default_rng(seed).choice(n, VECTOR_INDEX_TRAIN_SIZE, replace=False)]
+        index.train(sample)
+    index.add(vectors)
+    configure(index)
+    return index
+
+
+def configure(index):
+    """Apply the search settings, plus the id -> vector map that reranking needs for IVF."""
+    import faiss
+    concrete = faiss.downcast_index(index)
+    if hasattr(concrete, "hnsw"):
+        concrete.hnsw.efSearch = VECTOR_INDEX_EF_SEARCH
+    try:
+        ivf = faiss.extract_index_ivf(index)
+    except RuntimeError:
+        return index
+    # A fixed share of the lists, so recall holds as nlist grows with the index
+    ivf.nprobe = max(1, min(ivf.nlist, round(ivf.nlist * VECTOR_INDEX_NPROBE_SHARE)))
+    if hasattr(ivf, "use_precomputed_table"):
+        # The PQ lookup table (nlist x 256 x bytes floats) can outweigh the codes themselves
+        ivf.use_precomputed_table = -1
+    if ivf.direct_map.type == faiss.DirectMap.NoMap:
+        ivf.make_direct_map()
+    return index
+
+
+def compact(index, backend=VECTOR_INDEX_BACKEND, min_chunks=VECTOR_INDEX_MIN_CHUNKS):
+    """Swap a flat index for `backend` once it holds `min_chunks` vectors; smaller ones stay exact.
+
+    Vectors keep their positions, so the vectorstore's id mapping stays valid.
+    """
+    if backend == "flat" or index.ntotal < min_chunks:
+        return index
+    return build_index(index.reconstruct_n(0, index.ntotal), backend)
+
+
+def read_index(path, mmap=VECTOR_INDEX_MMAP):
+    """Read a saved index, memory-mapped (read-only) if possible so processes share its pages."""
+    import faiss
+    if mmap:
+        read_only = getattr(faiss, "IO_FLAG_READ_ONLY", 0) | getattr(faiss, "IO_FLAG_SKIP_PRECOMPUTE_TABLE", 0)
+        mmap_flag = getattr(faiss, "IO_FLAG_MMAP", 0)
+        codes_flag = getattr(faiss, "IO_FLAG_MMAP_IFC", 0)  # zero-copy vector storage (flat/SQ/HNSW)
+        # Not every index type takes every flag (IVF lists only take IO_FLAG_MMAP)
+        for flags in (mmap_flag | codes_flag, mmap_flag, codes_flag):
+            if not flags:
+                continue
+            try:
+                return configure(faiss.read_index(path, flags | read_only))
+            except RuntimeError:
+                continue
+        print(f"Vector index: could not memory-map {path}; reading it into memory")
+    return configure(faiss.read_index(path, getattr(faiss, "IO_FLAG_SKIP_PRECOMPUTE_TABLE", 0)))
+
+
+def load_vectorstore(folder, embeddings, mmap=VECTOR_INDEX_MMAP):
+    """FAISS.load_local(folder) with the index read through read_index()."""
+    from langchain_community.vectorstores import FAISS
+    index = read_index(os.path.join(folder, "index.faiss"), mmap)
+    # We wrote these files ourselves, so the pickled docstore is trusted
+    with open(os.path.join(folder, "index.pkl"), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    return FAISS(embeddings, index, docstore, index_to_docstore_id)
+
+
+def index_bytes(index):
+    """Serialized size of the index, a close proxy for the memory it takes when loaded."""
+    import faiss
+    return faiss.serialize_index(index).nbytes
@@ -2,49 +2,713 @@
 
 import sqlite3
 import os
-from app.config import DB_NAME
+import re
+import csv
+import io
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from datetime import datetime, timedelta
+from app.tracing import traced
+from app.config import (
+    DB_PATH, DB_BUSY_TIMEOUT_MS, DB_MMAP_SIZE, DB_CACHED_STATEMENTS, DB_POOL_SIZE,
+    OPEN_TIME, CLOSE_TIME, SLOT_MINUTES, DEFAULT_SLOT_CAPACITY, SLOT_CAPACITY, SUGGESTED_SLOTS, SLOT_SEARCH_DAYS
+)
 
+
+# --- CONNECTION MANAGEMENT ---
+class ConnectionManager:
+    """A small pool of long-lived SQLite connections, checked out per call or transaction.
+
+    Streamlit runs every rerun on a fresh thread, so connections are pooled
+    rather than tied to threads: they (and their PRAGMAs and prepared
+    statements) survive across reruns. Connections run in WAL mode so
+    readers never block the writer, wait on locks for DB_BUSY_TIMEOUT_MS,
+    and keep their prepared statements cached (the SQL below is all
+    constant strings, so each statement is compiled once per connection).
+    A thread that already holds a connection gets the same one back, so
+    nested calls share its transaction instead of taking a second slot.
+    """
+
+    def __init__(self, path=DB_PATH, pool_size=DB_POOL_SIZE):
+        self.path = path
+        self.pool_size = pool_size
+        self._idle = queue.LifoQueue()  # Most recently used first: its pages are warm
+        self._opened = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def connection(self):
+        """Check a connection out of the pool for the duration of the block."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            yield conn
+            return
+        conn = self._checkout()
+        self._local.conn = conn
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            self._idle.put(conn)
+
+    def _checkout(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            room = self._opened < self.pool_size
+            if room:
+                self._opened += 1
+        if room:
+            try:
+                return self._connect()
+            except BaseException:
+                with self._lock:
+                    self._opened -= 1
+                raise
+        try:
+            return self._idle.get(timeout=DB_BUSY_TIMEOUT_MS / 1000)
+        except queue.Empty:
+            raise sqlite3.OperationalError(f"no free database connection within {DB_BUSY_TIMEOUT_MS} ms") from None
+
+    def _connect(self):
+        folder = os.path.dirname(self.path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder, exist_ok=True)
+        # Autocommit mode: transactions are opened explicitly in transaction().
+        # Pooled connections move between threads, but only one uses them at a time.
+        conn = sqlite3.connect(self.path, timeout=DB_BUSY_TIMEOUT_MS / 1000, isolation_level=None,
+                               cached_statements=DB_CACHED_STATEMENTS, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA busy_timeout={int(DB_BUSY_TIMEOUT_MS)}")
+        conn.execute("PRAGMA synchronous=NORMAL")  # Safe with WAL; skips an fsync per commit
+        conn.execute(f"PRAGMA mmap_size={int(DB_MMAP_SIZE)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    @contextmanager
+    def transaction(self, immediate=False):
+        """Commit on success, roll back on error.
+
+        immediate=True takes the write lock up front, so read-then-write
+        sequences can't be interleaved with another writer.
+        """
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def connect(self):
+        """A separate, caller-owned connection (e.g. for a long export that shouldn't tie up the pool)."""
+        return self._connect()
+
+    def close(self):
+        """Close the idle connections in the pool (call once the database is no longer in use)."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            conn.close()
+            with self._lock:
+                self._opened -= 1
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+def get_db():
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = ConnectionManager()
+    return _manager
+
+def configure_db(path):
+    """Point the module at another database file (scripts, stress tests)."""
+    global _manager
+    with _manager_lock:
+        if _manager is not None:
+            _manager.close()
+        _manager = ConnectionManager(path)
+    return _manager
+
+
+# --- SCHEMA ---
 def init_db():
-    if not os.path.exists("db"):
-        os.makedirs("db")
-    
-    conn = sqlite3.connect(os.path.join("db", DB_NAME))
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS customers 
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, email TEXT, phone TEXT)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS bookings 
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT, customer_id INTEGER, 
-                  booking_type TEXT, date TEXT, time TEXT, status TEXT, 
-                  FOREIGN KEY(customer_id) REFERENCES customers(id))''')
-    conn.commit()
-    conn.close()
+    with get_db().transaction() as conn:
+        conn.execute('''CREATE TABLE IF NOT EXISTS customers
+                     (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, email TEXT, phone TEXT)''')
+        conn.execute('''CREATE TABLE IF NOT EXISTS bookings
+                     (id INTEGER PRIMARY KEY AUTOINCREMENT, customer_id INTEGER,
+                      booking_type TEXT, date TEXT, time TEXT, status TEXT, name TEXT, phone TEXT,
+                      FOREIGN KEY(customer_id) REFERENCES customers(id))''')
+        # Contact details as given for each booking (the customer row keeps the first ones)
+        booking_columns = {row[1] for row in conn.execute("PRAGMA table_info(bookings)")}
+        for column in ("name", "phone"):
+            if column not in booking_columns:
+                conn.execute(f"ALTER TABLE bookings ADD COLUMN {column} TEXT")
+        conn.execute('''CREATE TABLE IF NOT EXISTS email_outbox
+                     (id INTEGER PRIMARY KEY AUTOINCREMENT, to_email TEXT, message TEXT,
+                      status TEXT DEFAULT 'pending', attempts INTEGER DEFAULT 0,
+                      next_attempt_at REAL, last_error TEXT, created_at REAL, sent_at REAL)''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_outbox_due ON email_outbox (status, next_attempt_at)")
+        conn.execute('''CREATE TABLE IF NOT EXISTS search_cache
+                     (query TEXT PRIMARY KEY, response TEXT, expires_at REAL)''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_bookings_slot ON bookings (booking_type, date, time)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_bookings_date ON bookings (date)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_bookings_status ON bookings (status)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_bookings_customer ON bookings (customer_id)")
+        # NOCASE so "email LIKE 'abc%'" (case-insensitive) can use the index
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_customers_email ON customers (email COLLATE NOCASE)")
+        slots_exist = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'slot_reservations'").fetchone()
+        conn.execute('''CREATE TABLE IF NOT EXISTS slot_reservations
+                     (booking_type TEXT, date TEXT, slot TEXT, reserved INTEGER NOT NULL,
+                      PRIMARY KEY (booking_type, date, slot)) WITHOUT ROWID''')
+        if not slots_exist:
+            _backfill_slot_reservations(conn)
+
+        # Analytics summary tables, kept current by the same transactions that write bookings
+        stats_exist = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'booking_stats_daily'").fetchone()
+        conn.execute("CREATE TABLE IF NOT EXISTS booking_stats_daily (date TEXT PRIMARY KEY, bookings INTEGER, cancelled INTEGER)")
+        conn.execute("CREATE TABLE IF NOT EXISTS booking_stats_service (booking_type TEXT PRIMARY KEY, bookings INTEGER, cancelled INTEGER)")
+        # One row per hour 0-23; bookings whose time doesn't parse are left out of it
+        conn.execute("CREATE TABLE IF NOT EXISTS booking_stats_hour (hour INTEGER, bookings INTEGER, cancelled INTEGER, "
+                     "PRIMARY KEY (hour)) WITHOUT ROWID")
+        conn.execute("CREATE TABLE IF NOT EXISTS booking_funnel (event TEXT PRIMARY KEY, count INTEGER)")
+        if not stats_exist:
+            _rebuild_booking_stats(conn)
+
+        # One customer row per normalized email
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'idx_customers_email_norm'").fetchone():
+            _merge_duplicate_customers(conn)
+
+
+# --- SLOT CAPACITY ---
+class SlotUnavailable(Exception):
+    """The requested slot has no capacity left."""
+
+
+def slot_capacity(booking_type):
+    return SLOT_CAPACITY.get(booking_type, DEFAULT_SLOT_CAPACITY)
+
+@lru_cache(maxsize=4096)
+def parse_booking_time(time_str):
+    """Stored times are '10:40 AM'; older rows may be 24h '10:40'. (Cached: few distinct values, strptime is slow.)"""
+    for fmt in ("%I:%M %p", "%H:%M"):
+        try:
+            return datetime.strptime(time_str.strip(), fmt).time()
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognised time: {time_str}")
+
+def slot_start(time_str):
+    """'10:40 AM' -> '10:30' (24h start of the SLOT_MINUTES slot it falls in)."""
+    t = parse_booking_time(time_str)
+    minutes = (t.hour * 60 + t.minute) // SLOT_MINUTES * SLOT_MINUTES
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+RESERVE_SLOT = """
+    INSERT INTO slot_reservations (booking_type, date, slot, reserved) VALUES (?, ?, ?, 1)
+    ON CONFLICT (booking_type, date, slot) DO UPDATE SET reserved = reserved + 1 WHERE reserved < ?
+"""
+
+def reserve_slot(conn, booking_type, date, time_str):
+    """Take one unit of capacity inside the caller's transaction, or raise SlotUnavailable."""
+    cur = conn.execute(RESERVE_SLOT, (booking_type, date, slot_start(time_str), slot_capacity(booking_type)))
+    if cur.rowcount == 0:
+        raise SlotUnavailable(f"{booking_type} is fully booked on {date} at {time_str}")
+
+def release_slot(conn, booking_type, date, time_str):
+    conn.execute("UPDATE slot_reservations SET reserved = reserved - 1 "
+                 "WHERE booking_type = ? AND date = ? AND slot = ? AND reserved > 0",
+                 (booking_type, date, slot_start(time_str)))
 
+@traced("db.slot_check")
+def is_slot_available(booking_type, date, time_str):
+    with get_db().connection() as conn:
+        row = conn.execute("SELECT reserved FROM slot_reservations WHERE booking_type = ? AND date = ? AND slot = ?",
+                           (booking_type, date, slot_start(time_str))).fetchone()
+    return (row[0] if row else 0) < slot_capacity(booking_type)
+
+@traced("db.next_free_slots")
+def next_free_slots(booking_type, date, time_str, n=SUGGESTED_SLOTS, days=SLOT_SEARCH_DAYS):
+    """The next `n` slots with capacity left, starting at the requested one.
+
+    Returns [(date 'YYYY-MM-DD', time 'HH:MM AM/PM')]. One indexed range
+    query per day scanned.
+    """
+    capacity = slot_capacity(booking_type)
+    start = datetime.strptime(f"{date} {slot_start(time_str)}", "%Y-%m-%d %H:%M")
+    now = datetime.now()
+    found = []
+    with get_db().connection() as conn:
+        for offset in range(days):
+            day = start.date() + timedelta(days=offset)
+            day_str = day.isoformat()
+            reserved = dict(conn.execute("SELECT slot, reserved FROM slot_reservations WHERE booking_type = ? AND date = ?",
+                                         (booking_type, day_str)).fetchall())
+            slot = datetime.combine(day, OPEN_TIME if offset else max(start.time(), OPEN_TIME))
+            while slot.time() <= CLOSE_TIME and slot.date() == day:
+                if slot > now and reserved.get(slot.strftime("%H:%M"), 0) < capacity:
+                    found.append((day_str, slot.strftime("%I:%M %p")))
+                    if len(found) >= n:
+                        return found
+                slot += timedelta(minutes=SLOT_MINUTES)
+    return found
+
+def _backfill_slot_reservations(conn):
+    """Count bookings made before slot tracking existed."""
+    counts = {}
+    for booking_type, date, time_str in conn.execute("SELECT booking_type, date, time FROM bookings WHERE status = 'Confirmed'"):
+        try:
+            key = (booking_type, date, slot_start(time_str))
+        except (ValueError, AttributeError):
+            continue
+        counts[key] = counts.get(key, 0) + 1
+    conn.executemany("INSERT INTO slot_reservations (booking_type, date, slot, reserved) VALUES (?, ?, ?, ?)",
+                     [(*key, count) for key, count in counts.items()])
+
+
+# --- CUSTOMERS ---
+def normalize_email(email):
+    return email.strip().lower()
+
+def normalize_phone(phone):
+    return re.sub(r"[^\d+]", "", phone or "")
+
+# Anyone can type an existing customer's email, so a booking never rewrites the stored
+# details; it only fills ones that are missing. Per-booking details live on bookings.
+UPSERT_CUSTOMER_MANY = """
+    INSERT INTO customers (name, email, phone, email_norm, phone_norm) VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (email_norm) DO UPDATE SET name = coalesce(name, excluded.name),
+        phone = coalesce(phone, excluded.phone), phone_norm = coalesce(phone_norm, excluded.phone_norm)
+"""
+UPSERT_CUSTOMER = UPSERT_CUSTOMER_MANY + "RETURNING id"
+
+def upsert_customer(conn, name, email, phone):
+    """Return the customer id for this email, creating the row if there is none (existing details are kept)."""
+    return conn.execute(UPSERT_CUSTOMER, (name, email, phone, normalize_email(email), normalize_phone(phone))).fetchone()[0]
+
+def _merge_duplicate_customers(conn):
+    """One-off migration: add normalized columns, fold duplicate customers into the oldest row, add the unique index.
+
+    Customers without an email get a NULL email_norm: the unique index
+    allows any number of those, so they are never merged with each other.
+    """
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(customers)")}
+    if "email_norm" not in columns:
+        conn.execute("ALTER TABLE customers ADD COLUMN email_norm TEXT")
+    if "phone_norm" not in columns:
+        conn.execute("ALTER TABLE customers ADD COLUMN phone_norm TEXT")
+
+    rows = conn.execute("SELECT id, email, phone FROM customers").fetchall()
+    conn.executemany("UPDATE customers SET email_norm = ?, phone_norm = ? WHERE id = ?",
+                     [(normalize_email(email or "") or None, normalize_phone(phone), cid) for cid, email, phone in rows])
+
+    # Bookings from before bookings.name/phone existed show their customer's details; pin
+    # those down before the customer rows are merged away
+    conn.execute("UPDATE bookings SET name = coalesce(name, (SELECT name FROM customers WHERE id = customer_id)), "
+                 "phone = coalesce(phone, (SELECT phone FROM customers WHERE id = customer_id)) "
+                 "WHERE name IS NULL OR phone IS NULL")
+
+    duplicates = conn.execute("SELECT email_norm, MIN(id) FROM customers WHERE email_norm IS NOT NULL "
+                              "GROUP BY email_norm HAVING COUNT(*) > 1").fetchall()
+    for email_norm, keep_id in duplicates:
+        # Keep the oldest row and its details, like a new booking would; only fill what it is missing
+        conn.execute("UPDATE customers SET name = (SELECT name FROM customers WHERE email_norm = ? AND name IS NOT NULL "
+                     "ORDER BY id LIMIT 1) WHERE id = ? AND name IS NULL", (email_norm, keep_id))
+        conn.execute("UPDATE customers SET (phone, phone_norm) = (SELECT phone, phone_norm FROM customers "
+                     "WHERE email_norm = ? AND phone IS NOT NULL ORDER BY id LIMIT 1) WHERE id = ? AND phone IS NULL",
+                     (email_norm, keep_id))
+        conn.execute("UPDATE bookings SET customer_id = ? WHERE customer_id IN "
+                     "(SELECT id FROM customers WHERE email_norm = ? AND id != ?)", (keep_id, email_norm, keep_id))
+        conn.execute("DELETE FROM customers WHERE email_norm = ? AND id != ?", (email_norm, keep_id))
+
+    conn.execute("CREATE UNIQUE INDEX idx_customers_email_norm ON customers (email_norm)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_customers_phone_norm ON customers (phone_norm)")
+    if duplicates:
+        print(f"Merged duplicate customers for {len(duplicates)} email addresses")
+
+
+# --- QUERIES ---
+INSERT_BOOKING = "INSERT INTO bookings (customer_id, booking_type, date, time, status, name, phone) VALUES (?, ?, ?, ?, ?, ?, ?)"
+# Older bookings have no name of their own; they show the customer's
+SELECT_ALL_BOOKINGS = """
+    SELECT b.id, coalesce(b.name, c.name), c.email, b.booking_type, b.date, b.time, b.status
+    FROM bookings b JOIN customers c ON b.customer_id = c.id
+"""
+
+@traced("db.save_booking")
 def save_booking_to_db(data):
+    """Reserve the slot and insert the booking in one transaction.
+
+    Returns the booking id, or None on a DB error. Raises SlotUnavailable
+    if the slot is already at capacity (nothing is written in that case).
+    """
     try:
-        conn = sqlite3.connect(os.path.join("db", DB_NAME))
-        c = conn.cursor()
-        c.execute("INSERT INTO customers (name, email, phone) VALUES (?, ?, ?)", 
-                  (data['name'], data['email'], data['phone']))
-        customer_id = c.lastrowid
-        c.execute("INSERT INTO bookings (customer_id, booking_type, date, time, status) VALUES (?, ?, ?, ?, ?)", 
-                  (customer_id, data['booking_type'], data['date'], data['time'], "Confirmed"))
-        booking_id = c.lastrowid
-        conn.commit()
-        return booking_id
+        with get_db().transaction(immediate=True) as conn:
+            reserve_slot(conn, data['booking_type'], data['date'], data['time'])
+            customer_id = upsert_customer(conn, data['name'], data['email'], data['phone'])
+            c = conn.execute(INSERT_BOOKING, (customer_id, data['booking_type'], data['date'], data['time'], "Confirmed",
+                                              data['name'], data['phone']))
+            _bump_booking_stats(conn, data['booking_type'], data['date'], data['time'], bookings=1)
+            _bump_funnel(conn, "confirmed")
+            return c.lastrowid
+    except SlotUnavailable:
+        raise
     except Exception as e:
         print(f"DB Error: {e}")
         return None
-    finally:
-        conn.close()
+
+ADD_RESERVATIONS = """
+    INSERT INTO slot_reservations (booking_type, date, slot, reserved) VALUES (?, ?, ?, ?)
+    ON CONFLICT (booking_type, date, slot) DO UPDATE SET reserved = reserved + excluded.reserved
+"""
+
+@traced("db.bulk_insert")
+def bulk_insert_bookings(rows):
+    """Insert validated bookings (dicts like save_booking_to_db takes) in one transaction.
+
+    Slot capacity is checked for the whole batch up front, in row order, so
+    earlier rows win a contested slot; everything else is written with
+    executemany. The funnel is not bumped (imports are not conversations).
+    Returns [(index in rows, error)] for the rows that were not inserted.
+    """
+    rejected = []
+    try:
+        with get_db().transaction(immediate=True) as conn:
+            # --- CAPACITY ---
+            reserved, accepted = {}, []
+            for i, data in enumerate(rows):
+                key = (data['booking_type'], data['date'], slot_start(data['time']))
+                if key not in reserved:
+                    row = conn.execute("SELECT reserved FROM slot_reservations WHERE booking_type = ? AND date = ? AND slot = ?",
+                                       key).fetchone()
+                    reserved[key] = [row[0] if row else 0, 0]
+                taken, added = reserved[key]
+                if taken + added >= slot_capacity(data['booking_type']):
+                    rejected.append((i, f"{data['booking_type']} is fully booked on {data['date']} at {data['time']}"))
+                    continue
+                reserved[key][1] += 1
+                accepted.append(data)
+            if not accepted:
+                return rejected
+            conn.executemany(ADD_RESERVATIONS, [(*key, added) for key, (_, added) in reserved.items() if added])
+
+            # --- CUSTOMERS (an existing customer's details are kept) ---
+            conn.executemany(UPSERT_CUSTOMER_MANY, [(d['name'], d['email'], d['phone'], normalize_email(d['email']),
+                                                     normalize_phone(d['phone'])) for d in accepted])
+            emails = list({normalize_email(d['email']) for d in accepted})
+            customer_ids = dict(conn.execute(f"SELECT email_norm, id FROM customers WHERE email_norm IN "
+                                             f"({', '.join('?' * len(emails))})", emails).fetchall())
+
+            # --- BOOKINGS + STATS ---
+            conn.executemany(INSERT_BOOKING, [(customer_ids[normalize_email(d['email'])], d['booking_type'], d['date'],
+                                               d['time'], "Confirmed", d['name'], d['phone']) for d in accepted])
+            _bump_booking_stats_many(conn, [(d['booking_type'], d['date'], d['time']) for d in accepted])
+        return rejected
+    except Exception as e:
+        print(f"DB Error: {e}")
+        return [(i, f"database error: {e}") for i in range(len(rows))]
 
 def fetch_all_bookings():
-    if not os.path.exists(os.path.join("db", DB_NAME)): return []
-    conn = sqlite3.connect(os.path.join("db", DB_NAME))
-    try:
-        data = conn.execute("""
-            SELECT b.id, c.name, c.email, b.booking_type, b.date, b.time, b.status 
-            FROM bookings b JOIN customers c ON b.customer_id = c.id
-        """).fetchall()
-        return data
+    if not os.path.exists(get_db().path): return []
+    try:
+        with get_db().connection() as conn:
+            return conn.execute(SELECT_ALL_BOOKINGS).fetchall()
     except: return []
-    finally: conn.close()
\ No newline at end of file
+
+def cancel_booking(booking_id):
+    """Cancel a confirmed booking, freeing its slot. Returns False if there was nothing to cancel."""
+    with get_db().transaction(immediate=True) as conn:
+        row = conn.execute("SELECT booking_type, date, time FROM bookings WHERE id = ? AND status = 'Confirmed'",
+                           (booking_id,)).fetchone()
+        if not row:
+            return False
+        conn.execute("UPDATE bookings SET status = 'Cancelled' WHERE id = ?", (booking_id,))
+        release_slot(conn, *row)
+        _bump_booking_stats(conn, *row, cancelled=1)
+        return True
+
+def _booking_filters(date_from=None, date_to=None, status=None, service=None, email=None):
+    """WHERE clause + params shared by the paged query and its count."""
+    clauses, params = [], []
+    if date_from:
+        clauses.append("b.date >= ?")
+        params.append(str(date_from))
+    if date_to:
+        clauses.append("b.date <= ?")
+        params.append(str(date_to))
+    if status:
+        clauses.append("b.status = ?")
+        params.append(status)
+    if service:
+        clauses.append("b.booking_type = ?")
+        params.append(service)
+    if email:
+        # Prefix match only, so the NOCASE email index is usable
+        clauses.append("c.email LIKE ? ESCAPE '\\'")
+        params.append(email.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+    return clauses, params
+
+@traced("db.query_bookings")
+def query_bookings(page_size=50, before_id=None, **filters):
+    """One page of bookings, newest first, filtered in SQL.
+
+    Keyset pagination: pass the smallest id of the current page as
+    `before_id` to get the next one. Filters: date_from, date_to, status,
+    service, email (prefix).
+    """
+    clauses, params = _booking_filters(**filters)
+    if before_id is not None:
+        clauses.append("b.id < ?")
+        params.append(before_id)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    try:
+        with get_db().connection() as conn:
+            return conn.execute(f"{SELECT_ALL_BOOKINGS} {where} ORDER BY b.id DESC LIMIT ?",
+                                (*params, page_size)).fetchall()
+    except sqlite3.Error as e:
+        print(f"DB Error: {e}")
+        return []
+
+@traced("db.count_bookings")
+def count_bookings(**filters):
+    clauses, params = _booking_filters(**filters)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    try:
+        with get_db().connection() as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM bookings b JOIN customers c ON b.customer_id = c.id {where}",
+                                params).fetchone()[0]
+    except sqlite3.Error:
+        return 0
+
+EXPORT_COLUMNS = ["id", "name", "email", "booking_type", "date", "time", "status"]
+
+def iter_bookings(chunk_size=1000, **filters):
+    """Yield bookings (oldest first) in lists of at most `chunk_size` rows.
+
+    Uses its own connection and a single read transaction, so the export
+    sees one consistent snapshot while SQLite steps through the rows; only
+    one chunk is ever held in memory.
+    """
+    clauses, params = _booking_filters(**filters)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    conn = get_db().connect()
+    try:
+        conn.execute("BEGIN")
+        cursor = conn.execute(f"{SELECT_ALL_BOOKINGS} {where} ORDER BY b.id", params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+
+def export_bookings(out, fmt="csv", chunk_size=1000, **filters):
+    """Write bookings to the binary file object `out` as CSV or Parquet, chunk by chunk.
+
+    Parquet needs pyarrow (installed with Streamlit); each chunk becomes a
+    row group. Returns the number of rows written.
+    """
+    written = 0
+    if fmt == "csv":
+        text = io.TextIOWrapper(out, encoding="utf-8", newline="", write_through=True)
+        try:
+            writer = csv.writer(text)
+            writer.writerow(EXPORT_COLUMNS)
+            for rows in iter_bookings(chunk_size, **filters):
+                writer.writerows(rows)
+                written += len(rows)
+        finally:
+            text.detach()  # Leave `out` open for the caller, even after an error
+        return written
+
+    if fmt == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        schema = pa.schema([("id", pa.int64())] + [(name, pa.string()) for name in EXPORT_COLUMNS[1:]])
+        with pq.ParquetWriter(out, schema) as writer:
+            for rows in iter_bookings(chunk_size, **filters):
+                columns = list(zip(*rows))
+                writer.write_table(pa.Table.from_arrays([pa.array(col, type=field.type) for col, field in zip(columns, schema)],
+                                                        schema=schema))
+                written += len(rows)
+        return written
+
+    raise ValueError(f"Unsupported export format: {fmt}")
+
+def list_booking_types():
+    """Distinct services, read from the (booking_type, ...) index."""
+    try:
+        with get_db().connection() as conn:
+            return [row[0] for row in conn.execute("SELECT DISTINCT booking_type FROM bookings ORDER BY booking_type")]
+    except sqlite3.Error:
+        return []
+
+
+# --- EMAIL OUTBOX ---
+OUTBOX_LEASE_SECONDS = 300  # A claimed email is retried if its sender dies mid-batch
+
+def enqueue_email(to_email, message):
+    """Store a rendered email for the background sender. Returns the outbox id."""
+    now = time.time()
+    with get_db().transaction() as conn:
+        c = conn.execute("INSERT INTO email_outbox (to_email, message, status, next_attempt_at, created_at) "
+                         "VALUES (?, ?, 'pending', ?, ?)", (to_email, message, now, now))
+        return c.lastrowid
+
+def claim_due_emails(limit):
+    """Lease up to `limit` due emails to the caller: [(id, to_email, message, attempts)]."""
+    now = time.time()
+    with get_db().transaction(immediate=True) as conn:
+        rows = conn.execute("SELECT id, to_email, message, attempts FROM email_outbox "
+                            "WHERE status = 'pending' AND next_attempt_at <= ? ORDER BY next_attempt_at LIMIT ?",
+                            (now, limit)).fetchall()
+        conn.executemany("UPDATE email_outbox SET next_attempt_at = ? WHERE id = ?",
+                         [(now + OUTBOX_LEASE_SECONDS, row[0]) for row in rows])
+        return rows
+
+def mark_emails_sent(email_ids):
+    """Record delivered emails, all in one transaction."""
+    now = time.time()
+    with get_db().transaction() as conn:
+        conn.executemany("UPDATE email_outbox SET status = 'sent', sent_at = ?, attempts = attempts + 1, last_error = NULL "
+                         "WHERE id = ?", [(now, email_id) for email_id in email_ids])
+
+def mark_email_failed(email_id, error, retry_at=None):
+    """Record a failed attempt; retry at `retry_at`, or give up if it is None."""
+    with get_db().transaction() as conn:
+        conn.execute("UPDATE email_outbox SET status = ?, attempts = attempts + 1, last_error = ?, next_attempt_at = ? "
+                     "WHERE id = ?", ("pending" if retry_at else "failed", str(error), retry_at, email_id))
+
+def outbox_counts():
+    try:
+        with get_db().connection() as conn:
+            return dict(conn.execute("SELECT status, COUNT(*) FROM email_outbox GROUP BY status").fetchall())
+    except sqlite3.Error:
+        return {}
+
+
+# --- WEB SEARCH CACHE ---
+def get_cached_search(query):
+    """Cached JSON text for a normalized query, or None if missing or expired."""
+    try:
+        with get_db().connection() as conn:
+            row = conn.execute("SELECT response FROM search_cache WHERE query = ? AND expires_at > ?",
+                               (query, time.time())).fetchone()
+        return row[0] if row else None
+    except sqlite3.Error:
+        return None
+
+def put_cached_search(query, response, ttl):
+    try:
+        with get_db().transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO search_cache (query, response, expires_at) VALUES (?, ?, ?)",
+                         (query, response, time.time() + ttl))
+            # Opportunistic cleanup keeps the table from growing forever
+            conn.execute("DELETE FROM search_cache WHERE expires_at <= ?", (time.time(),))
+    except sqlite3.Error as e:
+        print(f"DB Error: {e}")
+
+
+# --- ANALYTICS ---
+BUMP_STATS = {
+    "booking_stats_daily": "date",
+    "booking_stats_service": "booking_type",
+    "booking_stats_hour": "hour",
+}
+
+def _booking_hour(time_str):
+    try:
+        return parse_booking_time(time_str).hour
+    except (ValueError, AttributeError):
+        return None
+
+BUMP_STATS_SQL = ("INSERT INTO {table} ({column}, bookings, cancelled) VALUES (?, ?, ?) "
+                  "ON CONFLICT ({column}) DO UPDATE SET bookings = bookings + excluded.bookings, "
+                  "cancelled = cancelled + excluded.cancelled")
+
+def _bump_booking_stats(conn, booking_type, date, time_str, bookings=0, cancelled=0):
+    """Add to the summary counters inside the caller's transaction."""
+    keys = {"date": date, "booking_type": booking_type, "hour": _booking_hour(time_str)}
+    for table, column in BUMP_STATS.items():
+        # A time that doesn't parse has no hour; it still counts per day and service
+        if keys[column] is not None:
+            conn.execute(BUMP_STATS_SQL.format(table=table, column=column), (keys[column], bookings, cancelled))
+
+def _bump_booking_stats_many(conn, bookings):
+    """Count new confirmed bookings [(booking_type, date, time)] with one executemany per table."""
+    counts = {column: {} for column in BUMP_STATS.values()}
+    for booking_type, date, time_str in bookings:
+        for column, key in (("date", date), ("booking_type", booking_type), ("hour", _booking_hour(time_str))):
+            if key is not None:
+                counts[column][key] = counts[column].get(key, 0) + 1
+    for table, column in BUMP_STATS.items():
+        conn.executemany(BUMP_STATS_SQL.format(table=table, column=column),
+                         [(key, n, 0) for key, n in counts[column].items()])
+
+def compute_booking_stats(conn=None):
+    """Brute-force aggregates straight from the bookings table (backfill and verification)."""
+    if conn is None:
+        with get_db().connection() as conn:
+            return compute_booking_stats(conn)
+    stats = {table: {} for table in BUMP_STATS}
+    keys = {}
+    for booking_type, date, time_str, status in conn.execute("SELECT booking_type, date, time, status FROM bookings"):
+        keys["date"], keys["booking_type"], keys["hour"] = date, booking_type, _booking_hour(time_str)
+        for table, column in BUMP_STATS.items():
+            if keys[column] is None:
+                continue
+            counts = stats[table].setdefault(keys[column], [0, 0])
+            counts[0] += 1
+            counts[1] += status == "Cancelled"
+    return stats
+
+def _rebuild_booking_stats(conn):
+    for table in BUMP_STATS:
+        conn.execute(f"DELETE FROM {table}")
+    for table, rows in compute_booking_stats(conn).items():
+        conn.executemany(f"INSERT INTO {table} ({BUMP_STATS[table]}, bookings, cancelled) VALUES (?, ?, ?)",
+                         [(key, b, c) for key, (b, c) in rows.items()])
+
+def fetch_booking_stats():
+    """Read the summary tables (sizes bounded by days/services/24 hours, not by bookings)."""
+    with get_db().connection() as conn:
+        stats = {table: {row[0]: [row[1], row[2]] for row in conn.execute(f"SELECT {column}, bookings, cancelled FROM {table}")}
+                 for table, column in BUMP_STATS.items()}
+        stats["funnel"] = dict(conn.execute("SELECT event, count FROM booking_funnel").fetchall())
+    return stats
+
+def verify_booking_stats():
+    """True if the incremental aggregates match a full recomputation."""
+    stored = fetch_booking_stats()
+    return all(stored[table] == rows for table, rows in compute_booking_stats().items())
+
+def _bump_funnel(conn, event):
+    conn.execute("INSERT INTO booking_funnel (event, count) VALUES (?, 1) "
+                 "ON CONFLICT (event) DO UPDATE SET count = count + 1", (event,))
+
+def record_funnel_event(event):
+    """Count a step of the booking funnel, e.g. 'started' when a booking conversation begins."""
+    try:
+        with get_db().transaction() as conn:
+            _bump_funnel(conn, event)
+    except sqlite3.Error as e:
+        print(f"DB Error: {e}")
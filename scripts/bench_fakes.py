@@ -0,0 +1,374 @@
+"""Local stand-ins for every external service the bot talks to.
+
+Used by the benchmark/load-test scripts so they run offline, deterministically
+and with controllable latency:
+
+- FakeGroq: drop-in for groq.Groq (chat.completions.create, incl. stream=True)
+- StubLLMServer: FakeGroq behind a local OpenAI-style HTTP API, with injectable errors
+- StubSerperServer: local HTTP server answering like google.serper.dev
+- SmtpSink: minimal SMTP server that accepts and counts messages
+- FakeEmbeddings: deterministic hashed bag-of-words embeddings (no model download)
+- ThreadLocalSessionState: per-thread st.session_state, one per virtual user
+- make_pdf: builds a small text PDF in memory
+"""
+import hashlib
+import io
+import json
+import random
+import re
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+# --- LLM ---
+class FakeGroq:
+    """Answers like the Groq SDK after `latency` seconds (± `jitter`).
+
+    Streams emit the first token after `latency`, then one token every
+    `token_interval` seconds.
+    """
+
+    def __init__(self, latency=0.3, jitter=0.1, token_interval=0.01, services=("Deluxe Room", "Spa Massage")):
+        self.latency = latency
+        self.jitter = jitter
+        self.token_interval = token_interval
+        self.services = list(services)
+        self.calls = 0
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, model=None, messages=None, temperature=None, stream=False, **kwargs):
+        with self._lock:
+            self.calls += 1
+        prompt = messages[-1]["content"]
+        time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+        content = self._answer(prompt)
+        if stream:
+            return self._stream(content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+    def _stream(self, content):
+        for i, token in enumerate(re.findall(r"\S+\s*", content)):
+            if i:
+                time.sleep(self.token_interval)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=token))])
+
+    def _answer(self, prompt):
+        if "Classify the user's intent" in prompt:
+            message = prompt.split('"')[1].lower() if '"' in prompt else prompt.lower()
+            if any(w in message for w in ("book", "reserve", "slot", "appointment")):
+                return "BOOKING"
+            if any(w in message for w in ("find", "search", "near")):
+                return "SEARCH"
+            return "CHAT"
+        if "bookable services" in prompt:
+            return json.dumps(self.services)
+        return ("The Deluxe Room costs 120 dollars per night and includes breakfast. "
+                "To book this, simply type: 'I want to book Deluxe Room'.")
+
+
+class StubLLMServer:
+    """Serves FakeGroq's answers over HTTP the way Groq's API does, so the real SDK can talk to it.
+
+    Point a client at `base_url`. A share `error_rate` of requests get
+    `error_status` (503 by default) instead; pass `seed` to make which
+    ones repeatable. Counts requests, TCP connections (to check
+    keep-alive) and the most requests seen at once.
+    """
+
+    def __init__(self, fake=None, error_rate=0.0, error_status=503, seed=None):
+        self.fake = fake or FakeGroq(latency=0.05, jitter=0.0, token_interval=0.0)
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._rng = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+        self.connections = 0
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive
+            disable_nagle_algorithm = True  # headers and body are separate writes; don't stall on delayed ACKs
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connections += 1
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with stub._lock:
+                    stub.requests += 1
+                    stub._in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub._in_flight)
+                try:
+                    self._answer(body)
+                finally:
+                    with stub._lock:
+                        stub._in_flight -= 1
+
+            def _answer(self, body):
+                fake = stub.fake
+                time.sleep(max(0.0, fake.latency + random.uniform(-fake.jitter, fake.jitter)))
+                with stub._lock:
+                    fail = stub._rng.random() < stub.error_rate
+                    if fail:
+                        stub.errors += 1
+                if fail:
+                    return self._send_json({"error": {"message": "stub outage", "type": "server_error"}},
+                                           stub.error_status)
+                content = fake._answer(body["messages"][-1]["content"])
+                with fake._lock:
+                    fake.calls += 1
+                base = {"id": "chatcmpl-stub", "created": int(time.time()), "model": body.get("model", "stub")}
+                if not body.get("stream"):
+                    return self._send_json({**base, "object": "chat.completion", "choices": [
+                        {"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}
+                    ]})
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for i, token in enumerate(re.findall(r"\S+\s*", content)):
+                    if i:
+                        time.sleep(fake.token_interval)
+                    self._send_chunk({**base, "object": "chat.completion.chunk", "choices": [
+                        {"index": 0, "delta": {"content": token}, "finish_reason": None}
+                    ]})
+                self._send_chunk("[DONE]")
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _send_chunk(self, event):
+                data = f"data: {event if isinstance(event, str) else json.dumps(event)}\n\n".encode()
+                self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+
+            def _send_json(self, payload, status=200):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    @property
+    def calls(self):
+        return self.fake.calls
+
+    def close(self):
+        self.server.shutdown()
+
+
+# --- WEB SEARCH ---
+class StubSerperServer:
+    """Serves canned Serper.dev JSON on a random local port after `latency` seconds."""
+
+    def __init__(self, latency=0.2):
+        self.latency = latency
+        self.requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                query = json.loads(self.rfile.read(int(self.headers["Content-Length"]))).get("q", "")
+                stub.requests += 1
+                time.sleep(stub.latency)
+                body = json.dumps({"organic": [
+                    {"title": f"Result {i} for {query}", "link": f"https://example.com/{i}", "snippet": "Great value."}
+                    for i in range(5)
+                ]}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/search"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+
+
+# --- EMAIL ---
+class SmtpSink:
+    """Just enough SMTP (no TLS, no auth) to accept and count messages."""
+
+    def __init__(self):
+        sink = self
+        self.messages = 0
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                def reply(line):
+                    self.wfile.write((line + "\r\n").encode())
+                reply("220 sink ready")
+                in_data = False
+                for raw in self.rfile:
+                    line = raw.decode("utf-8", "replace").rstrip("\r\n")
+                    if in_data:
+                        if line == ".":
+                            in_data = False
+                            sink.messages += 1
+                            reply("250 queued")
+                        continue
+                    command = line[:4].upper()
+                    if command in ("EHLO", "HELO"):
+                        reply("250 sink")
+                    elif command == "DATA":
+                        in_data = True
+                        reply("354 end with .")
+                    elif command == "QUIT":
+                        reply("221 bye")
+                        return
+                    else:
+                        reply("250 ok")
+
+        socketserver.ThreadingTCPServer.daemon_threads = True
+        self.server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+        self.host, self.port = self.server.server_address
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+
+
+# --- EMBEDDINGS ---
+class FakeEmbeddings(Embeddings):
+    """Hashed bag-of-words vectors: deterministic, instant, and similar texts stay similar."""
+
+    def __init__(self, size=384, latency=0.0):
+        self.size = size
+        self.latency = latency
+
+    def _embed(self, text):
+        vector = np.zeros(self.size, dtype="float32")
+        for token in re.findall(r"[a-z0-9]+", text.lower()):
+            digest = int(hashlib.md5(token.encode()).hexdigest(), 16)
+            vector[digest % self.size] += 1.0 if digest & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        if self.latency:
+            time.sleep(self.latency * len(texts))
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text):
+        if self.latency:
+            time.sleep(self.latency)
+        return self._embed(text)
+
+
+# --- STREAMLIT SESSION ---
+class ThreadLocalSessionState:
+    """Stands in for st.session_state so each benchmark thread is its own user."""
+
+    def __init__(self):
+        object.__setattr__(self, "_local", threading.local())
+
+    @property
+    def _data(self):
+        local = object.__getattribute__(self, "_local")
+        if not hasattr(local, "data"):
+            local.data = {}
+        return local.data
+
+    def __getattr__(self, name):
+        try:
+            return self._data[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        self._data[name] = value
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __setitem__(self, key, value):
+        self._data[key] = value
+
+    def __delitem__(self, key):
+        del self._data[key]
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        return self._data.get(key, default)
+
+    def setdefault(self, key, default=None):
+        return self._data.setdefault(key, default)
+
+    def pop(self, key, *default):
+        return self._data.pop(key, *default)
+
+    def clear(self):
+        self._data.clear()
+
+
+# --- PDF ---
+class FakeUpload(io.BytesIO):
+    """Looks enough like Streamlit's UploadedFile for process_pdf."""
+
+    def __init__(self, data, file_id="bench"):
+        super().__init__(data)
+        self.file_id = file_id
+
+
+def make_pdf(pages):
+    """Minimal valid PDF with one Helvetica text block per page (each line of `pages[i]` is a line)."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>"]
+    kids = " ".join(f"{3 + 2 * i} 0 R" for i in range(len(pages)))
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>")
+    font_ref = 3 + 2 * len(pages)
+    for i, text in enumerate(pages):
+        lines = " ".join(f"({line.replace('(', '').replace(')', '')}) Tj T*" for line in text.split("\n"))
+        stream = f"BT /F1 9 Tf 20 810 Td 11 TL {lines} ET"
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents {4 + 2 * i} 0 R "
+                       f"/Resources << /Font << /F1 {font_ref} 0 R >> >> >>")
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out = "%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n"
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF"
+    return out.encode("latin-1")
+
+
+def make_brochure(pages=5, lines_per_page=40, seed=0):
+    """A fake service brochure; different seeds give different content (and cache keys)."""
+    rng = random.Random(seed)
+    services = ["Deluxe Room", "Suite", "Spa Massage", "Haircut", "Consultation", "Yoga Class"]
+    return make_pdf([
+        "\n".join(f"{rng.choice(services)} code R-{p}{i:02d} costs {rng.randint(20, 500)} dollars per session "
+                  f"and includes complimentary extras {seed}" for i in range(lines_per_page))
+        for p in range(pages)
+    ])
@@ -0,0 +1,330 @@
+"""End-to-end load test with every external service replaced by a local fake.
+
+Virtual users (one thread each, with their own session state) run scripted
+conversations through chat_logic.route_query exactly like the Streamlit page
+does:
+
+- chat:    upload the shared brochure, then ask a few questions (streamed RAG answers)
+- search:  web searches answered by a local Serper stub
+- booking: the full booking flow, ending in a saved booking and a queued email
+- ingest:  upload a brochure nobody has seen before (parse + embed + extract)
+
+Groq, Serper, SMTP and the embedding model are swapped for the fakes in
+bench_fakes.py (with --llm-http the real Groq SDK talks to a local stub
+server instead, through the same LLM gateway as in production, and
+--llm-error-rate makes that stub fail some requests), the database and
+index cache go to a temp dir, and
+p50/p95/p99 latency plus throughput are reported per stage. Save a run with
+--json and pass it back as --baseline to fail when a stage's p95 regresses.
+
+Usage:
+    python scripts/bench_load.py --users 16 --conversations 200 --llm-latency 0.3
+    python scripts/bench_load.py --json before.json
+    python scripts/bench_load.py --llm-http --llm-error-rate 0.1
+    python scripts/bench_load.py --baseline before.json --tolerance 0.25
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import streamlit as st
+from bench_fakes import (
+    FakeGroq, StubLLMServer, StubSerperServer, SmtpSink, FakeEmbeddings, ThreadLocalSessionState, FakeUpload, make_brochure
+)
+
+# The app reads these on first use (the outbox needs a sender, web search a Serper key)
+st.secrets = {
+    "GROQ_API_KEY": "bench", "SERPER_API_KEY": "bench", "ADMIN_PASSWORD": "bench",
+    "EMAIL_SENDER": "bench@example.com", "EMAIL_PASSWORD": "bench",
+}
+st.session_state = ThreadLocalSessionState()
+# st.spinner warns once per worker thread in bare mode
+logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").setLevel(logging.ERROR)
+
+import smtplib
+from app import (
+    chat_logic, rag_pipeline, booking_flow, intent, resources, index_cache, email_outbox, tools, conversation_memory
+)
+from app.config import SEARCH_CACHE_TTL_SECONDS
+from app.search_client import SearchClient
+from app.llm_gateway import LLMGateway
+from app.tracing import trace_turn, get_metrics
+from app.conversation_memory import ConversationMemory
+from db import database
+
+CHAT_QUESTIONS = [
+    "What does the Deluxe Room cost?",
+    "Is breakfast included with the suite?",
+    "How long is a spa massage session?",
+    "What extras come with a haircut?",
+    "Tell me about the yoga class",
+    "Deluxe room breakfast details please",
+]
+SEARCH_QUERIES = ["Find hotels in Bangalore", "Search for salons near me", "Find yoga classes in Pune"]
+
+
+# --- MEASUREMENT ---
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = defaultdict(list)
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self.samples[stage].append(seconds)
+
+    def timed(self, stage, fn):
+        """Wrap `fn` so every call is recorded; generators are timed until exhausted."""
+        recorder = self
+
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            result = fn(*args, **kwargs)
+            if not hasattr(result, "__next__"):
+                recorder.add(stage, time.perf_counter() - start)
+                return result
+
+            def stream():
+                first = True
+                for chunk in result:
+                    if first:
+                        recorder.add(f"{stage}.first_token", time.perf_counter() - start)
+                        first = False
+                    yield chunk
+                recorder.add(stage, time.perf_counter() - start)
+            return stream()
+        return wrapper
+
+
+def percentile(sorted_values, p):
+    return sorted_values[max(0, math.ceil(p / 100 * len(sorted_values)) - 1)]
+
+
+def summarize(recorder, wall_seconds):
+    report = {}
+    for stage, values in sorted(recorder.samples.items()):
+        values = sorted(values)
+        report[stage] = {
+            "count": len(values),
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+            "mean_ms": sum(values) / len(values) * 1000,
+            "per_sec": len(values) / wall_seconds,
+        }
+    return report
+
+
+def print_report(report, wall_seconds, conversations):
+    print(f"\n{'stage':<24}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'mean ms':>10}{'per s':>9}")
+    for stage, row in report.items():
+        print(f"{stage:<24}{row['count']:>7}{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}"
+              f"{row['p99_ms']:>10.1f}{row['mean_ms']:>10.1f}{row['per_sec']:>9.1f}")
+    print(f"\n{conversations} conversations in {wall_seconds:.2f}s ({conversations / wall_seconds:.1f}/s)")
+
+
+def compare(report, baseline, tolerance):
+    """Stages whose p95 got more than `tolerance` slower than the baseline run."""
+    regressions = []
+    for stage, row in report.items():
+        before = baseline.get(stage)
+        if before and row["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{stage}: p95 {before['p95_ms']:.1f}ms -> {row['p95_ms']:.1f}ms")
+    return regressions
+
+
+# --- WIRING ---
+def install_fakes(args, workdir, recorder):
+    """Point the app at the fakes and a scratch DB; returns the servers to shut down."""
+    database.configure_db(os.path.join(workdir, "bench.db"))
+    database.init_db()
+    database.DEFAULT_SLOT_CAPACITY = 10 ** 6
+    index_cache.INDEX_CACHE_DIR = os.path.join(workdir, "index_cache")
+
+    groq = FakeGroq(latency=args.llm_latency, jitter=args.llm_latency / 3, token_interval=args.token_interval)
+    if args.llm_http:
+        groq = StubLLMServer(groq, error_rate=args.llm_error_rate)
+        gateway = LLMGateway(api_key="bench", base_url=groq.base_url, backoff=0.05)
+    else:
+        gateway = LLMGateway(client=groq)
+    for module in (chat_logic, rag_pipeline, conversation_memory):
+        module.get_llm_gateway = lambda: gateway
+
+    embeddings = FakeEmbeddings(latency=args.embed_latency)
+    for module in (resources, rag_pipeline, intent):
+        module.get_embeddings = lambda: embeddings
+    resources._embeddings_loaded = True
+
+    serper = StubSerperServer(latency=args.search_latency)
+    search_client = SearchClient(url=serper.url, persist=not args.cold,
+                                 ttl=0 if args.cold else SEARCH_CACHE_TTL_SECONDS)
+    tools.get_search_client = lambda: search_client
+
+    sink = SmtpSink()
+    worker = email_outbox.OutboxWorker(smtp_factory=lambda: smtplib.SMTP(sink.host, sink.port, timeout=10),
+                                       poll_seconds=0.5)
+    worker.drain_once = recorder.timed("email.batch", worker.drain_once)
+    worker.start()
+    email_outbox.get_outbox_worker = lambda: worker
+
+    # Stage timers (patched where route_query and the booking flow look them up)
+    chat_logic.detect_intent_with_ai = recorder.timed("intent", chat_logic.detect_intent_with_ai)
+    chat_logic.get_rag_response = recorder.timed("rag", chat_logic.get_rag_response)
+    chat_logic.search_web_for_services = recorder.timed("search", chat_logic.search_web_for_services)
+    booking_flow.save_booking_to_db = recorder.timed("db.save", booking_flow.save_booking_to_db)
+    rag_pipeline.build_document_index = recorder.timed("pdf.index", rag_pipeline.build_document_index)
+    return groq, serper, sink, worker
+
+
+# --- CONVERSATIONS ---
+def new_session():
+    st.session_state.clear()
+    st.session_state.memory = ConversationMemory()
+    st.session_state.booking_state = {"active": False, "data": {}, "current_field": None}
+    st.session_state.vectorstore = None
+
+
+def turn(recorder, kind, message):
+    memory = st.session_state.memory
+    memory.add("user", message)
+    start = time.perf_counter()
+    with trace_turn(kind):
+        reply = chat_logic.route_query(message, st.session_state.vectorstore, memory)
+        if not isinstance(reply, str):
+            reply = "".join(reply)
+    recorder.add(f"turn.{kind}", time.perf_counter() - start)
+    memory.add("assistant", reply)
+    return reply
+
+
+def upload(recorder, data, file_id):
+    start = time.perf_counter()
+    st.session_state.vectorstore = rag_pipeline.process_pdf(FakeUpload(data, file_id))
+    recorder.add("pdf.upload", time.perf_counter() - start)
+
+
+def run_conversation(n, kind, recorder, shared_pdf, args):
+    new_session()
+    rng = random.Random(n)
+    if kind == "chat":
+        upload(recorder, shared_pdf, "shared")
+        for question in rng.sample(CHAT_QUESTIONS, 3):
+            turn(recorder, kind, question)
+    elif kind == "search":
+        turn(recorder, kind, rng.choice(SEARCH_QUERIES))
+    elif kind == "booking":
+        script = ["I want to book an appointment", f"Bench User {n}", f"bench{n}@example.com", "9876543210",
+                  f"Bench Service {n}", "2099-01-01", "10:00 AM", "yes"]
+        for message in script:
+            reply = turn(recorder, kind, message)
+        if "Booking Confirmed" not in reply:
+            raise RuntimeError(f"booking {n} did not complete: {reply[:80]}")
+    elif kind == "ingest":
+        upload(recorder, make_brochure(pages=args.pdf_pages, seed=1000 + n), f"ingest-{n}")
+        turn(recorder, kind, rng.choice(CHAT_QUESTIONS))
+    rag_pipeline.release_pdf()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=8, help="Concurrent virtual users")
+    parser.add_argument("--conversations", type=int, default=80)
+    parser.add_argument("--mix", default="chat=4,search=2,booking=3,ingest=1",
+                        help="Relative weight of each conversation kind")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Seconds before the fake LLM answers")
+    parser.add_argument("--token-interval", type=float, default=0.01, help="Seconds between streamed tokens")
+    parser.add_argument("--llm-http", action="store_true", help="Serve the fake LLM over HTTP to the real Groq SDK")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="Share of stub LLM requests that fail (--llm-http)")
+    parser.add_argument("--search-latency", type=float, default=0.2)
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="Seconds per embedded text")
+    parser.add_argument("--pdf-pages", type=int, default=5)
+    parser.add_argument("--cold", action="store_true", help="Disable the web search cache")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write the per-stage report here")
+    parser.add_argument("--baseline", help="Earlier --json report to compare p95s against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed p95 slowdown vs the baseline")
+    args = parser.parse_args()
+
+    weights = {kind: int(w) for kind, w in (part.split("=") for part in args.mix.split(","))}
+    rng = random.Random(args.seed)
+    plan = rng.choices(list(weights), weights=list(weights.values()), k=args.conversations)
+
+    recorder = Recorder()
+    failures = []
+    with tempfile.TemporaryDirectory() as workdir:
+        groq, serper, sink, worker = install_fakes(args, workdir, recorder)
+        shared_pdf = make_brochure(pages=args.pdf_pages)
+
+        def run(item):
+            n, kind = item
+            try:
+                run_conversation(n, kind, recorder, shared_pdf, args)
+            except Exception as e:
+                failures.append(f"{kind} #{n}: {e!r}")
+
+        print(f"Running {args.conversations} conversations with {args.users} users: "
+              + ", ".join(f"{k}={plan.count(k)}" for k in weights))
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.users) as pool:
+            list(pool.map(run, enumerate(plan)))
+        wall = time.perf_counter() - start
+
+        # Wait for the outbox to deliver every confirmation
+        expected = plan.count("booking") - sum(1 for f in failures if f.startswith("booking"))
+        deadline = time.time() + 30
+        while sink.messages < expected and time.time() < deadline:
+            worker.wake()
+            time.sleep(0.1)
+        drained = time.perf_counter() - start
+
+        worker.stop(timeout=5)
+        serper.close()
+        sink.close()
+        if args.llm_http:
+            groq.close()
+        database.get_db().close()
+
+    report = summarize(recorder, wall)
+    print_report(report, wall, args.conversations)
+    print(f"LLM calls: {groq.calls}{f' ({groq.errors} failed, {groq.connections} connections)' if args.llm_http else ''}, Serper requests: {serper.requests}, "
+          f"emails delivered: {sink.messages}/{expected} ({drained:.2f}s incl. outbox)")
+    print("App counters: " + ", ".join(f"{k}={v}" for k, v in sorted(get_metrics().snapshot()["counters"].items())))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    ok = True
+    if failures:
+        ok = False
+        print(f"\n{len(failures)} conversations failed:")
+        for failure in failures[:10]:
+            print(f"  {failure}")
+    if sink.messages < expected:
+        ok = False
+        print(f"\nOnly {sink.messages} of {expected} confirmation emails were delivered")
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            ok = False
+            print(f"\np95 regressions (> {args.tolerance:.0%}):")
+            for line in regressions:
+                print(f"  {line}")
+    print("\nPASS" if ok else "\nFAIL")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
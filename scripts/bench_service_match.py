@@ -0,0 +1,74 @@
+"""Lookup latency and accuracy of the fuzzy service matcher (app/service_catalog.py).
+
+Builds a synthetic catalog of N services, then looks up exact names, names
+with a typo and partial names (the adjective left out), and reports
+per-lookup latency and how often the intended service was resolved or at
+least suggested. Trigram index only; the embedding fallback is not
+exercised here.
+
+Usage:
+    python scripts/bench_service_match.py --services 5000 --queries 2000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.service_catalog import ServiceCatalog
+
+KINDS = ["Room", "Suite", "Massage", "Facial", "Haircut", "Consultation", "Class", "Tour", "Package", "Checkup"]
+ADJECTIVES = ["Deluxe", "Premium", "Classic", "Family", "Express", "Signature", "Garden", "Ocean", "Royal", "Junior"]
+
+
+def make_services(n, rng):
+    services = set()
+    while len(services) < n:
+        services.add(f"{rng.choice(ADJECTIVES)} {rng.choice(KINDS)} {rng.randint(1, 999)}")
+    return sorted(services)
+
+
+def typo(text, rng):
+    i = rng.randrange(len(text))
+    return text[:i] + text[i + 1:] if rng.random() < 0.5 else text[:i] + rng.choice("aeiou") + text[i:]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--services", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    services = make_services(args.services, rng)
+    start = time.perf_counter()
+    catalog = ServiceCatalog(services)
+    print(f"Indexed {len(catalog)} services in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    variants = {
+        "exact": lambda s: s,
+        "lowercase": lambda s: s.lower(),
+        "typo": lambda s: typo(s, rng),
+        "partial": lambda s: s.split(" ", 1)[1],
+    }
+    print(f"\n{'query':<11}{'p50 ms':>9}{'p95 ms':>9}{'resolved':>10}{'suggested':>11}")
+    for label, make_query in variants.items():
+        timings, resolved, suggested = [], 0, 0
+        for target in rng.choices(services, k=args.queries):
+            query = make_query(target)
+            t = time.perf_counter()
+            match, suggestions = catalog.resolve(query)
+            timings.append((time.perf_counter() - t) * 1000)
+            resolved += match == target
+            suggested += match == target or target in suggestions
+        timings.sort()
+        print(f"{label:<11}{statistics.median(timings):>9.3f}{timings[int(len(timings) * 0.95)]:>9.3f}"
+              f"{resolved / args.queries:>10.0%}{suggested / args.queries:>11.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Cold-start benchmark: how long a fresh process takes before it can serve a page.
+
+Each sample runs in a new Python process (so nothing is already imported):
+
+- import:    streamlit + every module app/main.py imports at startup
+- first run: the whole app/main.py script once, via Streamlit's AppTest,
+             against a scratch database
+
+It also fails if a heavy dependency (torch, langchain, FAISS, ...) gets
+imported at startup, since those should only load on the first PDF upload.
+Save a run with --json and pass it back as --baseline to catch regressions.
+
+Usage:
+    python scripts/bench_startup.py --runs 5
+    python scripts/bench_startup.py --importtime 15
+    python scripts/bench_startup.py --baseline startup.json --tolerance 0.25
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+HEAVY_MODULES = ["torch", "sentence_transformers", "transformers", "faiss", "langchain_community",
+                 "langchain_huggingface", "langchain_text_splitters", "pypdf", "groq"]
+SECRETS = {"GROQ_API_KEY": "bench", "EMAIL_SENDER": "", "EMAIL_PASSWORD": "", "ADMIN_PASSWORD": "bench"}
+
+IMPORT_PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+import streamlit as st
+streamlit_done = time.perf_counter()
+st.secrets = {SECRETS!r}
+import app.chat_logic, app.rag_pipeline, app.resources, app.styles, app.email_outbox, app.tracing, db.database
+done = time.perf_counter()
+print(json.dumps({{
+    "streamlit": streamlit_done - start,
+    "app": done - streamlit_done,
+    "heavy": sorted(m for m in {HEAVY_MODULES!r} if m in sys.modules),
+}}))
+"""
+
+FIRST_RUN_PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file({os.path.join(ROOT, "app", "main.py")!r}, default_timeout=300)
+at.secrets.update({SECRETS!r})
+at.run()
+print(json.dumps({{
+    "first_run": time.perf_counter() - start,
+    "errors": [str(e.value) for e in at.exception],
+    "heavy": sorted(m for m in {HEAVY_MODULES!r} if m in sys.modules),
+}}))
+"""
+
+
+def probe(code, cwd):
+    """Run `code` in a fresh interpreter and return the JSON it printed last."""
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    out = subprocess.run([sys.executable, "-c", code], cwd=cwd, env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(n):
+    """Top `n` modules by cumulative import time (python -X importtime)."""
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    err = subprocess.run([sys.executable, "-X", "importtime", "-c", IMPORT_PROBE], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True).stderr
+    rows = []
+    for line in err.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line.split(":", 1)[1].split("|")
+        rows.append((int(cumulative_us), int(self_us), name.strip()))
+    return sorted(rows, reverse=True)[:n]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes per measurement")
+    parser.add_argument("--skip-first-run", action="store_true", help="Only measure imports")
+    parser.add_argument("--importtime", type=int, default=0, help="Also list the N slowest imports")
+    parser.add_argument("--json", help="Write the medians here")
+    parser.add_argument("--baseline", help="Earlier --json report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown vs the baseline")
+    args = parser.parse_args()
+
+    samples = {"streamlit": [], "app": [], "first_run": []}
+    heavy = set()
+    errors = []
+    with tempfile.TemporaryDirectory() as workdir:
+        # DB_PATH is relative, so the scratch dir gets its own db/bookings.db
+        os.makedirs(os.path.join(workdir, "db"))
+        for _ in range(args.runs):
+            result = probe(IMPORT_PROBE, workdir)
+            samples["streamlit"].append(result["streamlit"])
+            samples["app"].append(result["app"])
+            heavy.update(result["heavy"])
+            if not args.skip_first_run:
+                result = probe(FIRST_RUN_PROBE, workdir)
+                samples["first_run"].append(result["first_run"])
+                heavy.update(result["heavy"])
+                errors += result["errors"]
+
+    report = {name: statistics.median(values) * 1000 for name, values in samples.items() if values}
+    print(f"{'measurement':<14}{'median ms':>11}{'min ms':>9}{'max ms':>9}   ({args.runs} fresh processes)")
+    for name, values in samples.items():
+        if values:
+            print(f"{name:<14}{report[name]:>11.0f}{min(values) * 1000:>9.0f}{max(values) * 1000:>9.0f}")
+
+    if args.importtime:
+        print("\nSlowest imports (cumulative ms):")
+        for cumulative, own, name in slowest_imports(args.importtime):
+            print(f"{cumulative / 1000:>9.1f}  {name}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    ok = True
+    if heavy:
+        ok = False
+        print(f"\nHeavy modules imported at startup: {', '.join(sorted(heavy))}")
+    if errors:
+        ok = False
+        print("\nApp raised on first run:\n  " + "\n  ".join(errors[:5]))
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for name, ms in report.items():
+            if name in baseline and ms > baseline[name] * (1 + args.tolerance):
+                ok = False
+                print(f"\n{name}: {baseline[name]:.0f}ms -> {ms:.0f}ms (> {args.tolerance:.0%} slower)")
+    print("\nPASS" if ok else "\nFAIL")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Compare the vector index backends (app/vector_index.py) against the exact flat index.
+
+For each backend: build time, serialized size, resident memory after
+loading the saved index normally and memory-mapped, single-query latency
+and recall@k (share of the flat index's top k that the backend also
+returns). Vectors are synthetic clustered unit vectors shaped like
+sentence embeddings, or real ones from --vectors (an .npy array).
+
+Usage:
+    python scripts/bench_vector_index.py --chunks 20000 --queries 200 --k 12
+    python scripts/bench_vector_index.py --vectors chunk_embeddings.npy --backends flat,sq8,hnsw
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import faiss
+from app.vector_index import BACKENDS, build_index, read_index, index_bytes
+
+
+def make_vectors(n, dim, rng, clusters=200, latent=32):
+    """Unit vectors around `clusters` topics in a `latent`-dimensional subspace.
+
+    Sentence embeddings have low intrinsic dimension; isotropic random
+    vectors would make every approximate index look much worse than it is.
+    """
+    centers = rng.standard_normal((clusters, latent))
+    points = centers[rng.integers(0, clusters, n)] + 0.5 * rng.standard_normal((n, latent))
+    vectors = points @ rng.standard_normal((latent, dim)) + 0.5 * rng.standard_normal((n, dim))
+    vectors = vectors.astype("float32")
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+# Run in a fresh interpreter: freed memory in this one would hide the cost of a load
+LOAD_PROBE = """
+import sys
+import faiss
+from app.vector_index import read_index
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        return next(int(line.split()[1]) for line in f if line.startswith("VmRSS")) / 1024
+
+before = rss_mb()
+index = read_index(sys.argv[1], mmap=sys.argv[2] == "1")
+print(rss_mb() - before)
+"""
+
+
+def loaded_mb(path, mmap):
+    """Resident memory (MB) a fresh process gains by loading the index, or nan where unmeasurable."""
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    result = subprocess.run([sys.executable, "-c", LOAD_PROBE, path, "1" if mmap else "0"],
+                            capture_output=True, text=True, cwd=root)
+    try:
+        return float(result.stdout.strip().splitlines()[-1])
+    except (ValueError, IndexError):
+        return float("nan")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--vectors", help=".npy file of embeddings to use instead of synthetic ones")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=12)
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    if args.vectors:
+        vectors = np.load(args.vectors).astype("float32")
+    else:
+        vectors = make_vectors(args.chunks, args.dim, rng)
+    # Queries near, but not exactly at, stored chunks
+    picks = rng.choice(len(vectors), args.queries, replace=False)
+    queries = vectors[picks] + 0.3 * rng.standard_normal((args.queries, vectors.shape[1])).astype("float32")
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    truth = faiss.IndexFlatL2(vectors.shape[1])
+    truth.add(vectors)
+    _, exact = truth.search(queries, args.k)
+
+    print(f"{len(vectors)} vectors x {vectors.shape[1]} dims, {args.queries} queries, k={args.k}\n")
+    print(f"{'backend':<8}{'build s':>9}{'size MB':>9}{'RSS MB':>8}{'mmap MB':>9}{'p50 ms':>8}{'p95 ms':>8}{'recall':>8}")
+    with tempfile.TemporaryDirectory(prefix="vector_index_") as workdir:
+        for backend in args.backends.split(","):
+            start = time.perf_counter()
+            index = build_index(vectors, backend, seed=args.seed)
+            build = time.perf_counter() - start
+            size = index_bytes(index) / 2 ** 20
+            path = os.path.join(workdir, f"{backend}.faiss")
+            faiss.write_index(index, path)
+            del index
+
+            heap = loaded_mb(path, mmap=False)
+            mapped = loaded_mb(path, mmap=True)
+            index = read_index(path)
+
+            timings, hits = [], 0
+            for query, expected in zip(queries, exact):
+                t = time.perf_counter()
+                _, found = index.search(query[None, :], args.k)
+                timings.append((time.perf_counter() - t) * 1000)
+                hits += len(set(found[0].tolist()) & set(expected.tolist()))
+            timings.sort()
+            print(f"{backend:<8}{build:>9.2f}{size:>9.1f}{heap:>8.1f}{mapped:>9.1f}"
+                  f"{statistics.median(timings):>8.3f}{timings[int(len(timings) * 0.95)]:>8.3f}"
+                  f"{hits / (args.queries * args.k):>8.3f}")
+            os.remove(path)
+
+    print("\nRSS/mmap MB: resident memory a fresh process gains by loading the saved index normally /")
+    print("memory-mapped. Mapped pages are file cache shared by every process that maps the same file.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""Import bookings from a CSV or JSONL file without going through the chat.
+
+Each row needs name, email, phone, booking_type, date and time (CSV header
+names or JSON keys). Rows are validated like chat input and inserted in
+chunked transactions; rows that fail validation or find their slot full
+are listed with their line number.
+
+With --demo N, a synthetic file of N rows is imported into a scratch
+database instead, and the same rows are then saved one at a time through
+save_booking_to_db for comparison. A small JSONL file with malformed lines
+is imported last, to check they are reported rather than fatal. The demo
+exits non-zero if the two paths store different bookings, the analytics
+tables drift from the bookings, or a malformed line aborts the import.
+
+Usage:
+    python scripts/bulk_import.py bookings.csv --db data/bookings.db
+    python scripts/bulk_import.py --demo 20000 --chunk 500
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.config import BULK_IMPORT_CHUNK, REQUIRED_FIELDS
+from app.booking_engine import import_bookings, read_booking_records, validate_booking
+from app.service_catalog import ServiceCatalog
+from db import database
+
+SERVICES = ["Deluxe Room", "Suite", "Spa Treatment", "Haircut", "Consultation"]
+TIMES = ["09:30", "10:00 AM", "11:30", "01:00 PM", "14:30", "04:00 PM"]
+
+
+def write_demo_file(path, n, rng):
+    """n plausible rows over 60 days, with ~2% deliberately broken."""
+    start = date.today() + timedelta(days=1)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=REQUIRED_FIELDS)
+        writer.writeheader()
+        for i in range(n):
+            row = {
+                "name": f"Guest {i}",
+                "email": f"guest{rng.randrange(n // 3 + 1)}@example.com",
+                "phone": f"98{rng.randrange(10 ** 8):08d}",
+                "booking_type": rng.choice(SERVICES),
+                "date": (start + timedelta(days=rng.randrange(60))).isoformat(),
+                "time": rng.choice(TIMES),
+            }
+            if rng.random() < 0.02:
+                row[rng.choice(["email", "date", "time"])] = "???"
+            writer.writerow(row)
+
+
+def print_report(report, limit=20):
+    print(f"Rows: {report['rows']}  imported: {report['imported']}  rejected: {len(report['errors'])}")
+    print(f"Time: {report['seconds']:.2f} s  ({report['rows_per_sec']:.0f} rows/sec)")
+    for row_id, error in report["errors"][:limit]:
+        print(f"  line {row_id}: {error}")
+    if len(report["errors"]) > limit:
+        print(f"  ...and {len(report['errors']) - limit} more")
+
+
+def check_malformed_jsonl(path):
+    """Lines that are not JSON objects become row errors; the good line still goes in."""
+    good = {"name": "Json Guest", "email": "json@example.com", "phone": "9812345678",
+            "booking_type": SERVICES[0], "date": (date.today() + timedelta(days=90)).isoformat(), "time": "10:00 AM"}
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join([json.dumps(good), "[1, 2]", '"x"', "42", "null", "{broken"]) + "\n")
+    report = import_bookings(read_booking_records(path), allow_past=True)
+    print_report(report)
+    return report["imported"] == 1 and [row for row, _ in report["errors"]] == [2, 3, 4, 5, 6]
+
+
+def run_demo(n, chunk_size, seed):
+    with tempfile.TemporaryDirectory(prefix="bulk_import_") as workdir:
+        ok = _run_demo(workdir, n, chunk_size, seed)
+    sys.exit(0 if ok else 1)
+
+
+def _run_demo(workdir, n, chunk_size, seed):
+    path = os.path.join(workdir, "bookings.csv")
+    write_demo_file(path, n, random.Random(seed))
+    for service in SERVICES:
+        database.SLOT_CAPACITY[service] = max(1, n // 1000)  # Some slots fill up, most rows fit
+
+    database.configure_db(os.path.join(workdir, "bulk.db"))
+    database.init_db()
+    print(f"Bulk import ({chunk_size} rows per transaction):")
+    report = import_bookings(read_booking_records(path), allow_past=True, chunk_size=chunk_size)
+    print_report(report, limit=5)
+    stats_ok = database.verify_booking_stats()
+    print(f"Stats tables consistent: {stats_ok}")
+
+    # Same rows, one save_booking_to_db (one transaction) each
+    database.configure_db(os.path.join(workdir, "single.db"))
+    database.init_db()
+    valid = [data for data, errors in (validate_booking(record) for _, record in read_booking_records(path)) if not errors]
+    saved = 0
+    start = time.perf_counter()
+    for data in valid:
+        try:
+            saved += database.save_booking_to_db(data) is not None
+        except database.SlotUnavailable:
+            pass
+    seconds = time.perf_counter() - start
+    print(f"\nOne at a time: {saved} saved in {seconds:.2f} s  ({len(valid) / seconds:.0f} rows/sec)")
+    print(f"Same bookings as bulk: {saved == report['imported']}")
+
+    print("\nMalformed JSONL:")
+    malformed_ok = check_malformed_jsonl(os.path.join(workdir, "malformed.jsonl"))
+    print(f"Malformed lines reported, not fatal: {malformed_ok}")
+    database.get_db().close()
+    return stats_ok and saved == report["imported"] and malformed_ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", nargs="?", help="bookings .csv or .jsonl")
+    parser.add_argument("--db", help="database file (default: the app's DB_PATH)")
+    parser.add_argument("--chunk", type=int, default=BULK_IMPORT_CHUNK, help="rows per transaction")
+    parser.add_argument("--allow-past", action="store_true", help="accept dates before today (historical data)")
+    parser.add_argument("--services", help="text file with one service per line; booking_type must match one")
+    parser.add_argument("--demo", type=int, metavar="N", help="import N synthetic rows into a scratch database")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.demo:
+        run_demo(args.demo, args.chunk, args.seed)
+        return
+    if not args.path:
+        parser.error("a file to import (or --demo N) is required")
+
+    if args.db:
+        database.configure_db(args.db)
+    database.init_db()
+    catalog = None
+    if args.services:
+        with open(args.services, encoding="utf-8") as f:
+            catalog = ServiceCatalog(line for line in f)
+    report = import_bookings(read_booking_records(args.path), catalog, args.allow_past, args.chunk)
+    print_report(report)
+    sys.exit(1 if report["errors"] else 0)
+
+
+if __name__ == "__main__":
+    main()
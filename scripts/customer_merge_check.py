@@ -0,0 +1,88 @@
+"""Check the one-off customer de-duplication migration (db/database.py, _merge_duplicate_customers).
+
+Builds a database with the schema from before the migration (no
+email_norm, no per-booking name/phone) holding two customers that share
+an email under different names and phones, plus two customers without an
+email, runs init_db() on it and checks that:
+
+- every booking still shows the name and phone it was made with
+- the shared email ends up as one customer with the oldest row's details
+- customers without an email are left alone, not merged into one
+
+Usage:
+    python scripts/customer_merge_check.py
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from db import database
+
+# (customer id, name, email, phone) as the pre-migration code stored them
+OLD_CUSTOMERS = [
+    (1, "Alice", "alice@example.com", "111 111"),
+    (2, "Mallory", " Alice@Example.com", "999 999"),
+    (3, "NoMail", None, "333"),
+    (4, "NoMail2", "", "444"),
+]
+# (booking id, customer id) -> name and phone the booking must still show
+EXPECTED = {
+    (1, 1): ("Alice", "111 111"),
+    (2, 2): ("Mallory", "999 999"),
+    (3, 3): ("NoMail", "333"),
+    (4, 4): ("NoMail2", "444"),
+}
+
+
+def make_old_database(path):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE customers (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, email TEXT, phone TEXT)")
+    conn.execute("CREATE TABLE bookings (id INTEGER PRIMARY KEY AUTOINCREMENT, customer_id INTEGER, "
+                 "booking_type TEXT, date TEXT, time TEXT, status TEXT, FOREIGN KEY(customer_id) REFERENCES customers(id))")
+    conn.executemany("INSERT INTO customers VALUES (?, ?, ?, ?)", OLD_CUSTOMERS)
+    conn.executemany("INSERT INTO bookings VALUES (?, ?, 'Spa Massage', '2099-01-01', '10:00 AM', 'Confirmed')",
+                     list(EXPECTED))
+    conn.commit()
+    conn.close()
+
+
+def main():
+    failures = []
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "old.db")
+        make_old_database(path)
+        database.configure_db(path)
+        database.init_db()
+
+        with database.get_db().connection() as conn:
+            bookings = {bid: (customer_id, name, phone) for bid, customer_id, name, phone
+                        in conn.execute("SELECT id, customer_id, name, phone FROM bookings")}
+            customers = {cid: (name, email, phone) for cid, name, email, phone
+                         in conn.execute("SELECT id, name, email, phone FROM customers")}
+        database.get_db().close()
+
+    for (booking_id, _), details in EXPECTED.items():
+        if bookings[booking_id][1:] != details:
+            failures.append(f"booking {booking_id} shows {bookings[booking_id][1:]}, expected {details}")
+    if bookings[2][0] != 1:
+        failures.append(f"Mallory's booking belongs to customer {bookings[2][0]}, expected the merged customer 1")
+    if customers.get(1) != ("Alice", "alice@example.com", "111 111"):
+        failures.append(f"merged customer is {customers.get(1)}, expected Alice's original details")
+    if 2 in customers:
+        failures.append("duplicate customer 2 was not merged away")
+    for cid in (3, 4):
+        if cid not in customers:
+            failures.append(f"customer {cid} without an email was merged into another one")
+
+    for failure in failures:
+        print(f"FAIL  {failure}")
+    print(f"{len(bookings)} bookings, {len(customers)} customers after the migration")
+    print("\nPASS" if not failures else "\nFAIL")
+    sys.exit(0 if not failures else 1)
+
+
+if __name__ == "__main__":
+    main()
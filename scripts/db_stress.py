@@ -0,0 +1,111 @@
+"""Concurrency stress test for the SQLite layer.
+
+Phase 1 runs many threads that save and read bookings at the same time
+against a scratch database and reports throughput plus any failed writes
+(e.g. "database is locked"). Phase 2 has hundreds of threads race for one
+slot and checks that exactly its capacity gets booked. Finally some
+bookings are cancelled and the incrementally maintained analytics tables
+are compared with a brute-force recomputation.
+
+Usage:
+    python scripts/db_stress.py --threads 32 --bookings 200 --contenders 300 --capacity 5
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from db import database
+
+
+def worker(worker_id, count, failures):
+    for i in range(count):
+        booking_id = database.save_booking_to_db({
+            "name": f"Stress {worker_id}",
+            "email": f"stress{worker_id}@example.com",
+            "phone": "9999999999",
+            "booking_type": f"Stress Test {worker_id}-{i}",
+            "date": "2099-01-01",
+            "time": "10:00 AM",
+        })
+        if booking_id is None:
+            failures.append((worker_id, i))
+        if i % 10 == 0:
+            database.fetch_all_bookings()
+
+
+def contend_for_slot(contenders, capacity):
+    """Everyone books the same slot at once; returns (confirmed, rejected, errors)."""
+    database.SLOT_CAPACITY["Contended"] = capacity
+    results = []
+    barrier = threading.Barrier(contenders)
+
+    def attempt(n):
+        barrier.wait()
+        try:
+            booking_id = database.save_booking_to_db({
+                "name": f"Racer {n}", "email": f"racer{n}@example.com", "phone": "9999999999",
+                "booking_type": "Contended", "date": "2099-06-01", "time": "11:00 AM",
+            })
+            results.append("ok" if booking_id else "error")
+        except database.SlotUnavailable:
+            results.append("full")
+
+    threads = [threading.Thread(target=attempt, args=(n,)) for n in range(contenders)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results.count("ok"), results.count("full"), results.count("error")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--bookings", type=int, default=200, help="Bookings written per thread")
+    parser.add_argument("--contenders", type=int, default=300, help="Threads racing for one slot")
+    parser.add_argument("--capacity", type=int, default=5, help="Capacity of the contended slot")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        database.configure_db(os.path.join(folder, "stress.db"))
+        database.init_db()
+
+        failures = []
+        threads = [threading.Thread(target=worker, args=(n, args.bookings, failures)) for n in range(args.threads)]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+
+        expected = args.threads * args.bookings
+        stored = len(database.fetch_all_bookings())
+        print(f"{expected} bookings from {args.threads} threads in {elapsed:.2f}s "
+              f"({expected / elapsed:.0f} writes/s)")
+        print(f"stored: {stored}, failed writes: {len(failures)}")
+
+        started = time.perf_counter()
+        confirmed, rejected, errors = contend_for_slot(args.contenders, args.capacity)
+        elapsed = time.perf_counter() - started
+        free = database.next_free_slots("Contended", "2099-06-01", "11:00 AM")
+        print(f"{args.contenders} racers for a slot of {args.capacity} in {elapsed:.2f}s: "
+              f"{confirmed} confirmed, {rejected} rejected, {errors} errors; next free: {free}")
+
+        for booking in database.query_bookings(page_size=expected // 10):
+            database.cancel_booking(booking[0])
+        stats_ok = database.verify_booking_stats()
+        print(f"analytics match recomputation: {stats_ok}")
+        database.get_db().close()
+
+        if failures or stored != expected or confirmed != args.capacity or errors or not stats_ok:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Offline recall check for PDF retrieval.
+
+Compares dense-only, BM25-only and hybrid retrieval (with and without
+reranking) on a labelled query set. Each line of the JSONL file is
+{"query": "...", "relevant": ["text that a relevant chunk contains", ...]}.
+
+Usage:
+    python scripts/eval_retrieval.py brochure.pdf queries.jsonl --k 5
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.ingestion import ingest_pdf
+from app.hybrid_retriever import HybridRetriever
+
+MODES = {
+    "dense": dict(bm25_weight=0, rerank=False),
+    "bm25": dict(vector_weight=0, rerank=False),
+    "hybrid": dict(rerank=False),
+    "hybrid+rerank": dict(rerank=True),
+}
+
+
+def is_relevant(text, labels):
+    text = text.lower()
+    return any(label.lower() in text for label in labels)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pdf")
+    parser.add_argument("queries")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--vector-weight", type=float, default=1.0)
+    parser.add_argument("--bm25-weight", type=float, default=1.0)
+    parser.add_argument("--fake-embeddings", action="store_true",
+                        help="Deterministic random embeddings (no model download); only BM25 numbers are meaningful")
+    args = parser.parse_args()
+
+    if args.fake_embeddings:
+        from langchain_core.embeddings import DeterministicFakeEmbedding
+        embeddings = DeterministicFakeEmbedding(size=384)
+    else:
+        from app.resources import get_embeddings
+        embeddings = get_embeddings()
+
+    with open(args.pdf, "rb") as f:
+        result = ingest_pdf(f, embeddings)
+    retriever = HybridRetriever(result.vectorstore, result.bm25)
+
+    with open(args.queries, "r", encoding="utf-8") as f:
+        labelled = [json.loads(line) for line in f if line.strip()]
+
+    print(f"{len(labelled)} queries, {len(result.bm25.doc_ids)} chunks, k={args.k}\n")
+    print(f"{'mode':<15}{'hit@k':>8}{'recall@k':>10}")
+    for mode, options in MODES.items():
+        options = {"vector_weight": args.vector_weight, "bm25_weight": args.bm25_weight, **options}
+        hits, found, total = 0, 0, 0
+        for item in labelled:
+            query_vector = embeddings.embed_query(item["query"])
+            docs = [doc for doc, _ in retriever.search(item["query"], query_vector, k=args.k, **options)]
+            matched = [label for label in item["relevant"] if any(is_relevant(d.page_content, [label]) for d in docs)]
+            hits += bool(matched)
+            found += len(matched)
+            total += len(item["relevant"])
+        print(f"{mode:<15}{hits / len(labelled):>8.2%}{found / max(total, 1):>10.2%}")
+
+
+if __name__ == "__main__":
+    main()
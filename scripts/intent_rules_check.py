@@ -0,0 +1,71 @@
+"""Check the rule tier of the intent classifier (app/intent.py) against its own labelled examples.
+
+Every INTENT_EXAMPLES phrase goes through classify_fast() on a fresh
+classifier (no cache): a rule may pass on it (None, a slower tier decides)
+but must never contradict its label. A few tricky messages (PDF questions
+that look like searches, requests phrased as questions, "book"/"schedule"
+used as nouns) are checked the same way.
+
+Usage:
+    python scripts/intent_rules_check.py
+"""
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.intent import INTENT_EXAMPLES, IntentClassifier
+
+# Messages a careless rule gets wrong: PDF questions that look like search requests
+# (a paid web search), and booking or search requests phrased as questions
+PDF_QUESTIONS = {
+    "CHAT": [
+        "Show me the price list",
+        "Find the cancellation policy",
+        "Find the price of the deluxe room in the PDF",
+        "Look up the check-in time",
+        "What time does the spa open?",
+        "Find the price in rupees",
+        "Show me prices in dollars",
+        "Look up the fee in detail",
+        "Search for rooms in june",
+        "schedule of the yoga class",
+        "Book recommendations in the library?",
+    ],
+    "BOOKING": [
+        "How do I get a haircut appointment",
+        "Do you have rooms for tomorrow? I want to stay",
+    ],
+    "SEARCH": [
+        "What are the best restaurants in Bangalore?",
+        "Are there any hotels in Goa?",
+        "Find spas in Chennai",
+        "Find hotels in New Delhi",
+        "Search for salons near Pune",
+        "Are there any hotels near me?",
+    ],
+}
+
+
+def main():
+    failures, matched, total = [], 0, 0
+    for source in (INTENT_EXAMPLES, PDF_QUESTIONS):
+        for label, phrases in source.items():
+            for phrase in phrases:
+                total += 1
+                intent = IntentClassifier().classify_fast(phrase)
+                if intent is None:
+                    continue
+                matched += 1
+                if intent != label:
+                    failures.append((phrase, label, intent))
+
+    for phrase, label, intent in failures:
+        print(f"FAIL  {phrase!r}: labelled {label}, rules say {intent}")
+    print(f"{total} phrases, {matched} decided by a rule, {len(failures)} disagreements")
+    print("\nPASS" if not failures else "\nFAIL")
+    sys.exit(0 if not failures else 1)
+
+
+if __name__ == "__main__":
+    main()
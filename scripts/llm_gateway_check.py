@@ -0,0 +1,177 @@
+"""Exercise the LLM gateway (app/llm_gateway.py) against a local stub of Groq's API.
+
+Most scenarios use the real Groq SDK over HTTP to StubLLMServer:
+
+- keep-alive:  sequential calls through one gateway vs. a new client per call
+- concurrency: a burst of parallel calls never exceeds --max-concurrency at the server
+- rate limit:  the token bucket spaces calls out to the configured rate
+- flaky:       with --error-rate failures injected, retries still get answers through
+- outage:      every call fails -> the circuit opens and later calls fail fast,
+               then one trial call after the reset period closes it again
+- no text:     a reply without text content (tool call, content filter) comes back as ''
+- broken stream: streams that fail midway count as failures and open the circuit
+                 (in-process fake client)
+
+Usage:
+    python scripts/llm_gateway_check.py --calls 50 --max-concurrency 4 --error-rate 0.3
+"""
+import argparse
+import math
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bench_fakes import FakeGroq, StubLLMServer
+from app.llm_gateway import LLMGateway, LLMError, CircuitBreaker
+
+MESSAGES = [{"role": "user", "content": "What does the Deluxe Room cost?"}]
+
+
+class BrokenStreamClient:
+    """Opens a stream, sends one token and then drops the connection; non-streamed replies have no text."""
+
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, stream=False, **kwargs):
+        if not stream:
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=None))])
+        return self._stream()
+
+    def _stream(self):
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content="The "))])
+        raise ConnectionError("connection reset mid-stream")
+
+
+def timed_calls(fn, n):
+    timings, failures = [], 0
+    for _ in range(n):
+        start = time.perf_counter()
+        try:
+            fn()
+        except LLMError:
+            failures += 1
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings, failures
+
+
+def binomial_bound(n, p, tail):
+    """Smallest k with P(X > k) < tail for X ~ Binomial(n, p)."""
+    cumulative = 0.0
+    for k in range(n + 1):
+        cumulative += math.comb(n, k) * p ** k * (1 - p) ** (n - k)
+        if 1 - cumulative < tail:
+            return k
+    return n
+
+
+def check(label, ok, detail):
+    print(f"{'PASS' if ok else 'FAIL'}  {label:<12} {detail}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.02, help="Seconds the stub takes per answer")
+    parser.add_argument("--max-concurrency", type=int, default=4)
+    parser.add_argument("--rpm", type=int, default=600, help="Rate for the rate-limit scenario")
+    parser.add_argument("--error-rate", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=0, help="Seed for which stub requests fail")
+    args = parser.parse_args()
+
+    stub = StubLLMServer(FakeGroq(latency=args.latency, jitter=0.0, token_interval=0.0), seed=args.seed)
+    results = []
+
+    # --- KEEP-ALIVE ---
+    from groq import Groq
+    def fresh_client_call():
+        Groq(api_key="bench", base_url=stub.base_url, max_retries=0).chat.completions.create(
+            model="stub", messages=MESSAGES)
+    before = stub.connections
+    fresh, _ = timed_calls(fresh_client_call, args.calls)
+    fresh_connections = stub.connections - before
+
+    gateway = LLMGateway(api_key="bench", base_url=stub.base_url)
+    before = stub.connections
+    pooled, _ = timed_calls(lambda: gateway.complete(MESSAGES), args.calls)
+    pooled_connections = stub.connections - before
+    results.append(check("keep-alive", pooled_connections == 1,
+                         f"new client per call: {fresh_connections} connections, p50 {statistics.median(fresh):.1f} ms; "
+                         f"gateway: {pooled_connections} connection, p50 {statistics.median(pooled):.1f} ms"))
+
+    # --- CONCURRENCY ---
+    stub.max_in_flight = 0
+    limited = LLMGateway(api_key="bench", base_url=stub.base_url, max_concurrency=args.max_concurrency)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.max_concurrency * 4) as pool:
+        list(pool.map(lambda _: limited.complete(MESSAGES), range(args.calls)))
+    results.append(check("concurrency", stub.max_in_flight <= args.max_concurrency,
+                         f"{args.calls} calls from {args.max_concurrency * 4} threads: at most {stub.max_in_flight} "
+                         f"in flight (limit {args.max_concurrency}), {time.perf_counter() - start:.2f}s"))
+
+    # --- RATE LIMIT ---
+    burst, calls = 2, 12
+    throttled = LLMGateway(api_key="bench", base_url=stub.base_url, requests_per_minute=args.rpm, burst=burst)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=calls) as pool:
+        list(pool.map(lambda _: throttled.complete(MESSAGES), range(calls)))
+    elapsed = time.perf_counter() - start
+    expected = (calls - burst) * 60 / args.rpm
+    results.append(check("rate limit", elapsed >= expected * 0.9,
+                         f"{calls} calls at {args.rpm}/min (burst {burst}): {elapsed:.2f}s, expected >= {expected:.2f}s"))
+
+    # --- FLAKY ---
+    stub.error_rate = args.error_rate
+    errors_before = stub.errors
+    retrying = LLMGateway(api_key="bench", base_url=stub.base_url, retries=3, backoff=0.02,
+                          breaker=CircuitBreaker(failures=args.calls))
+    _, failed = timed_calls(lambda: retrying.complete(MESSAGES), args.calls)
+    no_retry_rate = (1 - args.error_rate) * 100
+    # A call fails only if all 4 attempts do; allow what a correct gateway exceeds < 0.1% of the time
+    allowed = binomial_bound(args.calls, args.error_rate ** 4, 0.001)
+    results.append(check("flaky", failed <= allowed,
+                         f"{stub.errors - errors_before} injected errors, {args.calls - failed}/{args.calls} answered "
+                         f"(~{no_retry_rate:.0f}% without retries, up to {allowed} failures allowed)"))
+
+    # --- OUTAGE ---
+    stub.error_rate = 1.0
+    breaker = CircuitBreaker(failures=5, reset_seconds=0.5)
+    fragile = LLMGateway(api_key="bench", base_url=stub.base_url, retries=1, backoff=0.02, breaker=breaker)
+    requests_before = stub.requests
+    timings, failed = timed_calls(lambda: fragile.complete(MESSAGES), 20)
+    sent = stub.requests - requests_before
+    fast = [ms for ms in timings[-10:]]
+    ok = breaker.state == "open" and sent <= 6 and max(fast) < args.latency * 1000
+    detail = f"20 calls: {failed} failed, {sent} reached the server, last 10 took <= {max(fast):.2f} ms"
+    stub.error_rate = 0.0
+    time.sleep(breaker.reset_seconds)
+    recovered = fragile.complete(MESSAGES) is not None and breaker.state == "closed"
+    results.append(check("outage", ok and recovered, f"{detail}; closed again after reset: {recovered}"))
+
+    # --- NO TEXT / BROKEN STREAM ---
+    breaker = CircuitBreaker(failures=3, reset_seconds=60)
+    broken = LLMGateway(client=BrokenStreamClient(), breaker=breaker)
+    text = broken.complete(MESSAGES)
+    results.append(check("no text", text == "", f"reply without content -> {text!r}"))
+    interrupted = 0
+    for _ in range(3):
+        try:
+            "".join(broken.complete(MESSAGES, stream=True))
+        except LLMError:
+            interrupted += 1
+    results.append(check("broken stream", interrupted == 3 and breaker.state == "open",
+                         f"{interrupted}/3 streams interrupted, circuit {breaker.state}"))
+
+    stub.close()
+    print("\nPASS" if all(results) else "\nFAIL")
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
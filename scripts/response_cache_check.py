@@ -0,0 +1,104 @@
+"""Check which chat turns the RAG response cache (app/response_cache.py) serves.
+
+Runs chat_logic.route_query offline (fakes from bench_fakes.py) on a
+brochure one session has already asked about. In a second session:
+
+- questions the first session asked must be cache hits, even mid-conversation
+  and even when they say "me" ("can you tell me ...?")
+- a follow-up that refers back ("is it ...?") must bypass the cache
+
+Usage:
+    python scripts/response_cache_check.py
+"""
+import logging
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import streamlit as st
+from bench_fakes import FakeGroq, FakeEmbeddings, ThreadLocalSessionState, FakeUpload, make_brochure
+
+st.secrets = {"GROQ_API_KEY": "bench", "EMAIL_SENDER": "", "EMAIL_PASSWORD": "", "ADMIN_PASSWORD": "bench"}
+st.session_state = ThreadLocalSessionState()
+logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").setLevel(logging.ERROR)
+
+from app import chat_logic, rag_pipeline, intent, resources, index_cache, conversation_memory
+from app.llm_gateway import LLMGateway
+from app.tracing import get_metrics
+from app.conversation_memory import ConversationMemory
+from db import database
+
+# Asked in the first session, then again (unrelated to the turns before) in the second
+SHARED_QUESTIONS = ["Is breakfast included with the suite?", "Can you tell me the spa hours?"]
+# (message, counter it must bump) for the second session
+TURNS = [
+    ("What does the Deluxe Room cost?", None),
+    (SHARED_QUESTIONS[0], "response_cache.hit"),
+    ("Is it available on weekends?", "response_cache.bypass"),
+    (SHARED_QUESTIONS[1], "response_cache.hit"),
+]
+
+
+def install_fakes(workdir):
+    database.configure_db(os.path.join(workdir, "check.db"))
+    database.init_db()
+    index_cache.INDEX_CACHE_DIR = os.path.join(workdir, "index_cache")
+    gateway = LLMGateway(client=FakeGroq(latency=0, jitter=0, token_interval=0))
+    for module in (chat_logic, rag_pipeline, conversation_memory):
+        module.get_llm_gateway = lambda: gateway
+    embeddings = FakeEmbeddings()
+    for module in (resources, rag_pipeline, intent):
+        module.get_embeddings = lambda: embeddings
+    resources._embeddings_loaded = True
+
+
+def new_session(pdf):
+    st.session_state.clear()
+    st.session_state.memory = ConversationMemory()
+    st.session_state.booking_state = {"active": False, "data": {}, "current_field": None}
+    st.session_state.vectorstore = rag_pipeline.process_pdf(FakeUpload(pdf, "brochure"))
+
+
+def turn(message):
+    """Send one message; returns the counters it changed."""
+    before = dict(get_metrics().snapshot()["counters"])
+    memory = st.session_state.memory
+    memory.add("user", message)
+    reply = chat_logic.route_query(message, st.session_state.vectorstore, memory)
+    if not isinstance(reply, str):
+        reply = "".join(reply)
+    memory.add("assistant", reply)
+    after = get_metrics().snapshot()["counters"]
+    return {k for k, v in after.items() if v != before.get(k, 0)}
+
+
+def main():
+    failures = []
+    with tempfile.TemporaryDirectory() as workdir:
+        install_fakes(workdir)
+        pdf = make_brochure(pages=2)
+
+        new_session(pdf)
+        for question in SHARED_QUESTIONS:
+            turn(question)
+        rag_pipeline.release_pdf()
+
+        new_session(pdf)
+        for message, expected in TURNS:
+            changed = turn(message)
+            print(f"{message!r}: {', '.join(sorted(k for k in changed if k.startswith('response_cache'))) or '-'}")
+            if expected and expected not in changed:
+                failures.append(f"{message!r} should count {expected}")
+        rag_pipeline.release_pdf()
+        database.get_db().close()
+
+    for failure in failures:
+        print(f"FAIL  {failure}")
+    print("\nPASS" if not failures else "\nFAIL")
+    sys.exit(0 if not failures else 1)
+
+
+if __name__ == "__main__":
+    main()